@@ -0,0 +1,88 @@
+"""
+Memory benchmark for large subtask counts.
+
+Reports the bytes allocated per idle subtask (created and submitted) and the additional bytes per running subtask
+(logger and log handler created). The task runs offline, requests to kdsm-manager are answered locally.
+
+Both cases are reported: a subclass which declares '__slots__ = ()' and a plain subclass as usually written. The
+slots of Subtask only save memory if every subclass opts in, a plain subclass gives each instance a '__dict__'.
+
+Usage: python benchmarks/memory.py [subtasks] [subtasks_per_group]
+"""
+
+import gc
+import sys
+import tracemalloc
+from typing import Any
+
+from kdsm_manager_task_client import Task, Group, Subtask, Settings, TaskStatus
+
+
+class OfflineTask(Task):
+    def request(self, method: str, url: str, response_model: type | None = None, **kwargs) -> Any:
+        if url.endswith("/task/name"):
+            return "benchmark"
+        if url.endswith("/status"):
+            return TaskStatus.RUNNING
+        return None
+
+
+class SlottedSubtask(Subtask):
+    __slots__ = ()
+
+    def payload(self):
+        ...
+
+
+class PlainSubtask(Subtask):
+    def payload(self):
+        ...
+
+
+def measure(subtask_class: type[Subtask], subtasks: int, subtasks_per_group: int) -> None:
+    task = OfflineTask(settings=Settings(id=1, api_token="benchmark", log_console=False))
+
+    gc.collect()
+    tracemalloc.start()
+
+    # idle
+    before = tracemalloc.take_snapshot()
+    groups = [Group(*[subtask_class(name=f"subtask_{i}_{j}") for j in range(subtasks_per_group)])
+              for i in range(subtasks // subtasks_per_group)]
+    task.subtask(*groups)
+    gc.collect()
+    idle = tracemalloc.take_snapshot()
+    idle_bytes = sum(stat.size_diff for stat in idle.compare_to(before, "filename"))
+
+    # running
+    for subtask in task.subtasks:
+        _ = subtask.logger
+    gc.collect()
+    running = tracemalloc.take_snapshot()
+    running_bytes = sum(stat.size_diff for stat in running.compare_to(idle, "filename"))
+
+    # stopped
+    for subtask in task.subtasks:
+        subtask.stop(final_status=TaskStatus.ABORTED)
+    gc.collect()
+    stopped = tracemalloc.take_snapshot()
+    stopped_bytes = sum(stat.size_diff for stat in stopped.compare_to(idle, "filename"))
+
+    tracemalloc.stop()
+
+    count = len(task.subtasks)
+    print(f"subtask class:           {subtask_class.__name__}")
+    print(f"subtasks:                {count}")
+    print(f"groups:                  {len(task.groups)}")
+    print(f"bytes per idle subtask:  {idle_bytes / count:.0f}")
+    print(f"bytes per running subtask (additional): {running_bytes / count:.0f}")
+    print(f"bytes per stopped subtask (left over):  {stopped_bytes / count:.0f}")
+
+
+if __name__ == "__main__":
+    for index, subtask_class in enumerate([SlottedSubtask, PlainSubtask]):
+        if index > 0:
+            print()
+        measure(subtask_class=subtask_class,
+                subtasks=int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+                subtasks_per_group=int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -1,14 +1,41 @@
+from kdsm_manager_task_client.abort_poller import (AbortPoller)
 from kdsm_manager_task_client.bearer_auth import (BearerAuth)
+from kdsm_manager_task_client.checkpoint import (SubtaskCheckpointModel,
+                                                 Checkpoint)
+from kdsm_manager_task_client.control import (ControlSubtaskModel,
+                                              ControlGroupModel,
+                                              ControlThreadModel,
+                                              ControlSnapshotModel,
+                                              ControlServer)
 from kdsm_manager_task_client.group import (Group)
+from kdsm_manager_task_client.lease import (LeaseKeeper,
+                                            LeaseWorker)
 from kdsm_manager_task_client.log_formatter import (LogFormatter)
 from kdsm_manager_task_client.log_handler import (LogHandler)
+from kdsm_manager_task_client.log_shipper import (LogShipper)
+from kdsm_manager_task_client.progress import (ProgressModel,
+                                               EtaEstimator)
+from kdsm_manager_task_client.request_scheduler import (RequestPriority,
+                                                        RequestPriorityStatsModel,
+                                                        RequestScheduler)
+from kdsm_manager_task_client.result_cache import (ResultCacheStatsModel,
+                                                   ResultCache)
 from kdsm_manager_task_client.settings import (Settings)
+from kdsm_manager_task_client.shutdown_report import (ShutdownReportModel)
+from kdsm_manager_task_client.single_flight import (SingleFlightStatsModel,
+                                                    SingleFlight)
 from kdsm_manager_task_client.subtask import (StepsNotCompletedError,
                                               NoMoreStepsLeftError,
+                                              LeaseLostError,
                                               StepNotCompletedWarning,
                                               Subtask)
+from kdsm_manager_task_client.subtask_artifact import (SubtaskArtifactModel,
+                                                       ArtifactReader)
 from kdsm_manager_task_client.subtask_log import (SubtaskLogModel)
 from kdsm_manager_task_client.task import (Task)
+from kdsm_manager_task_client.task_data import (TaskData,
+                                                DataCacheStatsModel,
+                                                DataCache)
 from kdsm_manager_task_client.task_status import (TaskStatus)
 
 __title__ = "KDSM Manager Task Client"
@@ -0,0 +1,94 @@
+import logging
+from itertools import count
+from threading import Thread, Lock, Event
+from typing import TYPE_CHECKING
+
+from wiederverwendbar.default import Default
+from wiederverwendbar.threading import ThreadWatchdogError, handle_exception
+
+if TYPE_CHECKING:
+    from kdsm_manager_task_client.group import Group
+
+counter = count(1).__next__
+
+
+class AbortPoller:
+    """
+    Watchdog for all registered groups. Checks the abort flags of the groups periodically from one thread instead of
+    one watchdog thread per group. A poller can be shared between multiple tasks.
+    """
+
+    def __init__(self,
+                 interval: float | Default = Default(),
+                 logger: logging.Logger | Default = Default()):
+        # interval
+        if type(interval) is Default:
+            interval = 1.0
+        self._interval: float = interval
+
+        # name
+        self._name: str = f"{self.__class__.__name__}-{counter()}"
+
+        # logger
+        if type(logger) is Default:
+            logger = logging.getLogger(self._name)
+        self._logger: logging.Logger = logger
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # groups
+        self._groups: list["Group"] = []
+
+        # thread
+        self._stopped: Event = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    @property
+    def groups(self) -> tuple["Group", ...]:
+        with self._lock:
+            return tuple(self._groups)
+
+    def register(self, group: "Group") -> None:
+        with self._lock:
+            if group not in self._groups:
+                self._groups.append(group)
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = Thread(name=self._name, target=self._loop, daemon=True)
+                self._thread.start()
+
+    def unregister(self, group: "Group") -> None:
+        with self._lock:
+            if group in self._groups:
+                self._groups.remove(group)
+
+    def poll(self) -> None:
+        """
+        Check the abort flags of all registered groups once.
+
+        :return: None
+        """
+
+        for group in self.groups:
+            if not group.is_alive():
+                self.unregister(group)
+                continue
+            try:
+                if not group.check_abort(group):
+                    self.unregister(group)
+            except BaseException as e:
+                self.unregister(group)
+                handle_exception(msg=f"{self._name} watchdog of {group.name} raised an exception", e=e, logger=self._logger, chain=False)
+                if group.is_alive():
+                    group.raise_exception(ThreadWatchdogError)
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def stop(self) -> None:
+        self._stopped.set()
@@ -0,0 +1,190 @@
+import json
+from pathlib import Path
+from threading import Lock
+from typing import Any, Literal, TextIO, TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from kdsm_manager_task_client.request_scheduler import RequestPriority
+from kdsm_manager_task_client.task_status import TaskStatus
+
+if TYPE_CHECKING:
+    from kdsm_manager_task_client.task import Task
+    from kdsm_manager_task_client.subtask import Subtask
+
+
+class SubtaskCheckpointModel(BaseModel):
+    model_config = {
+        "use_enum_values": True,
+    }
+
+    name: str
+    status: TaskStatus | None = None
+    current_step: int = 0
+    state: Any = None
+
+
+class Checkpoint:
+    def __init__(self,
+                 task: "Task",
+                 store: Literal["local", "manager", "both"],
+                 path: Path):
+        # task
+        self._task: "Task" = task
+
+        # store
+        if store not in ["local", "manager", "both"]:
+            raise ValueError(f"Unknown checkpoint store '{store}'!")
+        self._store: Literal["local", "manager", "both"] = store
+
+        # path
+        self._path: Path = path
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # checkpoints of the previous run
+        self._subtasks: dict[str, SubtaskCheckpointModel] = {}
+
+        # file
+        self._file: TextIO | None = None
+
+    @property
+    def task(self) -> "Task":
+        return self._task
+
+    @property
+    def store(self) -> Literal["local", "manager", "both"]:
+        return self._store
+
+    @property
+    def file_path(self) -> Path:
+        return self._path / f"task_{self.task.id}.jsonl"
+
+    @property
+    def local(self) -> bool:
+        return self.store in ["local", "both"]
+
+    @property
+    def manager(self) -> bool:
+        return self.store in ["manager", "both"]
+
+    def get(self, name: str) -> SubtaskCheckpointModel | None:
+        with self._lock:
+            return self._subtasks.get(name)
+
+    def load(self) -> None:
+        """
+        Load the checkpoints of the previous run. Local checkpoints take precedence over the checkpoints of the manager.
+
+        :return: None
+        """
+
+        subtasks: dict[str, SubtaskCheckpointModel] = {}
+
+        if self.manager:
+            checkpoints = self.task.request(method="GET",
+                                            url=self.task.api_url + "/task/checkpoint",
+                                            response_model=dict)
+            for name, checkpoint in checkpoints.items():
+                subtasks[name] = SubtaskCheckpointModel(name=name, **checkpoint)
+
+        if self.local and self.file_path.is_file():
+            # the file is append only, the last line of each subtask wins
+            with self.file_path.open("r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        checkpoint = SubtaskCheckpointModel(**json.loads(line))
+                    except ValueError:
+                        # last line may be incomplete after a crash
+                        continue
+                    subtasks[checkpoint.name] = checkpoint
+
+        with self._lock:
+            self._subtasks = subtasks
+
+        # rewrite local file compacted
+        if self.local:
+            self.reset(keep=True)
+
+    def pull(self, name: str) -> SubtaskCheckpointModel | None:
+        """
+        Get the checkpoint of a subtask from the manager, e.g. after another worker ran it partly.
+
+        :param name: Name of the subtask.
+        :return: Checkpoint or None if the subtask has none.
+        """
+
+        if not self.manager:
+            return self.get(name)
+        checkpoints = self.task.request(method="GET",
+                                        url=self.task.api_url + "/task/checkpoint",
+                                        response_model=dict,
+                                        coalesce=False)
+        with self._lock:
+            if name in checkpoints:
+                self._subtasks[name] = SubtaskCheckpointModel(name=name, **checkpoints[name])
+            return self._subtasks.get(name)
+
+    def reset(self, keep: bool = False) -> None:
+        """
+        Start a new checkpoint file.
+
+        :param keep: Keep the loaded checkpoints of the previous run.
+        :return: None
+        """
+
+        with self._lock:
+            if not keep:
+                self._subtasks = {}
+            if not self.local:
+                return
+            if self._file is not None:
+                self._file.close()
+            self._path.mkdir(parents=True, exist_ok=True)
+            self._file = self.file_path.open("w", encoding="utf-8")
+            for checkpoint in self._subtasks.values():
+                self._file.write(checkpoint.model_dump_json() + "\n")
+            self._file.flush()
+
+    def save(self, subtask: "Subtask", status: TaskStatus | None = None) -> None:
+        """
+        Persist the current step, the state and optionally the status of a subtask.
+
+        :param subtask: Subtask to persist.
+        :param status: Status of the subtask. If None, the last saved status is kept.
+        :return: None
+        """
+
+        with self._lock:
+            previous = self._subtasks.get(subtask.name)
+        if status is None and previous is not None:
+            status = previous.status
+        checkpoint = SubtaskCheckpointModel(name=subtask.name,
+                                            status=status,
+                                            current_step=subtask.current_step,
+                                            state=subtask.state)
+
+        if self.local:
+            with self._lock:
+                if self._file is None:
+                    self._path.mkdir(parents=True, exist_ok=True)
+                    self._file = self.file_path.open("a", encoding="utf-8")
+                self._file.write(checkpoint.model_dump_json() + "\n")
+                self._file.flush()
+
+        if self.manager:
+            self.task.request(method="PUT",
+                              url=self.task.api_url + f"/task/subtask/{subtask.name}/checkpoint",
+                              priority=RequestPriority.PROGRESS,
+                              flow=subtask.name,
+                              json=checkpoint.model_dump(exclude={"name"}))
+
+        with self._lock:
+            self._subtasks[subtask.name] = checkpoint
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
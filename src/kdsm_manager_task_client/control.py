@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+from itertools import count
+from pathlib import Path
+from threading import Thread, Lock
+from typing import Any, TYPE_CHECKING
+
+from pydantic import BaseModel, Field
+
+from kdsm_manager_task_client.task_status import TaskStatus
+
+if TYPE_CHECKING:
+    from kdsm_manager_task_client.group import Group
+    from kdsm_manager_task_client.task import Task
+
+counter = count(1).__next__
+
+logger = logging.getLogger(__name__)
+
+
+class ControlSubtaskModel(BaseModel):
+    name: str
+    title: str | None = None
+    status: TaskStatus
+    steps: int
+    current_step: int
+    percent: float
+    eta: float | None = None
+    abort: bool = Field(default=False, description="Local abort flag of the subtask.")
+    log_buffered: int = Field(default=0, description="Log records waiting to be shipped to kdsm-manager.")
+
+
+class ControlGroupModel(BaseModel):
+    name: str
+    percent: float
+    eta: float | None = None
+    subtasks: list[ControlSubtaskModel] = Field(default_factory=list)
+
+
+class ControlThreadModel(BaseModel):
+    name: str
+    alive: bool
+    current_subtask: str | None = None
+
+
+class ControlSnapshotModel(BaseModel):
+    id: int
+    abort: bool
+    percent: float
+    steps: int
+    steps_done: float
+    eta: float | None = None
+    groups: list[ControlGroupModel] = Field(default_factory=list)
+    threads: list[ControlThreadModel] = Field(default_factory=list, description="Running groups or lease workers.")
+
+
+class _ControlRequestHandler(socketserver.StreamRequestHandler):
+    control_server: "ControlServer"
+
+    # maximum length of one command line
+    max_line_length = 64 * 1024
+
+    def handle(self) -> None:
+        while True:
+            line = self.rfile.readline(self.max_line_length)
+            if not line:
+                return
+            if not line.strip():
+                continue
+            try:
+                command = json.loads(line)
+                if type(command) is not dict:
+                    raise ValueError("Command must be a json object!")
+                response = {"ok": True, "result": self.control_server.handle(**command)}
+            except Exception as e:
+                response = {"ok": False, "error": f"{e.__class__.__name__}: {e}"}
+            try:
+                self.wfile.write(json.dumps(response, separators=(",", ":")).encode("utf-8") + b"\n")
+            except OSError:
+                return
+
+
+class _ControlUnixStreamServer(socketserver.ThreadingUnixStreamServer):
+    def server_bind(self) -> None:
+        super().server_bind()
+
+        # only the user of the process may control the task, the socket doesn't listen before the mode is set
+        os.chmod(self.server_address, 0o600)
+
+
+class ControlServer:
+    """
+    Serves a snapshot of the local state of a task and accepts abort commands on a unix domain socket, so supervisors
+    on the same host don't need a round trip to kdsm-manager. The protocol is line-delimited json, every command line
+    gets one response line:
+
+        {"command": "snapshot"} -> {"ok": true, "result": {...}}
+        {"command": "abort"} -> {"ok": true, "result": null}
+        {"command": "abort", "subtask": "name"} -> {"ok": true, "result": null}
+        invalid commands -> {"ok": false, "error": "..."}
+    """
+
+    def __init__(self, task: "Task", path: Path):
+        # task
+        self._task: "Task" = task
+
+        # path
+        self._path: Path = path
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # server
+        self._server: socketserver.BaseServer | None = None
+        self._thread: Thread | None = None
+
+    @property
+    def task(self) -> "Task":
+        return self._task
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _threads(self) -> list["Group"]:
+        return [group for group in self.task.abort_poller.groups if group.task is self.task]
+
+    def snapshot(self) -> ControlSnapshotModel:
+        """
+        Snapshot of the task from local state, without requests to kdsm-manager.
+
+        :return: Snapshot
+        """
+
+        log_buffered = {id(log_handler.subtask): log_handler.buffered for log_handler in self.task.log_shipper.handlers}
+        progress = self.task.progress()
+        groups = []
+        for group in self.task.groups:
+            group_progress = group.progress()
+            subtasks = []
+            for subtask in group.subtasks:
+                subtask_progress = subtask.progress()
+                subtasks.append(ControlSubtaskModel(name=subtask.name,
+                                                    title=subtask.title,
+                                                    status=subtask.local_status,
+                                                    steps=subtask.steps,
+                                                    current_step=subtask.current_step,
+                                                    percent=subtask_progress.percent,
+                                                    eta=subtask_progress.eta,
+                                                    abort=subtask.local_abort,
+                                                    log_buffered=log_buffered.get(id(subtask), 0)))
+            groups.append(ControlGroupModel(name=group.name, percent=group_progress.percent, eta=group_progress.eta, subtasks=subtasks))
+        threads = []
+        for thread in self._threads():
+            current_subtask = thread.current_subtask
+            threads.append(ControlThreadModel(name=thread.name,
+                                              alive=thread.is_alive(),
+                                              current_subtask=None if current_subtask is None else current_subtask.name))
+        return ControlSnapshotModel(id=self.task.id,
+                                    abort=self.task.abort,
+                                    percent=progress.percent,
+                                    steps=progress.steps,
+                                    steps_done=progress.steps_done,
+                                    eta=progress.eta,
+                                    groups=groups,
+                                    threads=threads)
+
+    def abort(self, subtask: str | None = None) -> None:
+        """
+        Abort the task or one subtask and stop the affected threads now instead of on the next poll. The threads are
+        stopped directly, so the abort never waits for a poll which is waiting for kdsm-manager.
+
+        :param subtask: Name of the subtask. Default aborts the whole task.
+        :return: None
+        """
+
+        if subtask is None:
+            self.task.logger.warning("Task aborted by control socket.")
+            self.task.abort = True
+            self._stop(self._threads())
+            return
+
+        for current_subtask in self.task.subtasks:
+            if current_subtask.name == subtask:
+                break
+        else:
+            raise KeyError(f"Subtask '{subtask}' not found!")
+        self.task.logger.warning(f"Subtask '{subtask}' aborted by control socket.")
+        current_subtask.abort = True
+        self._stop([thread for thread in self._threads() if thread.current_subtask is current_subtask])
+
+    @staticmethod
+    def _stop(threads: list["Group"]) -> None:
+        for thread in threads:
+            if thread.is_alive():
+                thread.stop()
+
+    def handle(self, command: str, **arguments: Any) -> Any:
+        """
+        Handle one command of the control socket.
+
+        :param command: Name of the command.
+        :param arguments: Arguments of the command.
+        :return: Json serializable result.
+        """
+
+        if command == "snapshot":
+            return self.snapshot(**arguments).model_dump(mode="json")
+        if command == "abort":
+            return self.abort(**arguments)
+        raise ValueError(f"Unknown command '{command}'!")
+
+    def start(self) -> None:
+        """
+        Serve in a background thread. A stale socket file of a previous run is replaced, a socket which is served by
+        another process isn't.
+
+        :return: None
+        """
+
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("Control socket needs unix domain sockets!")
+
+        with self._lock:
+            if self._server is not None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._remove_stale()
+
+            handler = type("ControlRequestHandler", (_ControlRequestHandler,), {"control_server": self})
+            server = _ControlUnixStreamServer(str(self.path), handler)
+            server.daemon_threads = True
+
+            self._server = server
+            self._thread = Thread(name=f"{self.__class__.__name__}-{counter()}", target=server.serve_forever, daemon=True)
+            self._thread.start()
+        logger.debug(f"Control socket listening on '{self.path}'.")
+
+    def _remove_stale(self) -> None:
+        try:
+            mode = self.path.lstat().st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError(f"Control socket path '{self.path}' exists and is not a socket!")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(self.path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # nobody serves it anymore
+                self.path.unlink(missing_ok=True)
+                return
+        raise RuntimeError(f"Control socket '{self.path}' is in use by another process!")
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._server is None:
+                return
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+            self.path.unlink(missing_ok=True)
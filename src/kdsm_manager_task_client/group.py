@@ -1,13 +1,17 @@
 from typing import TYPE_CHECKING, Optional
 from itertools import count
+import pickle
 import threading
+import time
 
+from requests.exceptions import Timeout
 from wiederverwendbar.default import Default
 from wiederverwendbar.logger import Logger, remove_logger
 from wiederverwendbar.threading import ExtendedThread, ThreadStop
 
+from kdsm_manager_task_client.progress import ProgressModel
 from kdsm_manager_task_client.task_status import TaskStatus
-from kdsm_manager_task_client.subtask import Subtask
+from kdsm_manager_task_client.subtask import LeaseLostError, Subtask
 
 if TYPE_CHECKING:
     from kdsm_manager_task_client.task import Task
@@ -31,12 +35,18 @@ class Group(ExtendedThread):
         # current_subtask
         self._current_subtask: Subtask | None = None
 
+        # ship_level_polled_at
+        self._ship_level_polled_at: float = 0.0
+
+        # stop_requested
+        self._stop_requested: bool = False
+
         super().__init__(group=None,
                          target=Default(),
                          name=f"{self.__class__.__name__}-{counter()}",
                          args=Default(),
                          kwargs=Default(),
-                         daemon=Default(),
+                         daemon=True,
                          cls_name=Default(),
                          logger=Default(),
                          ignore_stop=Default(),
@@ -74,15 +84,67 @@ class Group(ExtendedThread):
         with self._lock:
             return self._current_subtask
 
+    def progress(self) -> ProgressModel:
+        """
+        Progress of this group from local state. The subtasks run one after another, so the eta is the sum.
+
+        :return: Progress
+        """
+
+        return ProgressModel.sequential((subtask.progress(), subtask.weight) for subtask in self.subtasks)
+
+    def stop(self) -> None:
+        # the watchdog, the control socket and an interrupt may stop the group at the same time, stop it only once
+        with self._lock:
+            if self._stop_requested:
+                return
+            self._stop_requested = True
+        super().stop()
+
+    def start_watchdog(self) -> None:
+        # the watchdog runs in the abort poller of the task
+        self.task.abort_poller.register(self)
+
     @classmethod
     def check_abort(cls, group: "Group") -> bool:
-        if group.current_subtask is None:
+        current_subtask = group.current_subtask
+        if current_subtask is None:
             abort = group.task.abort
         else:
-            abort = group.current_subtask.abort
+            abort = group.poll_abort(subtask=current_subtask)
         if abort:
             group.stop()
-        return not abort
+            return False
+        group.poll_ship_level()
+        return True
+
+    def poll_abort(self, subtask: Subtask) -> bool:
+        """
+        Poll the abort flag of a subtask. A poll which timed out counts as not aborted, it's repeated on the next
+        interval.
+
+        :param subtask: Subtask to poll.
+        :return: Whether the subtask is aborted.
+        """
+
+        try:
+            return subtask.abort
+        except Timeout as e:
+            self.logger.warning(f"Polling abort of subtask '{subtask.name}' timed out: {e}")
+            return False
+
+    def poll_ship_level(self) -> None:
+        """
+        Poll the ship level of the running subtask, at most every log_ship_level_poll_interval seconds.
+
+        :return: None
+        """
+
+        poll_interval = self.task.settings.log_ship_level_poll_interval
+        current_subtask = self.current_subtask
+        if poll_interval is not None and current_subtask is not None and time.monotonic() - self._ship_level_polled_at >= poll_interval:
+            self._ship_level_polled_at = time.monotonic()
+            current_subtask.refresh_ship_level()
 
     def _set_subtask_status(self, subtask: Subtask, new_status: TaskStatus) -> None:
         self.logger.debug(f"Setting subtask '{subtask.name}' status to '{new_status.value}'.")
@@ -90,10 +152,34 @@ class Group(ExtendedThread):
 
     def loop(self) -> None:
         for subtask in self.subtasks:
-            # set current_subtask
-            with self._lock:
-                self._current_subtask = subtask
+            if not self._run_subtask(subtask=subtask):
+                break
 
+    def _run_subtask(self, subtask: Subtask) -> bool:
+        """
+        Run one subtask in this thread.
+
+        :param subtask: Subtask to run.
+        :return: False if the subtask was aborted.
+        """
+
+        # resume from checkpoint
+        if self.task.checkpoint is not None:
+            checkpoint = self.task.checkpoint.get(subtask.name)
+            if checkpoint is not None:
+                if checkpoint.status == TaskStatus.SUCCESS:
+                    self.logger.info(f"Skipping subtask '{subtask.name}', it already succeeded in a previous run.")
+                    subtask.restore(checkpoint=checkpoint)
+                    self._set_subtask_status(subtask=subtask, new_status=TaskStatus.SUCCESS)
+                    return True
+                self.logger.info(f"Resuming subtask '{subtask.name}' at step {checkpoint.current_step}.")
+                subtask.restore(checkpoint=checkpoint)
+
+        # set current_subtask
+        with self._lock:
+            self._current_subtask = subtask
+
+        try:
             # set subtask to status running
             self._set_subtask_status(subtask=subtask, new_status=TaskStatus.RUNNING)
 
@@ -102,20 +188,50 @@ class Group(ExtendedThread):
 
             # running payload
             try:
-                subtask.payload()
+                # lookup result cache
+                cache_key = None
+                cache_hit = False
+                if self.task.result_cache is not None:
+                    cache_key = self.task.result_cache.key(subtask)
+                    if cache_key is not None:
+                        cache_hit, subtask.result = self.task.result_cache.get(cache_key)
+
+                if cache_hit:
+                    subtask.logger.info(f"Payload skipped, result loaded from cache '{cache_key}'.")
+                    subtask.complete_steps()
+                else:
+                    subtask.result = subtask.payload()
                 subtask.stop(final_status=TaskStatus.SUCCESS)
                 self._set_subtask_status(subtask=subtask, new_status=TaskStatus.SUCCESS)
             except ThreadStop:
                 subtask.stop(final_status=TaskStatus.ABORTED)
                 self._set_subtask_status(subtask=subtask, new_status=TaskStatus.ABORTED)
-                break
+                return False
+            except LeaseLostError:
+                # another worker owns the subtask now, leave its status alone
+                subtask.stop(final_status=TaskStatus.ABORTED)
+                raise
             except Exception as e:
                 subtask.logger.exception(f"Subtask failed with exception:")
                 subtask.stop(final_status=TaskStatus.FAILED)
                 self._set_subtask_status(subtask=subtask, new_status=TaskStatus.FAILED)
                 raise e
 
+            # store result, the subtask already succeeded, so a failing cache write must not fail it
+            if cache_key is not None and not cache_hit:
+                try:
+                    self.task.result_cache.set(cache_key, subtask.result)
+                except (pickle.PicklingError, TypeError, AttributeError, OSError) as e:
+                    self.logger.warning(f"Storing result of subtask '{subtask.name}' in cache failed: {e}")
+        finally:
+            with self._lock:
+                self._current_subtask = None
+        return True
+
     def on_end(self) -> None:
+        # stop watchdog
+        self.task.abort_poller.unregister(self)
+
         # set current_subtask
         if self.current_subtask is not None:
             with self._lock:
@@ -0,0 +1,339 @@
+import os
+import socket
+import time
+import uuid
+from itertools import count
+from threading import Thread, Lock, Event
+from typing import TYPE_CHECKING
+
+from requests.exceptions import HTTPError, RequestException
+from wiederverwendbar.default import Default
+from wiederverwendbar.threading import ThreadStop
+
+from kdsm_manager_task_client.group import Group
+from kdsm_manager_task_client.request_scheduler import RequestPriority
+from kdsm_manager_task_client.subtask import LeaseLostError, Subtask
+from kdsm_manager_task_client.task_status import TaskStatus
+
+if TYPE_CHECKING:
+    from kdsm_manager_task_client.task import Task
+
+counter = count(1).__next__
+
+
+class LeaseKeeper:
+    """
+    Claims subtasks for the lease workers of one process and keeps their leases alive by heartbeat. A subtask is
+    claimable if all subtasks before it in its group succeeded and no other worker holds a valid lease on it, so
+    subtasks of a dead worker are claimed again after their lease expired.
+    """
+
+    def __init__(self,
+                 task: "Task",
+                 worker_id: str | Default = Default(),
+                 duration: float | Default = Default(),
+                 interval: float | Default = Default()):
+        # task
+        self._task: "Task" = task
+
+        # worker_id
+        if type(worker_id) is Default:
+            worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._worker_id: str = worker_id
+
+        # duration
+        if type(duration) is Default:
+            duration = 30.0
+        if duration <= 0:
+            raise ValueError("Lease duration must be greater than 0!")
+        self._duration: float = duration
+
+        # interval
+        if type(interval) is Default:
+            interval = duration / 3
+        if not 0 < interval < duration:
+            raise ValueError("Heartbeat interval must be greater than 0 and less than the lease duration!")
+        self._interval: float = interval
+
+        # lock
+        self._lock: Lock = Lock()
+        self._claim_lock: Lock = Lock()
+
+        # held leases by subtask name with the worker running it and the local expiry
+        self._leases: dict[str, tuple[Subtask, "LeaseWorker", float]] = {}
+
+        # local knowledge about the subtasks
+        self._succeeded: set[str] = set()
+        self._lost: set[str] = set()
+        self._blocked: set[Group] = set()
+
+        # thread
+        self._stopped: Event = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def task(self) -> "Task":
+        return self._task
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    @property
+    def duration(self) -> float:
+        return self._duration
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    @property
+    def leases(self) -> tuple[str, ...]:
+        with self._lock:
+            return tuple(self._leases)
+
+    def _lease_url(self, subtask: Subtask) -> str:
+        return self.task.api_url + f"/task/subtask/{subtask.name}/lease"
+
+    def _lease(self, method: str, subtask: Subtask) -> bool:
+        try:
+            self.task.request(method=method,
+                              url=self._lease_url(subtask),
+                              priority=RequestPriority.CONTROL,
+                              flow=subtask.name,
+                              params={"worker": self.worker_id, "duration": self.duration})
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 409:
+                return False
+            raise e
+        return True
+
+    def claim(self, worker: "LeaseWorker") -> tuple[Subtask | None, bool]:
+        """
+        Claim the next claimable subtask for a worker.
+
+        :param worker: Worker which will run the subtask.
+        :return: Claimed subtask or None and whether unfinished subtasks are left.
+        """
+
+        with self._claim_lock:
+            pending = False
+            for group in self.task.groups:
+                if group in self._blocked:
+                    continue
+                for subtask in group.subtasks:
+                    if subtask.name in self._succeeded:
+                        continue
+                    with self._lock:
+                        held = subtask.name in self._leases
+                    if held:
+                        pending = True
+                        break
+
+                    # only the head of a group can be claimed
+                    status = subtask.status
+                    if status == TaskStatus.SUCCESS:
+                        self._succeeded.add(subtask.name)
+                        continue
+                    if status in [TaskStatus.FAILED, TaskStatus.ABORTED]:
+                        self._blocked.add(group)
+                        break
+                    if subtask.name in self._lost:
+                        # the subtask object was stopped here, another worker has to finish it
+                        break
+                    pending = True
+                    if self._lease(method="POST", subtask=subtask):
+                        with self._lock:
+                            self._leases[subtask.name] = (subtask, worker, time.monotonic() + self.duration)
+                        return subtask, True
+                    break
+            return None, pending
+
+    def release(self, subtask: Subtask) -> None:
+        with self._lock:
+            lease = self._leases.pop(subtask.name, None)
+        if lease is None:
+            return
+        try:
+            self.task.request(method="DELETE",
+                              url=self._lease_url(subtask),
+                              priority=RequestPriority.CONTROL,
+                              flow=subtask.name,
+                              params={"worker": self.worker_id})
+        except RequestException as e:
+            # the lease expires anyway
+            self.task.logger.warning(f"Releasing lease of subtask '{subtask.name}' failed: {e}")
+
+    def check_lost(self) -> list[str]:
+        """
+        Log an error for the subtasks whose lease was lost here and which aren't finished. This process doesn't run
+        them again, so they are left to other workers or a new run.
+
+        :return: Names of the unfinished subtasks.
+        """
+
+        unfinished = []
+        for subtask in self.task.subtasks:
+            if subtask.name not in self._lost:
+                continue
+            try:
+                status = subtask.status
+            except RequestException:
+                status = None
+            if status not in [TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.ABORTED]:
+                unfinished.append(subtask.name)
+        if len(unfinished) > 0:
+            self.task.logger.error(f"Subtasks {', '.join(repr(name) for name in unfinished)} are unfinished, their leases were lost. "
+                                   f"If no other worker runs them, run the task again.")
+        return unfinished
+
+    def _lose(self, subtask: Subtask, worker: "LeaseWorker") -> None:
+        with self._lock:
+            if self._leases.pop(subtask.name, None) is None:
+                return
+        self._lost.add(subtask.name)
+        self.task.logger.warning(f"Lease of subtask '{subtask.name}' lost, stopping it.")
+        if worker.is_alive() and worker.current_subtask is subtask:
+            worker.raise_exception(LeaseLostError)
+
+    def heartbeat(self) -> None:
+        """
+        Renew all held leases once.
+
+        :return: None
+        """
+
+        with self._lock:
+            leases = list(self._leases.values())
+        for subtask, worker, expires_at in leases:
+            try:
+                renewed = self._lease(method="PUT", subtask=subtask)
+            except RequestException as e:
+                # keep the lease until it expired locally, the next heartbeat may succeed
+                if time.monotonic() < expires_at:
+                    self.task.logger.warning(f"Renewing lease of subtask '{subtask.name}' failed: {e}")
+                    continue
+                renewed = False
+            if not renewed:
+                self._lose(subtask=subtask, worker=worker)
+                continue
+            with self._lock:
+                if subtask.name in self._leases:
+                    self._leases[subtask.name] = (subtask, worker, time.monotonic() + self.duration)
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.heartbeat()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = Thread(name=f"{self.__class__.__name__}-{counter()}", target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class LeaseWorker(Group):
+    """
+    Runs claimed subtasks of all groups one after another until no unfinished subtask is left. Several workers in one
+    or many processes can run the subtasks of one task.
+    """
+
+    def __init__(self, lease_keeper: LeaseKeeper, poll_interval: float | Default = Default()):
+        # lease_keeper
+        self._lease_keeper: LeaseKeeper = lease_keeper
+
+        # poll_interval
+        if type(poll_interval) is Default:
+            poll_interval = 1.0
+        self._poll_interval: float = poll_interval
+
+        # subtask which was already stopped by the watchdog
+        self._aborted_subtask: Subtask | None = None
+
+        super().__init__()
+
+    @property
+    def lease_keeper(self) -> LeaseKeeper:
+        return self._lease_keeper
+
+    @property
+    def poll_interval(self) -> float:
+        return self._poll_interval
+
+    @classmethod
+    def check_abort(cls, group: "LeaseWorker") -> bool:
+        if group.task.abort:
+            group.stop()
+            return False
+
+        # an aborted subtask stops only itself, the worker claims the next one
+        current_subtask = group.current_subtask
+        if current_subtask is not None and current_subtask is not group._aborted_subtask and group.poll_abort(subtask=current_subtask):
+            group._aborted_subtask = current_subtask
+            group.stop()
+            return True
+
+        group.poll_ship_level()
+        return True
+
+    def _stop_handled(self) -> None:
+        # the worker goes on with the next subtask, so it can be stopped again
+        with self._lock:
+            self._stop_requested = False
+
+    def loop(self) -> None:
+        while not self.task.abort:
+            try:
+                if not self._claim_and_run():
+                    break
+            except LeaseLostError:
+                # the lease was lost right after the subtask ended
+                continue
+
+    def _claim_and_run(self) -> bool:
+        """
+        Claim one subtask and run it.
+
+        :return: False if no unfinished subtask is left.
+        """
+
+        try:
+            subtask, pending = self.lease_keeper.claim(worker=self)
+        except RequestException as e:
+            self.logger.warning(f"Claiming a subtask failed: {e}")
+            subtask, pending = None, True
+        if subtask is None:
+            if pending:
+                time.sleep(self.poll_interval)
+            return pending
+
+        self.logger.info(f"Claimed subtask '{subtask.name}'.")
+        try:
+            # a worker which lost the lease may have saved a checkpoint
+            if self.task.checkpoint is not None:
+                try:
+                    self.task.checkpoint.pull(subtask.name)
+                except RequestException as e:
+                    self.logger.warning(f"Pulling checkpoint of subtask '{subtask.name}' failed: {e}")
+                    return True
+            if not self._run_subtask(subtask=subtask):
+                self._stop_handled()
+        except ThreadStop:
+            # stopped before the payload was started
+            self._stop_handled()
+            self._set_subtask_status(subtask=subtask, new_status=TaskStatus.ABORTED)
+        except LeaseLostError:
+            self.logger.warning(f"Subtask '{subtask.name}' stopped, its lease was lost.")
+        except Exception:
+            # already logged by the subtask, its group is blocked now
+            pass
+        finally:
+            self.lease_keeper.release(subtask=subtask)
+        return True
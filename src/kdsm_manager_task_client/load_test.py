@@ -0,0 +1,331 @@
+import argparse
+import bisect
+import math
+import subprocess
+import sys
+import threading
+import time
+from typing import Any
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import requests
+from pydantic import BaseModel, Field
+from wiederverwendbar.default import Default
+
+from kdsm_manager_task_client.group import Group
+from kdsm_manager_task_client.settings import Settings
+from kdsm_manager_task_client.stand_in import StandInStatsModel, StandInTaskModel
+from kdsm_manager_task_client.subtask import Subtask
+from kdsm_manager_task_client.task import Task
+from kdsm_manager_task_client.task_status import TaskStatus
+
+
+class LoadTestResultModel(BaseModel):
+    groups: int = Field(..., description="Number of groups, which run concurrently.")
+    subtasks_per_group: int = Field(..., description="Number of subtasks per group, which run sequentially.")
+    steps: int = Field(..., description="Number of steps per subtask.")
+    step_duration: float = Field(..., description="Seconds per step.")
+    log_rate: float = Field(..., description="Target log lines per second per running subtask.")
+    log_rate_achieved: float = Field(..., description="Log lines per second per running subtask which were emitted.")
+    log_records_emitted: int = Field(..., description="Log records emitted by the subtasks.")
+    duration: float = Field(..., description="Seconds from start of the task run until the manager saw 100%.")
+    cpu_percent: float = Field(..., description="Client cpu time per wall time in percent of one core.")
+    rss_peak_mb: float | None = Field(..., description="Peak resident set size of the client in MB.")
+    requests: int = Field(..., description="Requests sent by the client.")
+    request_rate: float = Field(..., description="Requests per second.")
+    errors: int = Field(..., description="Responses with a non-ok status.")
+    latency_p50_ms: float = Field(..., description="Median request latency.")
+    latency_p90_ms: float
+    latency_p99_ms: float
+    latency_max_ms: float
+    log_records: int = Field(..., description="Log records received by the manager.")
+    log_records_rate: float = Field(..., description="Log records received by the manager per second.")
+    progress_lag_p50_ms: float = Field(..., description="Median delay between local task progress and the manager seeing it.")
+    progress_lag_p99_ms: float
+    progress_lag_max_ms: float
+    subtasks_succeeded: int
+    subtasks_failed: int
+    subtasks_aborted: int
+
+    def report(self) -> str:
+        return "\n".join(f"{name + ':':<22}{value}" for name, value in self.model_dump().items())
+
+
+class LoadTestSubtask(Subtask):
+    __slots__ = ("_step_duration",
+                 "_log_rate",
+                 "_emitted",
+                 "_running_time")
+
+    def __init__(self,
+                 name: str,
+                 steps: int,
+                 step_duration: float,
+                 log_rate: float):
+        super().__init__(name=name, title=f"Load Test {name}", steps=steps)
+
+        # step_duration
+        self._step_duration: float = step_duration
+
+        # log_rate
+        self._log_rate: float = log_rate
+
+        # emitted log lines and seconds in payload
+        self._emitted: int = 0
+        self._running_time: float = 0.0
+
+    @property
+    def emitted(self) -> int:
+        return self._emitted
+
+    @property
+    def running_time(self) -> float:
+        return self._running_time
+
+    def payload(self):
+        started_at = time.monotonic()
+        lines_due = 0.0
+        for step in range(self.steps):
+            step_started_at = time.monotonic()
+
+            # whole lines of this step, the fraction is carried to the next steps, so low rates aren't rounded to 0
+            lines_due += self._log_rate * self._step_duration
+            lines = int(lines_due + 1e-9)
+            lines_due -= lines
+
+            # spread the log lines over the step
+            for line in range(lines):
+                self.logger.info(f"Step {step} line {line}.")
+                self._emitted += 1
+                time.sleep(max(step_started_at + (line + 1) * self._step_duration / (lines + 1) - time.monotonic(), 0.0))
+            time.sleep(max(step_started_at + self._step_duration - time.monotonic(), 0.0))
+
+            self.next_step()
+        self._running_time = time.monotonic() - started_at
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Nearest rank percentile.
+
+    :param values: Sorted values.
+    :param p: Percentile between 0 and 100.
+    :return: Percentile or 0.0 if there are no values.
+    """
+
+    if len(values) == 0:
+        return 0.0
+    return values[min(max(math.ceil(p / 100 * len(values)) - 1, 0), len(values) - 1)]
+
+
+def progress_lags(local: list[tuple[float, float]], manager: list[tuple[float, float]]) -> list[float]:
+    """
+    Delay of every percent update of the manager to the first local sample which reached that percent.
+
+    :param local: Wall clock time and local percent, ascending.
+    :param manager: Wall clock time and percent seen by the manager.
+    :return: Lags in seconds.
+    """
+
+    # running maximum, so the local samples can be searched by percent
+    times, percents, highest = [], [], -1.0
+    for sampled_at, percent in local:
+        if percent > highest:
+            highest = percent
+            times.append(sampled_at)
+            percents.append(percent)
+
+    lags = []
+    for updated_at, percent in manager:
+        index = bisect.bisect_left(percents, percent - 0.01)
+        if index < len(times):
+            lags.append(max(updated_at - times[index], 0.0))
+    return lags
+
+
+def run_load_test(groups: int,
+                  subtasks_per_group: int,
+                  steps: int,
+                  step_duration: float | Default = Default(),
+                  log_rate: float | Default = Default(),
+                  latency: float | Default = Default(),
+                  latency_jitter: float | Default = Default(),
+                  error_rate: float | Default = Default(),
+                  error_pattern: str | Default = Default(),
+                  settings: dict[str, Any] | None = None) -> LoadTestResultModel:
+    """
+    Run a synthetic task against a stand-in manager in a child process, so only the client is measured.
+
+    :param groups: Number of groups, which run concurrently.
+    :param subtasks_per_group: Number of subtasks per group, which run sequentially.
+    :param steps: Number of steps per subtask.
+    :param step_duration: Seconds per step. Default is 0.1.
+    :param log_rate: Log lines per second per running subtask. Default is 10.
+    :param latency: Seconds the stand-in adds to every request. Default is 0.
+    :param latency_jitter: Maximum random seconds the stand-in adds to the latency. Default is 0.
+    :param error_rate: Probability that the stand-in fails a request with 503. Default is 0.
+    :param error_pattern: Only requests with a matching path fail. Default is all.
+    :param settings: Additional settings of the task.
+    :return: Result
+    """
+
+    if type(step_duration) is Default:
+        step_duration = 0.1
+    if type(log_rate) is Default:
+        log_rate = 10.0
+    if type(latency) is Default:
+        latency = 0.0
+    if type(latency_jitter) is Default:
+        latency_jitter = 0.0
+    if type(error_rate) is Default:
+        error_rate = 0.0
+    if type(error_pattern) is Default:
+        error_pattern = ".*"
+
+    # start stand-in
+    stand_in = subprocess.Popen([sys.executable, "-m", "kdsm_manager_task_client.stand_in",
+                                 "--latency", str(latency),
+                                 "--latency-jitter", str(latency_jitter),
+                                 "--error-rate", str(error_rate),
+                                 "--error-pattern", error_pattern],
+                                stdout=subprocess.PIPE,
+                                text=True)
+    try:
+        api_url = stand_in.stdout.readline().strip()
+        if api_url == "":
+            raise RuntimeError("Stand-in manager did not start!")
+        settings = Settings(**{"log_console": False,
+                               "progress_push_interval": 0.5,
+                               **(settings or {}),
+                               "id": 1,
+                               "api_token": "load-test",
+                               "api_url": api_url,
+                               "ssl": False})
+
+        # measure every request of the client
+        latencies: list[float] = []
+        errors = [0]
+        lock = threading.Lock()
+
+        def on_response(response: requests.Response, *_args, **_kwargs) -> None:
+            with lock:
+                latencies.append(response.elapsed.total_seconds())
+                if not response.ok:
+                    errors[0] += 1
+
+        session = Task.create_session(settings=settings)
+        session.hooks["response"].append(on_response)
+        task = Task(settings=settings, session=session)
+        task.subtask(*[Group(*[LoadTestSubtask(name=f"subtask_{group}_{subtask}",
+                                               steps=steps,
+                                               step_duration=step_duration,
+                                               log_rate=log_rate)
+                               for subtask in range(subtasks_per_group)])
+                       for group in range(groups)],
+                     delete_subtasks=True)
+        with lock:
+            latencies.clear()
+            errors[0] = 0
+
+        # sample local progress
+        local_progress: list[tuple[float, float]] = []
+        sampling = threading.Event()
+
+        def sample() -> None:
+            while not sampling.wait(0.05):
+                local_progress.append((time.time(), task.progress().percent))
+
+        sampler = threading.Thread(name="load-test-sampler", target=sample, daemon=True)
+
+        # run
+        cpu_started = time.process_time()
+        started_at = time.time()
+        sampler.start()
+        task.run()
+        ended_at = time.time()
+        sampling.set()
+        sampler.join()
+        local_progress.append((time.time(), task.progress().percent))
+        task.shutdown()
+        cpu = time.process_time() - cpu_started
+
+        # collect from stand-in
+        stand_in_url = f"http://{api_url}/stand-in"
+        stand_in_stats = StandInStatsModel(**requests.get(stand_in_url + "/stats").json())
+        stand_in_task = StandInTaskModel(**requests.get(stand_in_url + f"/task/{settings.id}").json())
+    finally:
+        stand_in.terminate()
+        stand_in.wait()
+
+    # the run ends when the manager saw the last percent update
+    if len(stand_in_task.percent_history) > 0:
+        ended_at = max(ended_at, stand_in_task.percent_history[-1][0])
+    duration = max(ended_at - started_at, 1e-9)
+    latencies.sort()
+    lags = sorted(progress_lags(local=local_progress, manager=stand_in_task.percent_history))
+    statuses = [subtask.status for subtask in stand_in_task.subtasks.values()]
+    emitted = sum(subtask.emitted for subtask in task.subtasks)
+    running_time = sum(subtask.running_time for subtask in task.subtasks)
+
+    return LoadTestResultModel(groups=groups,
+                               subtasks_per_group=subtasks_per_group,
+                               steps=steps,
+                               step_duration=step_duration,
+                               log_rate=log_rate,
+                               log_rate_achieved=round(emitted / running_time, 1) if running_time > 0 else 0.0,
+                               log_records_emitted=emitted,
+                               duration=round(duration, 3),
+                               cpu_percent=round(cpu / duration * 100, 1),
+                               rss_peak_mb=None if resource is None else round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                               requests=len(latencies),
+                               request_rate=round(len(latencies) / duration, 1),
+                               errors=errors[0],
+                               latency_p50_ms=round(percentile(latencies, 50) * 1000, 2),
+                               latency_p90_ms=round(percentile(latencies, 90) * 1000, 2),
+                               latency_p99_ms=round(percentile(latencies, 99) * 1000, 2),
+                               latency_max_ms=round(percentile(latencies, 100) * 1000, 2),
+                               log_records=stand_in_stats.log_records,
+                               log_records_rate=round(stand_in_stats.log_records / duration, 1),
+                               progress_lag_p50_ms=round(percentile(lags, 50) * 1000, 2),
+                               progress_lag_p99_ms=round(percentile(lags, 99) * 1000, 2),
+                               progress_lag_max_ms=round(percentile(lags, 100) * 1000, 2),
+                               subtasks_succeeded=statuses.count(TaskStatus.SUCCESS),
+                               subtasks_failed=statuses.count(TaskStatus.FAILED),
+                               subtasks_aborted=statuses.count(TaskStatus.ABORTED))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m kdsm_manager_task_client.load_test",
+                                     description="Drive a synthetic task with N groups x M subtasks x K steps against a local stand-in "
+                                                 "manager and report cpu, rss, request rate, latency and progress lag of the client.")
+    parser.add_argument("--groups", "-n", type=int, default=10, help="Number of groups, which run concurrently.")
+    parser.add_argument("--subtasks", "-m", type=int, default=5, help="Number of subtasks per group, which run sequentially.")
+    parser.add_argument("--steps", "-k", type=int, default=10, help="Number of steps per subtask.")
+    parser.add_argument("--step-duration", type=float, default=0.1, help="Seconds per step.")
+    parser.add_argument("--log-rate", "-l", type=float, default=10.0, help="Log lines per second per running subtask.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the stand-in adds to every request.")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Maximum random seconds the stand-in adds to the latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that the stand-in fails a request with 503.")
+    parser.add_argument("--error-pattern", default=".*", help="Only requests with a matching path fail, e.g. '/log$'.")
+    parser.add_argument("--json", action="store_true", help="Print the result as json.")
+    args = parser.parse_args(argv)
+
+    result = run_load_test(groups=args.groups,
+                           subtasks_per_group=args.subtasks,
+                           steps=args.steps,
+                           step_duration=args.step_duration,
+                           log_rate=args.log_rate,
+                           latency=args.latency,
+                           latency_jitter=args.latency_jitter,
+                           error_rate=args.error_rate,
+                           error_pattern=args.error_pattern)
+    print(result.model_dump_json(indent=4) if args.json else result.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -41,13 +41,12 @@ class LogFormatter(logging.Formatter):
             entry["exception"] = exception
 
         # add extra information
-        if len(self.DEFAULT_PROPERTIES) != len(record.__dict__):
-            contextual_extra = set(record.__dict__).difference(self.DEFAULT_PROPERTIES)
-            if contextual_extra:
-                extra = {}
-                for key in contextual_extra:
-                    extra[key] = record.__dict__[key]
-                entry["extra"] = extra
+        contextual_extra = set(record.__dict__).difference(self.DEFAULT_PROPERTIES)
+        if contextual_extra:
+            extra = {}
+            for key in contextual_extra:
+                extra[key] = record.__dict__[key]
+            entry["extra"] = extra
 
         entry_model = SubtaskLogModel(**entry)
 
@@ -1,5 +1,8 @@
 import atexit
 import logging
+import math
+import random
+import time
 from threading import Thread, Lock, Event
 from itertools import count
 from typing import Optional, TYPE_CHECKING
@@ -7,12 +10,17 @@ from typing import Optional, TYPE_CHECKING
 from wiederverwendbar.default import Default
 
 from kdsm_manager_task_client.log_formatter import LogFormatter
+from kdsm_manager_task_client.subtask_log import SubtaskLogModel
 
 if TYPE_CHECKING:
+    from kdsm_manager_task_client.log_shipper import LogShipper
     from kdsm_manager_task_client.subtask import Subtask
 
 counter = count(1).__next__
 
+# the formatter is stateless, so all handlers share one
+formatter = LogFormatter()
+
 
 class LogHandler(logging.Handler):
     def __init__(self,
@@ -20,14 +28,20 @@ class LogHandler(logging.Handler):
                  level=logging.NOTSET,
                  buffer_size: int | Default = Default(),
                  buffer_periodical_flush_timing: float | None | Default = Default(),
-                 buffer_early_flush_level: int | Default = Default()):
+                 buffer_early_flush_level: int | Default = Default(),
+                 shipper: Optional["LogShipper"] = None,
+                 deduplicate: bool | Default = Default(),
+                 rate_limit: float | None | Default = Default(),
+                 rate_limit_burst: int | Default = Default(),
+                 rate_limit_exempt_level: int | Default = Default(),
+                 sampling: dict[int, float] | None | Default = Default()):
         super().__init__(level=level)
 
         # subtask
         self._subtask: "Subtask" = subtask
 
         # set formatter
-        self.formatter: LogFormatter = LogFormatter()
+        self.formatter: LogFormatter = formatter
 
         # buffer
         self._buffer: list[logging.LogRecord] = []
@@ -47,12 +61,55 @@ class LogHandler(logging.Handler):
             buffer_early_flush_level = logging.CRITICAL
         self._buffer_early_flush_level: int = buffer_early_flush_level
 
+        # deduplicate
+        if type(deduplicate) is Default:
+            deduplicate = True
+        self._deduplicate: bool = deduplicate
+        self._pending: logging.LogRecord | None = None
+        self._pending_count: int = 0
+        self._pending_last: logging.LogRecord | None = None
+
+        # rate_limit
+        if type(rate_limit) is Default:
+            rate_limit = None
+        if rate_limit is not None and rate_limit <= 0:
+            raise ValueError("Rate limit must be greater than 0!")
+        self._rate_limit: float | None = rate_limit
+
+        # rate_limit_burst
+        if type(rate_limit_burst) is Default:
+            rate_limit_burst = 1 if rate_limit is None else max(1, math.ceil(rate_limit))
+        self._rate_limit_burst: int = rate_limit_burst
+        self._rate_limit_buckets: dict[str, tuple[float, float]] = {}
+
+        # rate_limit_exempt_level
+        if type(rate_limit_exempt_level) is Default:
+            rate_limit_exempt_level = logging.ERROR
+        self._rate_limit_exempt_level: int = rate_limit_exempt_level
+
+        # sampling
+        if type(sampling) is Default:
+            sampling = None
+        self._sampling: dict[int, float] = dict(sampling or {})
+
+        # counters
+        self._deduplicated_count: int = 0
+        self._dropped_count: int = 0
+        self._dropped_per_logger: dict[str, int] = {}
+
         self._buffer_timer_thread: Thread | None = None
         self._buffer_lock: Lock = Lock()
+        self._send_lock: Lock = Lock()
         self._stopper: Optional[callable] = None
 
+        # shipper
+        self._shipper: Optional["LogShipper"] = shipper
+
         # setup periodical flush
-        if self._buffer_periodical_flush_timing is not None:
+        if self._shipper is not None:
+            # the shipper flushes periodically
+            self._shipper.register(self)
+        elif self._buffer_periodical_flush_timing is not None:
             # set exit event
             atexit.register(self.close)
 
@@ -70,29 +127,150 @@ class LogHandler(logging.Handler):
             # launch thread
             self._stopper, self._buffer_timer_thread = call_repeatedly(interval=self._buffer_periodical_flush_timing, func=self.flush)
 
+    @property
+    def subtask(self) -> "Subtask":
+        return self._subtask
+
+    @property
+    def buffered(self) -> int:
+        """
+        Number of records waiting in the buffer to be shipped.
+        """
+
+        with self._buffer_lock:
+            return len(self._buffer) + (0 if self._pending is None else 1)
+
+    @property
+    def deduplicated_count(self) -> int:
+        with self._buffer_lock:
+            return self._deduplicated_count
+
+    @property
+    def dropped_count(self) -> int:
+        with self._buffer_lock:
+            return self._dropped_count
+
+    def _is_repeat(self, record: logging.LogRecord) -> bool:
+        return (self._pending is not None
+                and record.name == self._pending.name
+                and record.levelno == self._pending.levelno
+                and record.msg == self._pending.msg)
+
+    def _admit(self, record: logging.LogRecord) -> bool:
+        # sampling by level
+        probability = self._sampling.get(record.levelno)
+        admitted = probability is None or random.random() < probability
+
+        # rate limit by logger
+        if admitted and self._rate_limit is not None and record.levelno < self._rate_limit_exempt_level:
+            now = time.monotonic()
+            tokens, last = self._rate_limit_buckets.get(record.name, (self._rate_limit_burst, now))
+            tokens = min(self._rate_limit_burst, tokens + (now - last) * self._rate_limit)
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                admitted = False
+            self._rate_limit_buckets[record.name] = (tokens, now)
+
+        if not admitted:
+            self._dropped_count += 1
+            self._dropped_per_logger[record.name] = self._dropped_per_logger.get(record.name, 0) + 1
+            return False
+
+        # report records dropped since the last admitted record of this logger
+        dropped = self._dropped_per_logger.pop(record.name, 0)
+        if dropped > 0:
+            record.dropped_count = dropped
+        return True
+
+    def _push_pending(self) -> None:
+        if self._pending is None:
+            return
+        if self._pending_count > 1:
+            self._pending.repeat_count = self._pending_count
+            self._pending.first_timestamp = self._pending.created
+            self._pending.last_timestamp = self._pending_last.created
+            # repeats share the template only, so the values of the last one are shipped as well
+            try:
+                self._pending.last_message = self._pending_last.getMessage()
+            except Exception:
+                self.handleError(self._pending_last)
+        self._buffer.append(self._pending)
+        self._pending = None
+        self._pending_count = 0
+        self._pending_last = None
+
     def emit(self, record: logging.LogRecord) -> None:
+        # ship level, the logger checks it as well before calling the handler
+        if record.levelno < self.level:
+            return
+
         with self._buffer_lock:
-            self._buffer.append(record)
+            # collapse consecutive identical records
+            if self._deduplicate and self._is_repeat(record):
+                self._pending_count += 1
+                self._pending_last = record
+                self._deduplicated_count += 1
+                return
+
+            # sampling and rate limit
+            if not self._admit(record):
+                return
 
-        if len(self._buffer) >= self._buffer_size or record.levelno >= self._buffer_early_flush_level:
+            self._push_pending()
+            if self._deduplicate:
+                self._pending = record
+                self._pending_count = 1
+                self._pending_last = record
+            else:
+                self._buffer.append(record)
+            buffered = len(self._buffer) + (0 if self._pending is None else 1)
+            flush = buffered >= self._buffer_size or record.levelno >= self._buffer_early_flush_level
+
+        if flush:
             self.flush()
 
     def flush(self):
-        if len(self._buffer) == 0:
+        # take the records out of the buffer, so emitting and draining never wait for the manager
+        with self._buffer_lock:
+            self._push_pending()
+            if len(self._buffer) == 0:
+                return
+            records = self._buffer
+            self._buffer = []
+
+        formated_records = []
+        for record in records:
+            try:
+                formated_records.append(self.formatter.format(record))
+            except Exception:
+                self.handleError(record)
+        if len(formated_records) == 0:
             return
 
-        with self._buffer_lock:
-            formated_records = []
-            for record in self._buffer:
-                try:
-                    formated_record = self.formatter.format(record)
-                    formated_records.append(formated_record)
-                except Exception:
-                    self.handleError(record)
-                if len(formated_records) == 0:
-                    continue
+        # keep the order of the shipped batches
+        with self._send_lock:
             self._subtask.log(formated_records=formated_records)
-            self.empty_buffer()
+
+    def drain(self) -> list[SubtaskLogModel]:
+        """
+        Take all buffered records out of the buffer without shipping them.
+
+        :return: Formatted records.
+        """
+
+        with self._buffer_lock:
+            self._push_pending()
+            records = self._buffer
+            self._buffer = []
+
+        formated_records = []
+        for record in records:
+            try:
+                formated_records.append(self.formatter.format(record))
+            except Exception:
+                self.handleError(record)
+        return formated_records
 
     def empty_buffer(self) -> None:
         """
@@ -112,5 +290,7 @@ class LogHandler(logging.Handler):
 
         if self._stopper:
             self._stopper()
+        if self._shipper is not None:
+            self._shipper.unregister(self)
         self.flush()
         super().close()
@@ -0,0 +1,94 @@
+import logging
+from itertools import count
+from threading import Thread, Lock, Event
+from typing import TYPE_CHECKING
+
+from wiederverwendbar.default import Default
+from wiederverwendbar.threading import handle_exception
+
+if TYPE_CHECKING:
+    from kdsm_manager_task_client.log_handler import LogHandler
+
+counter = count(1).__next__
+
+
+class LogShipper:
+    """
+    Flushes the buffers of all registered log handlers periodically from one thread.
+    A shipper can be shared between multiple tasks.
+    """
+
+    def __init__(self,
+                 interval: float | Default = Default(),
+                 logger: logging.Logger | Default = Default()):
+        # interval
+        if type(interval) is Default:
+            interval = 5.0
+        self._interval: float = interval
+
+        # name
+        self._name: str = f"{self.__class__.__name__}-{counter()}"
+
+        # logger
+        if type(logger) is Default:
+            logger = logging.getLogger(self._name)
+        self._logger: logging.Logger = logger
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # handlers
+        self._handlers: list["LogHandler"] = []
+
+        # thread
+        self._stopped: Event = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    @property
+    def handlers(self) -> tuple["LogHandler", ...]:
+        with self._lock:
+            return tuple(self._handlers)
+
+    def register(self, handler: "LogHandler") -> None:
+        with self._lock:
+            if handler not in self._handlers:
+                self._handlers.append(handler)
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = Thread(name=self._name, target=self._loop, daemon=True)
+                self._thread.start()
+
+    def unregister(self, handler: "LogHandler") -> None:
+        with self._lock:
+            if handler in self._handlers:
+                self._handlers.remove(handler)
+
+    def flush(self) -> None:
+        """
+        Flush all registered handlers.
+
+        :return: None
+        """
+
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except Exception as e:
+                handle_exception(msg=f"{self._name} failed to flush {handler}", e=e, logger=self._logger, chain=False)
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def stop(self) -> None:
+        """
+        Stop the periodical flush and flush all handlers a last time.
+
+        :return: None
+        """
+
+        self._stopped.set()
+        self.flush()
@@ -0,0 +1,113 @@
+from threading import Lock
+from typing import Iterable
+
+from pydantic import BaseModel
+from wiederverwendbar.default import Default
+
+
+class ProgressModel(BaseModel):
+    percent: float
+    steps: int
+    steps_done: float
+    eta: float | None = None
+
+    @classmethod
+    def sequential(cls, progresses: Iterable[tuple["ProgressModel", float]]) -> "ProgressModel":
+        """
+        Roll up progresses which run one after another. The percent is weighted and the eta is the sum.
+
+        :param progresses: Tuples of progress and weight.
+        :return: Rolled up progress.
+        """
+
+        return cls._roll_up(progresses=progresses, parallel=False)
+
+    @classmethod
+    def parallel(cls, progresses: Iterable[tuple["ProgressModel", float]]) -> "ProgressModel":
+        """
+        Roll up progresses which run at the same time. The percent is weighted and the eta is the maximum.
+
+        :param progresses: Tuples of progress and weight.
+        :return: Rolled up progress.
+        """
+
+        return cls._roll_up(progresses=progresses, parallel=True)
+
+    @classmethod
+    def _roll_up(cls, progresses: Iterable[tuple["ProgressModel", float]], parallel: bool) -> "ProgressModel":
+        steps = 0
+        steps_done = 0.0
+        weight_total = 0.0
+        weight_done = 0.0
+        etas = []
+        eta_known = True
+        for progress, weight in progresses:
+            steps += progress.steps
+            steps_done += progress.steps_done
+            weight_total += weight
+            weight_done += weight * progress.percent / 100
+            if progress.eta is None:
+                eta_known = False
+            else:
+                etas.append(progress.eta)
+
+        if weight_total > 0:
+            percent = weight_done / weight_total * 100
+        else:
+            percent = 100.0
+
+        eta = None
+        if percent >= 100:
+            eta = 0.0
+        elif eta_known:
+            eta = (max(etas) if parallel else sum(etas)) if len(etas) > 0 else 0.0
+
+        return cls(percent=percent, steps=steps, steps_done=steps_done, eta=eta)
+
+
+class EtaEstimator:
+    """
+    Estimates the duration of a step per subtask type by an exponential moving average of the observed step durations.
+    """
+
+    def __init__(self, alpha: float | Default = Default()):
+        # alpha
+        if type(alpha) is Default:
+            alpha = 0.3
+        if not 0 < alpha <= 1:
+            raise ValueError("Alpha must be greater than 0 and less or equal than 1!")
+        self._alpha: float = alpha
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # seconds per step by subtask type
+        self._step_durations: dict[str, float] = {}
+
+    @property
+    def alpha(self) -> float:
+        return self._alpha
+
+    def observe(self, key: str, step_duration: float) -> None:
+        with self._lock:
+            previous = self._step_durations.get(key)
+            if previous is None:
+                self._step_durations[key] = step_duration
+            else:
+                self._step_durations[key] = previous + self._alpha * (step_duration - previous)
+
+    def estimate(self, key: str) -> float | None:
+        """
+        Estimated seconds per step of a subtask type. Falls back to the mean over all types.
+
+        :param key: Subtask type.
+        :return: Seconds per step or None if nothing was observed yet.
+        """
+
+        with self._lock:
+            step_duration = self._step_durations.get(key)
+            if step_duration is not None:
+                return step_duration
+            if len(self._step_durations) == 0:
+                return None
+            return sum(self._step_durations.values()) / len(self._step_durations)
@@ -0,0 +1,155 @@
+import contextlib
+import time
+from collections import OrderedDict, deque
+from enum import Enum
+from threading import Condition
+from typing import Iterator
+
+from pydantic import BaseModel
+from wiederverwendbar.default import Default
+
+
+class RequestPriority(str, Enum):
+    CONTROL = "control"
+    STATUS = "status"
+    PROGRESS = "progress"
+    LOG = "log"
+    BULK = "bulk"
+
+
+class RequestPriorityStatsModel(BaseModel):
+    requests: int = 0
+    queued: int = 0
+    in_flight: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    @property
+    def wait_mean(self) -> float:
+        if self.requests == 0:
+            return 0.0
+        return self.wait_total / self.requests
+
+
+class _Ticket:
+    __slots__ = ("priority", "flow", "queued_at")
+
+    def __init__(self, priority: RequestPriority, flow: str):
+        self.priority: RequestPriority = priority
+        self.flow: str = flow
+        self.queued_at: float = time.perf_counter()
+
+
+class RequestScheduler:
+    """
+    Limits the requests in flight globally and per priority. Waiting requests are granted by priority and round-robin
+    across flows (e.g. subtasks) within the same priority. A scheduler can be shared between multiple tasks.
+    """
+
+    def __init__(self,
+                 max_in_flight: int | Default = Default(),
+                 max_in_flight_per_priority: dict[RequestPriority, int] | Default = Default()):
+        # max_in_flight
+        if type(max_in_flight) is Default:
+            max_in_flight = 10
+        if max_in_flight < 1:
+            raise ValueError("Max in flight must be greater than 0!")
+        self._max_in_flight: int = max_in_flight
+
+        # max_in_flight_per_priority
+        if type(max_in_flight_per_priority) is Default:
+            max_in_flight_per_priority = {}
+        self._max_in_flight_per_priority: dict[RequestPriority, int] = {priority: max_in_flight_per_priority.get(priority, max_in_flight)
+                                                                        for priority in RequestPriority}
+
+        # condition
+        self._condition: Condition = Condition()
+
+        # queues by priority, each with one queue per flow in round-robin order
+        self._queues: dict[RequestPriority, OrderedDict[str, deque[_Ticket]]] = {priority: OrderedDict() for priority in RequestPriority}
+
+        # in flight
+        self._in_flight: int = 0
+
+        # stats
+        self._stats: dict[RequestPriority, RequestPriorityStatsModel] = {priority: RequestPriorityStatsModel() for priority in RequestPriority}
+
+    @property
+    def max_in_flight(self) -> int:
+        return self._max_in_flight
+
+    @property
+    def in_flight(self) -> int:
+        with self._condition:
+            return self._in_flight
+
+    def stats(self) -> dict[RequestPriority, RequestPriorityStatsModel]:
+        with self._condition:
+            return {priority: stats.model_copy() for priority, stats in self._stats.items()}
+
+    def _next(self) -> _Ticket | None:
+        if self._in_flight >= self._max_in_flight:
+            return None
+        for priority in RequestPriority:
+            if self._stats[priority].in_flight >= self._max_in_flight_per_priority[priority]:
+                continue
+            flows = self._queues[priority]
+            if len(flows) > 0:
+                return next(iter(flows.values()))[0]
+        return None
+
+    def _grant(self, ticket: _Ticket) -> None:
+        flows = self._queues[ticket.priority]
+        queue = flows[ticket.flow]
+        queue.popleft()
+        if len(queue) == 0:
+            del flows[ticket.flow]
+        else:
+            # next request of this flow waits behind the other flows
+            flows.move_to_end(ticket.flow)
+
+        wait = time.perf_counter() - ticket.queued_at
+        stats = self._stats[ticket.priority]
+        stats.requests += 1
+        stats.queued -= 1
+        stats.in_flight += 1
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+        self._in_flight += 1
+
+    @contextlib.contextmanager
+    def slot(self, priority: RequestPriority, flow: str = "") -> Iterator[None]:
+        """
+        Wait for a free slot and hold it while the context is active.
+
+        :param priority: Priority of the request.
+        :param flow: Flow of the request, flows of the same priority are served round-robin.
+        :return: None
+        """
+
+        ticket = _Ticket(priority=priority, flow=flow)
+        with self._condition:
+            self._queues[priority].setdefault(flow, deque()).append(ticket)
+            self._stats[priority].queued += 1
+            try:
+                while self._next() is not ticket:
+                    # wait with timeout, so the thread stays interruptible
+                    self._condition.wait(timeout=0.1)
+            except BaseException:
+                # interrupted while waiting, e.g. by ThreadStop
+                self._queues[priority][flow].remove(ticket)
+                if len(self._queues[priority][flow]) == 0:
+                    del self._queues[priority][flow]
+                self._stats[priority].queued -= 1
+                self._condition.notify_all()
+                raise
+            self._grant(ticket)
+            # a further request may fit into the remaining slots
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._stats[priority].in_flight -= 1
+                self._condition.notify_all()
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Any, TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from kdsm_manager_task_client.task_data import TaskData
+
+if TYPE_CHECKING:
+    from kdsm_manager_task_client.subtask import Subtask
+
+
+class ResultCacheStatsModel(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+class ResultCache:
+    FILE_SUFFIX = ".pickle"
+
+    def __init__(self,
+                 path: Path,
+                 max_size: int | None = None,
+                 max_age: float | None = None):
+        # path
+        self._path: Path = path
+
+        # max_size
+        self._max_size: int | None = max_size
+
+        # max_age
+        self._max_age: float | None = max_age
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # stats
+        self._stats: ResultCacheStatsModel = ResultCacheStatsModel()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def max_size(self) -> int | None:
+        return self._max_size
+
+    @property
+    def max_age(self) -> float | None:
+        return self._max_age
+
+    @property
+    def stats(self) -> ResultCacheStatsModel:
+        with self._lock:
+            return self._stats.model_copy()
+
+    @classmethod
+    def hash(cls, *parts: Any) -> str:
+        """
+        Hash the given parts into a fingerprint. Bytes and strings are hashed as they are, paths by the content of the
+        file, task data by its raw json and all other objects by their json representation.
+
+        :param parts: Parts to hash.
+        :return: Hex digest.
+        """
+
+        hasher = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                hasher.update(part)
+            elif isinstance(part, str):
+                hasher.update(part.encode("utf-8"))
+            elif isinstance(part, TaskData):
+                hasher.update(part.sha256.encode("utf-8"))
+            elif isinstance(part, Path):
+                with part.open("rb") as file:
+                    for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                        hasher.update(chunk)
+            else:
+                hasher.update(json.dumps(part, sort_keys=True, default=cls._json_default).encode("utf-8"))
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _json_default(value: Any) -> Any:
+        # task data nested in other parts
+        if isinstance(value, TaskData):
+            return value.sha256
+        return str(value)
+
+    def key(self, subtask: "Subtask") -> str | None:
+        fingerprint = subtask.fingerprint()
+        if fingerprint is None:
+            return None
+        return self.hash(subtask.__class__.__module__, subtask.__class__.__qualname__, subtask.name, fingerprint)
+
+    def _file_path(self, key: str) -> Path:
+        return self.path / f"{key}{self.FILE_SUFFIX}"
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """
+        Get a cached result.
+
+        :param key: Key of the result.
+        :return: Tuple of hit and result. The result is None on a miss.
+        """
+
+        file_path = self._file_path(key)
+        try:
+            if self.max_age is not None and time.time() - file_path.stat().st_mtime > self.max_age:
+                file_path.unlink(missing_ok=True)
+                with self._lock:
+                    self._stats.evictions += 1
+                raise FileNotFoundError(file_path)
+            with file_path.open("rb") as file:
+                result = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            with self._lock:
+                self._stats.misses += 1
+            return False, None
+
+        with self._lock:
+            self._stats.hits += 1
+        return True, result
+
+    def set(self, key: str, result: Any) -> None:
+        """
+        Store a result and evict old results afterward.
+
+        :param key: Key of the result.
+        :param result: Result to store. Must be picklable.
+        :return: None
+        """
+
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        # write to temporary file first, so readers never see a partial result
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                pickle.dump(result, file)
+            os.replace(temp_path, self._file_path(key))
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            self._stats.stores += 1
+
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove results which are older than max_age and the oldest results until the cache is smaller than max_size.
+
+        :return: Number of evicted results.
+        """
+
+        if not self.path.is_dir():
+            return 0
+
+        entries = []
+        for file_path in self.path.glob(f"*{self.FILE_SUFFIX}"):
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_path))
+        entries.sort()
+
+        now = time.time()
+        size = sum(entry[1] for entry in entries)
+        evicted = 0
+        for mtime, file_size, file_path in entries:
+            expired = self.max_age is not None and now - mtime > self.max_age
+            too_big = self.max_size is not None and size > self.max_size
+            if not expired and not too_big:
+                break
+            file_path.unlink(missing_ok=True)
+            size -= file_size
+            evicted += 1
+
+        with self._lock:
+            self._stats.evictions += evicted
+        return evicted
+
+    def clear(self) -> None:
+        if not self.path.is_dir():
+            return
+        for file_path in self.path.glob(f"*{self.FILE_SUFFIX}"):
+            file_path.unlink(missing_ok=True)
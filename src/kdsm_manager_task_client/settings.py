@@ -1,8 +1,12 @@
-from typing import Any
+import logging
+from pathlib import Path
+from typing import Any, Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
-from wiederverwendbar.logger import LoggerSettings
+from wiederverwendbar.logger import LoggerSettings, LogLevels
+
+from kdsm_manager_task_client.request_scheduler import RequestPriority
 
 
 class Settings(BaseSettings, LoggerSettings):
@@ -17,6 +21,83 @@ class Settings(BaseSettings, LoggerSettings):
     api_url: str = Field(default="localhost/kdsm-manager/api", title="Task Url.", description="Url of task in kdsm-manager.")
     ssl: bool = Field(default=False, title="Use SSL.", description="Use SSL for communication with kdsm-manager.")
     ssl_verify: bool = Field(default=True, title="Verify SSL.", description="Verify SSL for communication with kdsm-manager.")
+    http_pool_size: int = Field(default=10, title="HTTP Pool Size.", description="Maximum number of connections to kdsm-manager kept in the pool.")
+    request_max_in_flight: int = Field(default=10, title="Max Requests In Flight.", description="Maximum number of concurrent requests to kdsm-manager.")
+    request_max_in_flight_per_priority: dict[RequestPriority, int] = Field(default_factory=lambda: {RequestPriority.LOG: 4, RequestPriority.BULK: 2},
+                                                                           title="Max Requests In Flight Per Priority.",
+                                                                           description="Maximum number of concurrent requests to kdsm-manager per priority.")
+    request_timeout: float | None = Field(default=60.0, title="Request Timeout.",
+                                          description="Seconds to wait for kdsm-manager to answer a request. None waits forever.")
+    abort_poll_timeout: float | None = Field(default=5.0, title="Abort Poll Timeout.",
+                                             description="Seconds to wait for kdsm-manager to answer an abort poll. A poll which times out is "
+                                                         "repeated on the next interval, so one slow answer doesn't delay the abort checks of "
+                                                         "other subtasks for long. None uses the request timeout.")
+    request_coalesce: bool = Field(default=True, title="Coalesce Requests.", description="Concurrent identical GET requests share one request.")
+    request_coalesce_ttl: float = Field(default=0.0, title="Coalesce TTL.", description="Seconds a GET result is reused after the request finished.")
+
+    # progress
+    progress_push_interval: float | None = Field(default=None, title="Progress Push Interval.",
+                                                 description="Minimum seconds between pushing the locally rolled up task percent to kdsm-manager. "
+                                                             "None disables pushing.")
+    progress_push_min_delta: float = Field(default=0.0, title="Progress Push Min Delta.",
+                                           description="Minimum change of the task percent for a push to kdsm-manager. The final percent is "
+                                                       "always pushed.")
+
+    # log shipping
+    log_ship_levels: dict[str, LogLevels] = Field(default_factory=lambda: {"": LogLevels.INFO}, title="Log Ship Levels.",
+                                                  description="Minimum log level shipped to kdsm-manager per logger prefix. "
+                                                              "The longest matching prefix wins, '' matches all loggers.")
+    log_ship_level_poll_interval: float | None = Field(default=None, title="Log Ship Level Poll Interval.",
+                                                       description="Seconds between polling the ship level of the running subtasks from kdsm-manager. "
+                                                                   "None disables polling.")
+    log_deduplicate: bool = Field(default=True, title="Deduplicate Logs.",
+                                  description="Collapse consecutive identical log records into one record with a repeat count.")
+    log_rate_limit: float | None = Field(default=None, title="Log Rate Limit.",
+                                         description="Maximum log records per second and logger shipped to kdsm-manager. None means unlimited.")
+    log_rate_limit_burst: int | None = Field(default=None, title="Log Rate Limit Burst.",
+                                             description="Maximum burst of log records per logger. None means one second of the rate limit.")
+    log_rate_limit_exempt_level: LogLevels = Field(default=LogLevels.ERROR, title="Log Rate Limit Exempt Level.",
+                                                   description="Log records of this level or above are never rate limited.")
+    log_sampling: dict[LogLevels, float] = Field(default_factory=dict, title="Log Sampling.",
+                                                 description="Probability per log level that a record is shipped to kdsm-manager.")
+
+    # shutdown
+    shutdown_timeout: float = Field(default=10.0, title="Shutdown Timeout.",
+                                    description="Seconds to ship pending logs and state on shutdown before spooling or dropping them.")
+    log_spool_path: Path | None = Field(default=None, title="Log Spool Path.",
+                                        description="Directory for logs which could not be shipped on shutdown. None drops them.")
+
+    # control
+    control_socket_path: Path | None = Field(default=None, title="Control Socket Path.",
+                                             description="Unix domain socket for local status snapshots and abort commands while the task runs. "
+                                                         "None disables the socket.")
+
+    # checkpoint
+    checkpoint: Literal["local", "manager", "both"] | None = Field(default=None, title="Checkpoint Store.",
+                                                                   description="Persist subtask progress locally, to the kdsm-manager or both. "
+                                                                               "None disables checkpoints.")
+    checkpoint_path: Path = Field(default=Path("checkpoints"), title="Checkpoint Path.", description="Directory of the local checkpoint files.")
+
+    # result cache
+    result_cache: bool = Field(default=False, title="Result Cache.", description="Reuse results of subtasks with an unchanged fingerprint.")
+    result_cache_path: Path = Field(default=Path("result_cache"), title="Result Cache Path.", description="Directory of the result cache.")
+    result_cache_max_size: int | None = Field(default=1024 * 1024 * 1024, title="Result Cache Max Size.",
+                                              description="Maximum size of the result cache in bytes. None means unlimited.")
+    result_cache_max_age: float | None = Field(default=None, title="Result Cache Max Age.",
+                                               description="Maximum age of a cached result in seconds. None means unlimited.")
+
+    # distributed
+    lease_duration: float = Field(default=30.0, title="Lease Duration.",
+                                  description="Seconds a subtask lease is valid in distributed mode. Leases are renewed every third of it.")
+    lease_poll_interval: float = Field(default=1.0, title="Lease Poll Interval.",
+                                       description="Seconds a worker waits before claiming again if no subtask is claimable.")
+
+    # data cache
+    data_cache: bool = Field(default=False, title="Data Cache.",
+                             description="Keep the task data on disk and download it again only if its ETag changed.")
+    data_cache_path: Path = Field(default=Path("data_cache"), title="Data Cache Path.", description="Directory of the data cache.")
+    data_max_age: float = Field(default=0.0, title="Data Max Age.",
+                                description="Seconds the task data is used without asking kdsm-manager whether it changed.")
 
     def __init__(self, **values: Any):
         super().__init__(**values)
@@ -28,3 +109,21 @@ class Settings(BaseSettings, LoggerSettings):
             self.api_url = self.api_url[8:]
         if self.api_url.endswith("/"):
             self.api_url = self.api_url[:-1]
+
+    def get_log_ship_level(self, logger_name: str) -> int:
+        """
+        Get the ship level for a logger by the longest matching prefix of log_ship_levels.
+
+        :param logger_name: Name of the logger.
+        :return: Log level. NOTSET if no prefix matches.
+        """
+
+        match: tuple[str, LogLevels] | None = None
+        for prefix, level in self.log_ship_levels.items():
+            if prefix != "" and logger_name != prefix and not logger_name.startswith(prefix + "."):
+                continue
+            if match is None or len(prefix) > len(match[0]):
+                match = (prefix, level)
+        if match is None:
+            return logging.NOTSET
+        return logging.getLevelName(match[1].value)
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class ShutdownReportModel(BaseModel):
+    sent: int = 0
+    spooled: int = 0
+    dropped: int = 0
+    duration: float = 0.0
+    timed_out: bool = False
@@ -0,0 +1,116 @@
+import time
+from threading import Lock, Event
+from typing import Any, Callable, Hashable
+
+from pydantic import BaseModel
+from wiederverwendbar.default import Default
+
+
+class SingleFlightStatsModel(BaseModel):
+    calls: int = 0
+    shared: int = 0
+    cached: int = 0
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "interrupted")
+
+    def __init__(self):
+        self.done: Event = Event()
+        self.result: Any = None
+        self.error: Exception | None = None
+        self.interrupted: bool = False
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key. The first caller executes the function, all callers arriving while it
+    runs wait for and share its result. Results are reused for ttl seconds afterward.
+    """
+
+    def __init__(self, ttl: float | Default = Default()):
+        # ttl
+        if type(ttl) is Default:
+            ttl = 0.0
+        self._ttl: float = ttl
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # calls in flight
+        self._calls: dict[Hashable, _Call] = {}
+
+        # results of finished calls
+        self._results: dict[Hashable, tuple[float, Any]] = {}
+
+        # stats
+        self._stats: SingleFlightStatsModel = SingleFlightStatsModel()
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    @property
+    def stats(self) -> SingleFlightStatsModel:
+        with self._lock:
+            return self._stats.model_copy()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Execute func or join the call in flight for the same key.
+
+        :param key: Key of the call.
+        :param func: Function to execute.
+        :return: Result of func.
+        """
+
+        while True:
+            with self._lock:
+                # reuse recent result
+                if self._ttl > 0:
+                    cached = self._results.get(key)
+                    if cached is not None:
+                        if time.monotonic() - cached[0] <= self._ttl:
+                            self._stats.cached += 1
+                            return cached[1]
+                        del self._results[key]
+
+                # join call in flight
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                    self._stats.calls += 1
+                else:
+                    self._stats.shared += 1
+
+            if leader:
+                break
+
+            # wait with timeout, so the thread stays interruptible
+            while not call.done.wait(0.1):
+                ...
+            if call.interrupted:
+                # the leader was stopped, try again with a new leader
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            # stop signals like ThreadStop are raised into the thread of the leader only, never share them
+            call.interrupted = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if self._ttl > 0 and call.error is None and not call.interrupted:
+                    self._results[key] = (time.monotonic(), call.result)
+            call.done.set()
+        return call.result
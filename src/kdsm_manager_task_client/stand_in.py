@@ -0,0 +1,533 @@
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse, parse_qs, unquote
+
+from pydantic import BaseModel, Field
+from wiederverwendbar.default import Default
+
+from kdsm_manager_task_client.task_status import TaskStatus
+
+logger = logging.getLogger(__name__)
+
+
+class StandInArtifactModel(BaseModel):
+    name: str
+    size: int = 0
+    sha256: str | None = Field(default=None, description="Hash of the artifact, set on completion.")
+
+
+class StandInSubtaskModel(BaseModel):
+    name: str
+    title: str | None = None
+    status: TaskStatus = TaskStatus.DEPLOYED
+    percent: float = 0.0
+    status_text: str = ""
+    abort: bool = False
+    ship_level: str | None = None
+    checkpoint: dict[str, Any] | None = None
+    log_records: int = 0
+    artifacts: dict[str, StandInArtifactModel] = Field(default_factory=dict)
+    lease_worker: str | None = None
+    lease_expires_at: float = 0.0
+    lease_claims: int = 0
+
+
+class StandInTaskModel(BaseModel):
+    id: int
+    name: str
+    title: str | None = None
+    status: TaskStatus = TaskStatus.RUNNING
+    percent: float = 0.0
+    data: dict[str, Any] = Field(default_factory=dict)
+    subtasks: dict[str, StandInSubtaskModel] = Field(default_factory=dict)
+    percent_history: list[tuple[float, float]] = Field(default_factory=list, description="Wall clock time and percent of every task percent update.")
+
+
+class StandInStatsModel(BaseModel):
+    requests: int = 0
+    injected_errors: int = 0
+    log_records: int = 0
+    requests_per_endpoint: dict[str, int] = Field(default_factory=dict)
+
+
+class StandInManager:
+    """
+    Local stand-in of the kdsm-manager task api for tests and load tests. Tasks are identified by the bearer token and
+    created on their first request. Latency and errors can be injected.
+
+    GET responses carry an ETag and are answered with 304 if it matches If-None-Match. The stand-in also serves
+    'GET /stand-in/stats' and 'GET /stand-in/task/{id}' without authentication.
+    """
+
+    def __init__(self,
+                 host: str | Default = Default(),
+                 port: int | Default = Default(),
+                 api_path: str | Default = Default(),
+                 latency: float | Default = Default(),
+                 latency_jitter: float | Default = Default(),
+                 error_rate: float | Default = Default(),
+                 error_pattern: str | Default = Default(),
+                 artifact_path: Path | None | Default = Default()):
+        # host
+        if type(host) is Default:
+            host = "127.0.0.1"
+        self._host: str = host
+
+        # port
+        if type(port) is Default:
+            port = 0
+        self._port: int = port
+
+        # api_path
+        if type(api_path) is Default:
+            api_path = "/api"
+        self._api_path: str = "/" + api_path.strip("/") if api_path.strip("/") != "" else ""
+
+        # latency
+        if type(latency) is Default:
+            latency = 0.0
+        if latency < 0:
+            raise ValueError("Latency must be greater or equal than 0!")
+        self._latency: float = latency
+
+        # latency_jitter
+        if type(latency_jitter) is Default:
+            latency_jitter = 0.0
+        if latency_jitter < 0:
+            raise ValueError("Latency jitter must be greater or equal than 0!")
+        self._latency_jitter: float = latency_jitter
+
+        # error_rate
+        if type(error_rate) is Default:
+            error_rate = 0.0
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError("Error rate must be between 0 and 1!")
+        self._error_rate: float = error_rate
+
+        # error_pattern
+        if type(error_pattern) is Default:
+            error_pattern = ".*"
+        self._error_pattern: re.Pattern = re.compile(error_pattern)
+
+        # artifact_path
+        if type(artifact_path) is Default:
+            artifact_path = None
+        self._artifact_path: Path | None = artifact_path
+
+        # lock
+        self._lock: threading.Lock = threading.Lock()
+
+        # state
+        self._tasks: dict[int, StandInTaskModel] = {}
+        self._artifact_hashers: dict[tuple[int, str, str], Any] = {}
+        self._data_bodies: dict[int, bytes] = {}
+        self._stats: StandInStatsModel = StandInStatsModel()
+
+        # server
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def host(self) -> str:
+        return self._host
+
+    @property
+    def port(self) -> int:
+        if self._server is not None:
+            return self._server.server_address[1]
+        return self._port
+
+    @property
+    def api_url(self) -> str:
+        """
+        Url of the api without scheme, as expected by Settings.api_url.
+        """
+
+        return f"{self.host}:{self.port}{self._api_path}"
+
+    @property
+    def artifact_path(self) -> Path | None:
+        return self._artifact_path
+
+    @property
+    def stats(self) -> StandInStatsModel:
+        with self._lock:
+            return self._stats.model_copy(deep=True)
+
+    def add_task(self,
+                 id: int,
+                 name: str | Default = Default(),
+                 title: str | None = None,
+                 data: dict[str, Any] | None = None) -> StandInTaskModel:
+        if type(name) is Default:
+            name = f"task_{id}"
+        task = StandInTaskModel(id=id, name=name, title=title, data=data or {})
+        with self._lock:
+            self._tasks[id] = task
+            self._data_bodies.pop(id, None)
+        return task
+
+    def get_task(self, id: int) -> StandInTaskModel | None:
+        with self._lock:
+            task = self._tasks.get(id)
+            if task is None:
+                return None
+            return task.model_copy(deep=True)
+
+    def start(self) -> None:
+        """
+        Serve in a background thread.
+
+        :return: None
+        """
+
+        self._bind()
+        self._thread = threading.Thread(name=f"{self.__class__.__name__}-{self.port}", target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def serve_forever(self) -> None:
+        self._bind()
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        self._server = None
+
+    def _bind(self) -> None:
+        if self._server is not None:
+            raise RuntimeError(f"{self.__class__.__name__} is already serving on {self.api_url}!")
+        manager = self
+
+        class RequestHandler(_StandInRequestHandler):
+            stand_in = manager
+
+        self._server = ThreadingHTTPServer((self.host, self._port), RequestHandler)
+        self._server.daemon_threads = True
+
+    def _count(self, endpoint: str, injected_error: bool = False, log_records: int = 0) -> None:
+        with self._lock:
+            self._stats.requests += 1
+            self._stats.requests_per_endpoint[endpoint] = self._stats.requests_per_endpoint.get(endpoint, 0) + 1
+            if injected_error:
+                self._stats.injected_errors += 1
+            self._stats.log_records += log_records
+
+    def handle(self, method: str, path: str, params: dict[str, str], token: str | None, body: Any) -> tuple[int, Any]:
+        """
+        Handle an api request.
+
+        :param method: Http method.
+        :param path: Path without the api path.
+        :param params: Query parameters.
+        :param token: Bearer token.
+        :param body: Parsed json body or the raw body if it's not json.
+        :return: Status code and json response, bytes are sent as already serialized json.
+        """
+
+        # stand-in endpoints
+        parts = path.strip("/").split("/")
+        if parts[0] == "stand-in" and method == "GET":
+            if parts[1:] == ["stats"]:
+                return 200, self.stats.model_dump(mode="json")
+            if len(parts) == 3 and parts[1] == "task" and parts[2].isdigit():
+                task = self.get_task(int(parts[2]))
+                if task is None:
+                    return 404, {"detail": f"Task {parts[2]} not found."}
+                return 200, task.model_dump(mode="json")
+            return 404, {"detail": "Not found."}
+
+        # endpoint without subtask name for stats
+        endpoint_parts = list(parts)
+        if endpoint_parts[1:2] == ["subtask"] and len(endpoint_parts) > 2:
+            endpoint_parts[2] = "{name}"
+            if endpoint_parts[3:4] == ["artifact"] and len(endpoint_parts) > 4:
+                endpoint_parts[4] = "{artifact}"
+        endpoint = f"{method} /" + "/".join(endpoint_parts)
+
+        # inject latency and errors
+        latency = self._latency + random.uniform(0.0, self._latency_jitter)
+        if latency > 0:
+            time.sleep(latency)
+        if self._error_rate > 0 and self._error_pattern.search(path) and random.random() < self._error_rate:
+            self._count(endpoint=endpoint, injected_error=True)
+            return 503, {"detail": "Injected error."}
+
+        # authenticate
+        if token is None or ":" not in token or not token.split(":", 1)[0].isdigit():
+            self._count(endpoint=endpoint)
+            return 401, {"detail": "Not authenticated."}
+        task_id = int(token.split(":", 1)[0])
+
+        log_records = len(body) if isinstance(body, list) and parts[-1] == "log" else 0
+        self._count(endpoint=endpoint, log_records=log_records)
+
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                task = StandInTaskModel(id=task_id, name=f"task_{task_id}")
+                self._tasks[task_id] = task
+            return self._route(task=task, method=method, parts=parts, params=params, body=body)
+
+    def _route(self, task: StandInTaskModel, method: str, parts: list[str], params: dict[str, str], body: Any) -> tuple[int, Any]:
+        if parts[0] != "task" or len(parts) < 2:
+            return 404, {"detail": "Not found."}
+
+        # task
+        if len(parts) == 2:
+            attribute = parts[1]
+            if method == "GET" and attribute == "data":
+                # serialized once, the data can be large
+                if task.id not in self._data_bodies:
+                    self._data_bodies[task.id] = json.dumps(task.data).encode("utf-8")
+                return 200, self._data_bodies[task.id]
+            if method == "GET" and attribute in ["name", "title", "percent", "status"]:
+                return 200, getattr(task, attribute)
+            if method == "GET" and attribute == "checkpoint":
+                return 200, {name: subtask.checkpoint for name, subtask in task.subtasks.items() if subtask.checkpoint is not None}
+            if method == "PUT" and attribute == "percent":
+                task.percent = float(params["new_percent"])
+                task.percent_history.append((time.time(), task.percent))
+                return 200, None
+            if method == "POST" and attribute == "subtasks":
+                if params.get("delete_subtasks", "False").lower() == "true":
+                    task.subtasks.clear()
+                for subtask in body:
+                    if subtask["name"] not in task.subtasks:
+                        task.subtasks[subtask["name"]] = StandInSubtaskModel(name=subtask["name"], title=subtask.get("title"))
+                return 200, None
+            return 404, {"detail": "Not found."}
+
+        # subtask
+        if parts[1] != "subtask" or len(parts) < 4:
+            return 404, {"detail": "Not found."}
+        subtask = task.subtasks.get(parts[2])
+        if subtask is None:
+            return 404, {"detail": f"Subtask '{parts[2]}' not found."}
+        if parts[3] == "artifact" and len(parts) in [5, 6]:
+            return self._route_artifact(task=task, subtask=subtask, method=method, parts=parts, params=params, body=body)
+        if len(parts) != 4:
+            return 404, {"detail": "Not found."}
+        attribute = parts[3].replace("-", "_")
+        if method == "GET" and attribute in ["percent", "status", "status_text", "abort", "ship_level"]:
+            return 200, getattr(subtask, attribute)
+        if method == "PUT" and attribute == "percent":
+            subtask.percent = float(params["new_percent"])
+            return 200, None
+        if method == "PUT" and attribute == "status":
+            subtask.status = TaskStatus(params["new_status"])
+            return 200, None
+        if method == "PUT" and attribute == "status_text":
+            subtask.status_text = params.get("new_status_text", "")
+            return 200, None
+        if method == "PUT" and attribute == "checkpoint":
+            subtask.checkpoint = body
+            return 200, None
+        if method == "POST" and attribute == "log":
+            subtask.log_records += len(body)
+            return 200, None
+        if attribute == "lease":
+            return self._route_lease(subtask=subtask, method=method, params=params)
+        return 404, {"detail": "Not found."}
+
+    @staticmethod
+    def _route_lease(subtask: StandInSubtaskModel, method: str, params: dict[str, str]) -> tuple[int, Any]:
+        worker = params["worker"]
+        now = time.monotonic()
+        leased_by_other = subtask.lease_worker not in [None, worker] and subtask.lease_expires_at > now
+
+        # claim
+        if method == "POST":
+            if subtask.status in [TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.ABORTED]:
+                return 409, {"detail": f"Subtask '{subtask.name}' already ended with status '{subtask.status.value}'."}
+            if leased_by_other:
+                return 409, {"detail": f"Subtask '{subtask.name}' is leased by worker '{subtask.lease_worker}'."}
+            subtask.lease_worker = worker
+            subtask.lease_expires_at = now + float(params["duration"])
+            subtask.lease_claims += 1
+            return 200, None
+
+        # renew, only the owner of an unexpired lease can renew it
+        if method == "PUT":
+            if subtask.lease_worker != worker or subtask.lease_expires_at <= now:
+                return 409, {"detail": f"Worker '{worker}' doesn't hold the lease of subtask '{subtask.name}'."}
+            subtask.lease_expires_at = now + float(params["duration"])
+            return 200, None
+
+        # release
+        if method == "DELETE":
+            if subtask.lease_worker == worker:
+                subtask.lease_worker = None
+                subtask.lease_expires_at = 0.0
+            return 200, None
+
+        return 404, {"detail": "Not found."}
+
+    def _route_artifact(self,
+                        task: StandInTaskModel,
+                        subtask: StandInSubtaskModel,
+                        method: str,
+                        parts: list[str],
+                        params: dict[str, str],
+                        body: Any) -> tuple[int, Any]:
+        name = unquote(parts[4])
+        artifact = subtask.artifacts.get(name)
+        key = (task.id, subtask.name, name)
+        file_path = None if self.artifact_path is None else self.artifact_path / str(task.id) / subtask.name / name
+
+        # acknowledged offset
+        if method == "GET" and parts[5:] == ["offset"]:
+            return 200, 0 if artifact is None else artifact.size
+
+        # append a chunk, the offset must match the acknowledged offset
+        if method == "PUT" and len(parts) == 5:
+            offset = int(params["offset"])
+            if artifact is None or artifact.sha256 is not None:
+                artifact = StandInArtifactModel(name=name)
+                subtask.artifacts[name] = artifact
+                self._artifact_hashers[key] = hashlib.sha256()
+                if file_path is not None:
+                    file_path.parent.mkdir(parents=True, exist_ok=True)
+                    file_path.write_bytes(b"")
+            if offset != artifact.size:
+                return 409, {"detail": f"Offset {offset} doesn't match the acknowledged offset {artifact.size}."}
+            chunk = body or b""
+            self._artifact_hashers[key].update(chunk)
+            if file_path is not None:
+                with file_path.open("ab") as file:
+                    file.write(chunk)
+            artifact.size += len(chunk)
+            return 200, artifact.size
+
+        # complete
+        if method == "POST" and parts[5:] == ["complete"]:
+            if artifact is None:
+                return 404, {"detail": f"Artifact '{name}' not found."}
+            sha256 = self._artifact_hashers[key].hexdigest()
+            if int(params["size"]) != artifact.size or params["sha256"] != sha256:
+                return 422, {"detail": f"Artifact '{name}' has size {artifact.size} and sha256 '{sha256}'."}
+            artifact.sha256 = sha256
+            return 200, None
+
+        return 404, {"detail": "Not found."}
+
+
+class _StandInRequestHandler(BaseHTTPRequestHandler):
+    # keep connections alive like the real manager
+    protocol_version = "HTTP/1.1"
+    stand_in: StandInManager
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format % args)
+
+    def _handle(self) -> None:
+        url = urlparse(self.path)
+        content_length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(content_length) if content_length > 0 else b""
+
+        api_path = self.stand_in._api_path
+        if not url.path.startswith(api_path + "/"):
+            status_code, response_data = 404, {"detail": "Not found."}
+        else:
+            token = self.headers.get("Authorization")
+            if token is not None and token.startswith("Bearer "):
+                token = token[len("Bearer "):]
+            try:
+                status_code, response_data = self.stand_in.handle(method=self.command,
+                                                                  path=url.path[len(api_path):],
+                                                                  params={key: value[-1] for key, value in parse_qs(url.query).items()},
+                                                                  token=token,
+                                                                  body=json.loads(body) if body and self.headers.get("Content-Type") == "application/json" else body or None)
+            except (KeyError, ValueError, TypeError) as e:
+                status_code, response_data = 422, {"detail": f"{e.__class__.__name__}: {e}"}
+
+        # json which is already serialized is sent as it is
+        response_body = response_data if isinstance(response_data, bytes) else json.dumps(response_data).encode("utf-8")
+
+        # validate GETs by etag
+        etag = None
+        if self.command == "GET" and status_code == 200:
+            etag = f'"{hashlib.sha256(response_body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def do_GET(self) -> None:
+        self._handle()
+
+    def do_PUT(self) -> None:
+        self._handle()
+
+    def do_POST(self) -> None:
+        self._handle()
+
+    def do_DELETE(self) -> None:
+        self._handle()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m kdsm_manager_task_client.stand_in",
+                                     description="Serve a local stand-in of the kdsm-manager task api. "
+                                                 "Prints the api url for Settings.api_url as first line.")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind.")
+    parser.add_argument("--port", type=int, default=0, help="Port to bind. Default is a free port.")
+    parser.add_argument("--api-path", default="/api", help="Path of the api.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request.")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Maximum random seconds added to the latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that a request fails with 503.")
+    parser.add_argument("--error-pattern", default=".*", help="Only requests with a matching path fail.")
+    parser.add_argument("--artifact-path", type=Path, default=None, help="Directory to store uploaded artifacts. Default keeps only size and hash.")
+    args = parser.parse_args(argv)
+
+    stand_in = StandInManager(host=args.host,
+                              port=args.port,
+                              api_path=args.api_path,
+                              latency=args.latency,
+                              latency_jitter=args.latency_jitter,
+                              error_rate=args.error_rate,
+                              error_pattern=args.error_pattern,
+                              artifact_path=args.artifact_path)
+
+    def on_sigterm(_signum, _frame):
+        raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+    stand_in.start()
+    print(stand_in.api_url, flush=True)
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    stand_in.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,28 @@
 import contextlib
+import functools
+import logging
+import math
+import os
+import time
 import warnings
 from abc import ABC, abstractmethod
-from threading import Lock
-from typing import Literal, Optional, TYPE_CHECKING
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from threading import Lock, Event
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Literal, Optional, TYPE_CHECKING
+from urllib.parse import quote
 import re
 
+from requests.exceptions import HTTPError, RequestException
+
 from wiederverwendbar.default import Default
 from wiederverwendbar.logger import Logger, remove_logger
+from wiederverwendbar.threading import ThreadStop
 
+from kdsm_manager_task_client.checkpoint import SubtaskCheckpointModel
 from kdsm_manager_task_client.log_handler import LogHandler
+from kdsm_manager_task_client.progress import ProgressModel
+from kdsm_manager_task_client.request_scheduler import RequestPriority
+from kdsm_manager_task_client.subtask_artifact import SubtaskArtifactModel, ArtifactReader
 from kdsm_manager_task_client.subtask_log import SubtaskLogModel
 from kdsm_manager_task_client.task_status import TaskStatus
 
@@ -29,13 +43,58 @@ class NoMoreStepsLeftError(RuntimeError):
     """
 
 
+class LeaseLostError(RuntimeError):
+    """
+    Exception that is triggered if the lease of a subtask was lost to another worker in distributed mode.
+    """
+
+
 class StepNotCompletedWarning(RuntimeWarning):
     """
     Warning that is triggered if not all steps for the subtask have been completed.
     """
 
 
+@functools.cache
+def _default_name(class_name: str) -> str:
+    return class_name.lower()
+
+
+@functools.cache
+def _default_title(class_name: str) -> str:
+    return ' '.join(re.findall(r'[A-Z][a-z]*|\d+', class_name))
+
+
+def _map_chunk(func: Callable[[Any], Any], chunk: list[Any], stop_event: Event | None) -> list[Any]:
+    results = []
+    for item in chunk:
+        if stop_event is not None and stop_event.is_set():
+            break
+        results.append(func(item))
+    return results
+
+
 class Subtask(ABC):
+    # slots keep idle subtasks small, subclasses should declare '__slots__ = ()' or their own slots
+    __slots__ = ("_group",
+                 "_lock",
+                 "_name",
+                 "_title",
+                 "_current_step",
+                 "_steps",
+                 "_if_the_steps_have_not_been_completed",
+                 "_log_handler",
+                 "_logger",
+                 "_stopped",
+                 "_local_abort",
+                 "_state",
+                 "_result",
+                 "_ship_level",
+                 "_percent",
+                 "_status",
+                 "_step_started_at",
+                 "_replay_steps")
+
     def __init__(self,
                  name: str | Default = Default(),
                  title: str | None | Default = Default(),
@@ -49,12 +108,12 @@ class Subtask(ABC):
 
         # name
         if type(name) is Default:
-            name = self.__class__.__name__.lower()
+            name = _default_name(self.__class__.__name__)
         self._name: str = name
 
         # title
         if type(title) is Default:
-            title: str = ' '.join(re.findall(r'[A-Z][a-z]*|\d+', self.__class__.__name__))
+            title: str = _default_title(self.__class__.__name__)
         self._title: str | None = title
 
         # step
@@ -85,6 +144,25 @@ class Subtask(ABC):
         # local_abort
         self._local_abort: bool = False
 
+        # state
+        self._state: Any = None
+
+        # result
+        self._result: Any = None
+
+        # ship_level
+        self._ship_level: int | None = None
+
+        # local copies of percent and status
+        self._percent: float = 0.0
+        self._status: TaskStatus = TaskStatus.DEPLOYED
+
+        # step_started_at
+        self._step_started_at: float | None = None
+
+        # replay_steps, number of step blocks left which were completed before the restored checkpoint
+        self._replay_steps: int = 0
+
     def __str__(self):
         return (f"{self.__class__.__name__}("
                 f"name='{self.name}', "
@@ -124,27 +202,312 @@ class Subtask(ABC):
 
     @current_step.setter
     def current_step(self, new_step: int) -> None:
+        self._set_current_step(new_step=new_step)
+
+    def _set_current_step(self, new_step: int, observe: bool = True) -> None:
         if new_step > self.steps:
             raise AttributeError(f"Step must be less than {self.steps} for {self}")
 
         with self._lock:
+            old_step = self._current_step
             self._current_step = new_step
 
+            # observe step duration
+            now = time.monotonic()
+            step_started_at = self._step_started_at
+            self._step_started_at = now
+        if observe and step_started_at is not None and new_step > old_step:
+            self.task.eta_estimator.observe(key=self.__class__.__qualname__, step_duration=(now - step_started_at) / (new_step - old_step))
+
         # calculate percent
         self.percent = self.current_step / self.steps * 100
 
+        # save checkpoint
+        self.checkpoint()
+
     def next_step(self) -> None:
         self.current_step += 1
 
+    def complete_steps(self) -> None:
+        """
+        Complete all steps left without running them, e.g. if the payload was skipped. The skipped steps aren't
+        observed by the eta estimator.
+
+        :return: None
+        """
+
+        self._set_current_step(new_step=self.steps, observe=False)
+
     @contextlib.contextmanager
-    def step(self, new_status_text: str | None = None, log: bool = False):
+    def step(self, new_status_text: str | None = None, log: bool = False) -> Iterator[bool]:
+        """
+        Run one step. After resuming from a checkpoint, the steps which were completed in a previous run are replayed:
+        they don't advance the current step and the block gets True, so it can skip its work.
+
+            with self.step("Step 1") as done:
+                if not done:
+                    ...
+
+        :param new_status_text: Status text of the step.
+        :param log: Log the status text.
+        :return: Whether the step was already completed in a previous run.
+        """
+
+        with self._lock:
+            done = self._replay_steps > 0
+            if done:
+                self._replay_steps -= 1
+        if done:
+            yield True
+            return
         if self.steps_left == 0:
             raise NoMoreStepsLeftError(f"No more steps left for {self}!")
         if new_status_text is not None:
             self.status_text(new_status_text=new_status_text, log=log)
-        yield
+        yield False
         self.next_step()
 
+    def _set_step_fraction(self, fraction: float) -> None:
+        current_step = self.current_step
+        steps = self.steps
+        if current_step >= steps:
+            return
+        self.percent = (current_step + min(max(fraction, 0.0), 1.0)) / steps * 100
+
+    def map(self,
+            func: Callable[[Any], Any],
+            items: Iterable[Any],
+            workers: int | Default = Default(),
+            executor: Literal["thread", "process"] | Default = Default(),
+            chunksize: int | Default = Default(),
+            ordered: bool | Default = Default(),
+            percent_interval: float | Default = Default()) -> Iterator[Any]:
+        """
+        Apply func to every item concurrently and yield the results.
+
+        The items are partitioned into chunks which are processed by a pool of workers. The completion of the chunks
+        is rolled into the percent of the current step, which is pushed at most every percent_interval seconds.
+        The first exception raised by func is propagated and cancels all outstanding chunks.
+
+        :param func: Function to apply to each item. Must be picklable if executor is 'process'.
+        :param items: Items to process.
+        :param workers: Number of workers. Default is the number of CPUs.
+        :param executor: Use a 'thread' or a 'process' pool. Default is 'thread'.
+        :param chunksize: Number of items per chunk. Default splits the items into four chunks per worker.
+        :param ordered: Yield results in the order of the items or as soon as their chunk is completed. Default is True.
+        :param percent_interval: Minimum seconds between two percent updates. Default is 1.0.
+        :return: Iterator over the results.
+        """
+
+        items = list(items)
+        if len(items) == 0:
+            return
+
+        # workers
+        if type(workers) is Default:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError(f"Workers must be greater than 0 for {self}")
+
+        # executor
+        if type(executor) is Default:
+            executor = "thread"
+
+        # chunksize
+        if type(chunksize) is Default:
+            chunksize = math.ceil(len(items) / (workers * 4))
+        if chunksize < 1:
+            raise ValueError(f"Chunksize must be greater than 0 for {self}")
+
+        # ordered
+        if type(ordered) is Default:
+            ordered = True
+
+        # percent_interval
+        if type(percent_interval) is Default:
+            percent_interval = 1.0
+
+        # create pool
+        stop_event: Event | None = None
+        if executor == "thread":
+            stop_event = Event()
+            pool: Executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{self.name}-map")
+        elif executor == "process":
+            pool: Executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError(f"Unknown executor '{executor}' for {self}")
+
+        try:
+            # submit chunks
+            chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+            futures = {pool.submit(_map_chunk, func, chunk, stop_event): index for index, chunk in enumerate(chunks)}
+
+            pending = set(futures)
+            finished: dict[int, list[Any]] = {}
+            next_index = 0
+            done_items = 0
+            percent_pushed_at = time.perf_counter()
+            while len(pending) > 0:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+
+                # check local abort
+                with self._lock:
+                    local_abort = self._local_abort
+                if self.task.abort or local_abort:
+                    raise ThreadStop()
+
+                # collect results
+                for future in done:
+                    index = futures[future]
+                    chunk_results = future.result()
+                    done_items += len(chunks[index])
+                    if ordered:
+                        finished[index] = chunk_results
+                    else:
+                        yield from chunk_results
+                while next_index in finished:
+                    yield from finished.pop(next_index)
+                    next_index += 1
+
+                # roll up percent
+                if len(done) > 0 and (len(pending) == 0 or time.perf_counter() - percent_pushed_at >= percent_interval):
+                    self._set_step_fraction(done_items / len(items))
+                    percent_pushed_at = time.perf_counter()
+        finally:
+            if stop_event is not None:
+                stop_event.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def upload_artifact(self,
+                        path_or_fileobj: str | os.PathLike | BinaryIO,
+                        name: str | Default = Default(),
+                        chunksize: int | Default = Default(),
+                        retries: int | Default = Default(),
+                        retry_delay: float | Default = Default(),
+                        percent_interval: float | Default = Default()) -> SubtaskArtifactModel:
+        """
+        Upload a file to kdsm-manager as an artifact of this subtask.
+
+        The file is streamed in chunks through one reused buffer, so the memory stays flat regardless of the file size.
+        After a failed chunk the upload resumes at the offset acknowledged by kdsm-manager, which also continues an
+        upload of a previous run. The progress is rolled into the percent of the current step and the status text.
+        The upload stops if the task or the subtask is aborted.
+
+        :param path_or_fileobj: Path of the file or a binary file object, which is read from its current position.
+        :param name: Name of the artifact. Default is the file name.
+        :param chunksize: Bytes per request. Default is 8 MiB.
+        :param retries: Number of consecutive failed requests before giving up. Default is 5.
+        :param retry_delay: Seconds to wait before the first retry, doubled for each further retry. Default is 1.0.
+        :param percent_interval: Minimum seconds between two progress updates. Default is 1.0.
+        :return: Name, size and sha256 of the uploaded artifact.
+        """
+
+        # name
+        if type(name) is Default:
+            file_name = path_or_fileobj if isinstance(path_or_fileobj, (str, os.PathLike)) else getattr(path_or_fileobj, "name", None)
+            if not isinstance(file_name, (str, os.PathLike)):
+                raise ValueError(f"Name is required for file objects without name for {self}")
+            name = os.path.basename(file_name)
+
+        # chunksize
+        if type(chunksize) is Default:
+            chunksize = 8 * 1024 * 1024
+
+        # retries
+        if type(retries) is Default:
+            retries = 5
+
+        # retry_delay
+        if type(retry_delay) is Default:
+            retry_delay = 1.0
+
+        # percent_interval
+        if type(percent_interval) is Default:
+            percent_interval = 1.0
+
+        def check_abort():
+            with self._lock:
+                local_abort = self._local_abort
+            if self.task.abort or local_abort:
+                raise ThreadStop()
+
+        url = self.task.api_url + f"/task/subtask/{self.name}/artifact/{quote(name, safe='')}"
+        with contextlib.ExitStack() as stack:
+            if isinstance(path_or_fileobj, (str, os.PathLike)):
+                # unbuffered, so the data is read directly into the buffer of the reader
+                file = stack.enter_context(open(path_or_fileobj, "rb", buffering=0))
+            else:
+                file = path_or_fileobj
+            reader = ArtifactReader(file=file, chunksize=chunksize)
+            size = reader.size
+
+            offset: int | None = None
+            created = False
+            failures = 0
+            percent_pushed_at = time.perf_counter()
+            while True:
+                check_abort()
+
+                try:
+                    # ask for the acknowledged offset on start and after a failure
+                    if offset is None:
+                        offset = self.task.request(method="GET",
+                                                   url=url + "/offset",
+                                                   priority=RequestPriority.CONTROL,
+                                                   flow=self.name,
+                                                   coalesce=False,
+                                                   response_model=int)
+                        if offset > 0 and failures == 0:
+                            self.logger.info(f"Resuming upload of artifact '{name}' at offset {offset}.")
+
+                    # an empty file is created by one empty chunk
+                    chunk = reader.chunk(offset)
+                    if len(chunk) == 0 and (offset > 0 or created):
+                        break
+                    offset = self.task.request(method="PUT",
+                                               url=url,
+                                               priority=RequestPriority.BULK,
+                                               flow=self.name,
+                                               response_model=int,
+                                               params={"offset": offset},
+                                               headers={"Content-Type": "application/octet-stream"},
+                                               data=chunk)
+                    created = True
+                    failures = 0
+                except RequestException as e:
+                    # client errors won't go away, except a conflicting offset
+                    if isinstance(e, HTTPError) and e.response is not None and e.response.status_code < 500 and e.response.status_code != 409:
+                        raise e
+                    failures += 1
+                    if failures > retries:
+                        raise e
+                    delay = retry_delay * 2 ** (failures - 1)
+                    self.logger.warning(f"Uploading artifact '{name}' failed at offset {offset}, retrying in {delay:.1f}s: {e}")
+                    offset = None
+                    retry_at = time.perf_counter() + delay
+                    while time.perf_counter() < retry_at:
+                        check_abort()
+                        time.sleep(min(retry_at - time.perf_counter(), 0.1))
+                    continue
+
+                # roll up progress
+                if size is not None and size > 0 and time.perf_counter() - percent_pushed_at >= percent_interval:
+                    self._set_step_fraction(offset / size)
+                    self.status_text(f"Uploading artifact '{name}': {offset / 1024 ** 2:.1f} of {size / 1024 ** 2:.1f} MiB.")
+                    percent_pushed_at = time.perf_counter()
+
+            # complete
+            artifact = SubtaskArtifactModel(name=name, size=offset, sha256=reader.sha256)
+            self.task.request(method="POST",
+                              url=url + "/complete",
+                              priority=RequestPriority.STATUS,
+                              flow=self.name,
+                              params={"size": artifact.size, "sha256": artifact.sha256})
+
+        self._set_step_fraction(1.0)
+        self.status_text(f"Uploaded artifact '{name}': {artifact.size / 1024 ** 2:.1f} MiB.")
+        return artifact
+
     @property
     def steps(self) -> int:
         with self._lock:
@@ -182,29 +545,154 @@ class Subtask(ABC):
     def percent(self) -> float:
         return self.task.request(method="GET",
                                  url=self.task.api_url + f"/task/subtask/{self.name}/percent",
+                                 priority=RequestPriority.PROGRESS,
+                                 flow=self.name,
                                  response_model=float)
 
     @percent.setter
     def percent(self, new_percent: float) -> None:
+        with self._lock:
+            self._percent = new_percent
         self.task.request(method="PUT",
                           url=self.task.api_url + f"/task/subtask/{self.name}/percent",
+                          priority=RequestPriority.PROGRESS,
+                          flow=self.name,
                           params={"new_percent": new_percent})
 
     @property
     def status(self) -> TaskStatus:
         return self.task.request(method="GET",
                                  url=self.task.api_url + f"/task/subtask/{self.name}/status",
+                                 priority=RequestPriority.STATUS,
+                                 flow=self.name,
                                  response_model=TaskStatus)
 
     @status.setter
     def status(self, new_status: TaskStatus) -> None:
+        with self._lock:
+            self._status = new_status
         self.task.request(method="PUT",
                           url=self.task.api_url + f"/task/subtask/{self.name}/status",
+                          priority=RequestPriority.STATUS,
+                          flow=self.name,
                           params={"new_status": new_status.value})
 
+        # save checkpoint
+        self.checkpoint(status=new_status)
+
+    @property
+    def state(self) -> Any:
+        """
+        User supplied, json serializable state which is saved with the checkpoint and restored on resume.
+        """
+
+        with self._lock:
+            return self._state
+
+    @state.setter
+    def state(self, new_state: Any) -> None:
+        with self._lock:
+            self._state = new_state
+
+    @property
+    def result(self) -> Any:
+        """
+        Return value of the payload or the cached result.
+        """
+
+        with self._lock:
+            return self._result
+
+    @result.setter
+    def result(self, new_result: Any) -> None:
+        with self._lock:
+            self._result = new_result
+
+    def fingerprint(self) -> str | None:
+        """
+        Fingerprint of the inputs and the code version of this subtask. If the result cache is enabled and a result for
+        the same fingerprint exists, the payload is skipped. Override this method to enable caching, for example with
+        ResultCache.hash(self.task.data_view, Path("input.csv"), "v1").
+
+        :return: Fingerprint or None to disable caching for this subtask.
+        """
+
+        return None
+
+    def checkpoint(self, status: TaskStatus | None = None) -> None:
+        if self.task.checkpoint is None:
+            return
+        self.task.checkpoint.save(subtask=self, status=status)
+
+    def restore(self, checkpoint: SubtaskCheckpointModel) -> None:
+        with self._lock:
+            self._current_step = min(checkpoint.current_step, self._steps)
+            self._replay_steps = self._current_step
+            self._state = checkpoint.state
+
+            # the restored steps ran in a previous run, the next step is timed from now on
+            if self._step_started_at is not None:
+                self._step_started_at = time.monotonic()
+
+        # calculate percent
+        self.percent = self.current_step / self.steps * 100
+
+    @property
+    def local_percent(self) -> float:
+        with self._lock:
+            return self._percent
+
+    @property
+    def local_abort(self) -> bool:
+        with self._lock:
+            return self._local_abort
+
+    @property
+    def local_status(self) -> TaskStatus:
+        with self._lock:
+            return self._status
+
+    def progress(self) -> ProgressModel:
+        """
+        Progress of this subtask from local state. The eta is based on the observed step durations of this subtask type.
+
+        :return: Progress
+        """
+
+        with self._lock:
+            steps = self._steps
+            current_step = self._current_step
+            percent = self._percent
+            status = self._status
+            step_started_at = self._step_started_at
+
+        if status in [TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.ABORTED]:
+            if status == TaskStatus.SUCCESS:
+                percent = 100.0
+            return ProgressModel(percent=percent, steps=steps, steps_done=steps * percent / 100, eta=0.0)
+
+        eta = None
+        step_duration = self.task.eta_estimator.estimate(key=self.__class__.__qualname__)
+        if step_duration is not None:
+            eta = (steps - current_step) * step_duration
+            if status == TaskStatus.RUNNING and step_started_at is not None:
+                eta = max(eta - (time.monotonic() - step_started_at), 0.0)
+        return ProgressModel(percent=percent, steps=steps, steps_done=steps * percent / 100, eta=eta)
+
+    @property
+    def weight(self) -> float:
+        """
+        Expected duration of this subtask relative to others, the steps weighted by the estimated step duration.
+        """
+
+        step_duration = self.task.eta_estimator.estimate(key=self.__class__.__qualname__)
+        return self.steps * (1.0 if step_duration is None else step_duration)
+
     def status_text(self, new_status_text: str = "", log: bool = False) -> None:
         self.task.request(method="PUT",
                           url=self.task.api_url + f"/task/subtask/{self.name}/status-text",
+                          priority=RequestPriority.PROGRESS,
+                          flow=self.name,
                           params={"new_status_text": new_status_text})
         if log:
             self.logger.info(new_status_text)
@@ -218,7 +706,10 @@ class Subtask(ABC):
                 return self._local_abort
         return self.task.request(method="GET",
                                  url=self.task.api_url + f"/task/subtask/{self.name}/abort",
-                                 response_model=bool)
+                                 priority=RequestPriority.CONTROL,
+                                 flow=self.name,
+                                 response_model=bool,
+                                 timeout=self.task.settings.abort_poll_timeout)
 
     @abort.setter
     def abort(self, value: bool) -> None:
@@ -234,21 +725,91 @@ class Subtask(ABC):
             raise RuntimeError(f"Can't create logger for {self}, because subtask is in state '{self.status.value}'!")
 
         # create LogHandler
-        self._log_handler = LogHandler(subtask=self)
+        settings = self.task.settings
+        self._log_handler = LogHandler(subtask=self,
+                                       level=self.ship_level,
+                                       shipper=self.task.log_shipper,
+                                       deduplicate=settings.log_deduplicate,
+                                       rate_limit=settings.log_rate_limit,
+                                       rate_limit_burst=Default() if settings.log_rate_limit_burst is None else settings.log_rate_limit_burst,
+                                       rate_limit_exempt_level=logging.getLevelName(settings.log_rate_limit_exempt_level.value),
+                                       sampling={logging.getLevelName(level.value): probability for level, probability in settings.log_sampling.items()})
 
         # create logger
-        self._logger: Logger = Logger(name=f"{self.group.logger.name}.{self.name}", settings=self.task.settings)
+        self._logger: Logger = Logger(name=self.logger_name, settings=self.task.settings)
 
         # set log handler
         self._logger.addHandler(self._log_handler)
 
+        # lower logger level if more is shipped than logged locally
+        self._apply_ship_level()
+
         return self._logger
 
-    def log(self, formated_records: list[SubtaskLogModel]) -> None:
+    @property
+    def logger_name(self) -> str:
+        return f"{self.group.logger.name}.{self.name}"
+
+    @property
+    def ship_level(self) -> int:
+        """
+        Minimum level of log records shipped to kdsm-manager. Records below are dropped before they are buffered.
+        Set a level name or number to override the ship level of the settings, None resets it.
+        """
+
+        with self._lock:
+            ship_level = self._ship_level
+        if ship_level is not None:
+            return ship_level
+        return self.task.settings.get_log_ship_level(self.logger_name)
+
+    @ship_level.setter
+    def ship_level(self, new_ship_level: int | str | None) -> None:
+        if isinstance(new_ship_level, str):
+            new_ship_level = logging.getLevelName(new_ship_level.upper())
+            if not isinstance(new_ship_level, int):
+                raise ValueError(f"Unknown ship level for {self}")
+        with self._lock:
+            self._ship_level = new_ship_level
+        self._apply_ship_level()
+
+    def _apply_ship_level(self) -> None:
+        log_handler = self._log_handler
+        logger = self._logger
+        if log_handler is None or logger is None:
+            return
+        ship_level = self.ship_level
+        log_handler.setLevel(ship_level)
+        logger.setLevel(min(logging.getLevelName(self.task.settings.log_level.value), ship_level))
+        # logger is not registered in the logging manager, so setLevel doesn't clear its cache
+        logger._cache.clear()
+
+    def refresh_ship_level(self) -> None:
+        """
+        Poll the ship level from kdsm-manager. If the poll fails, the current ship level is kept.
+
+        :return: None
+        """
+
+        try:
+            self.ship_level = self.task.request(method="GET",
+                                                url=self.task.api_url + f"/task/subtask/{self.name}/ship-level",
+                                                priority=RequestPriority.CONTROL,
+                                                flow=self.name)
+        except (RequestException, ValueError) as e:
+            self.task.logger.warning(f"Polling ship level of subtask '{self.name}' failed, keeping the current level: {e}")
+
+    def log(self,
+            formated_records: list[SubtaskLogModel],
+            priority: RequestPriority = RequestPriority.LOG,
+            timeout: float | None = None) -> None:
         if len(formated_records) == 0:
             return
         self.task.request(method="POST",
                           url=self.task.api_url + f"/task/subtask/{self.name}/log",
+                          priority=priority,
+                          flow=self.name,
+                          timeout=timeout,
                           json=[formated_record.model_dump() for formated_record in formated_records])
 
     def start(self) -> None:
@@ -258,6 +819,9 @@ class Subtask(ABC):
         # log fist message
         self.logger.debug("Subtask started.")
 
+        with self._lock:
+            self._step_started_at = time.monotonic()
+
     def stop(self, final_status: TaskStatus) -> None:
         if self._stopped:
             raise RuntimeError(f"Subtask {self} is already stopped!")
@@ -274,7 +838,7 @@ class Subtask(ABC):
                 self.logger.warning(msg)
                 warnings.warn(StepNotCompletedWarning(msg))
             elif self.if_the_steps_have_not_been_completed == "complete":
-                self.current_step = self.steps
+                self.complete_steps()
 
         # log last message
         self.logger.debug(f"Subtask ended with status '{final_status.value}'.")
@@ -0,0 +1,103 @@
+import hashlib
+import os
+from typing import BinaryIO
+
+from pydantic import BaseModel
+
+
+class SubtaskArtifactModel(BaseModel):
+    name: str
+    size: int
+    sha256: str
+
+
+class ArtifactReader:
+    """
+    Reads a binary file chunk by chunk into one reused buffer and hashes it once in order. Going back to an earlier
+    offset, e.g. to resend a chunk which was not acknowledged, is possible within the buffered chunk or if the file is
+    seekable.
+    """
+
+    def __init__(self, file: BinaryIO, chunksize: int):
+        if chunksize < 1:
+            raise ValueError("Chunksize must be greater than 0!")
+
+        # file
+        self._file: BinaryIO = file
+        self._seekable: bool = file.seekable()
+        self._start: int = file.tell() if self._seekable else 0
+
+        # size
+        self._size: int | None = None
+        if self._seekable:
+            self._size = file.seek(0, os.SEEK_END) - self._start
+            file.seek(self._start)
+
+        # buffer
+        self._buffer: bytearray = bytearray(chunksize)
+        self._view: memoryview = memoryview(self._buffer)
+        self._chunk_offset: int = 0
+        self._chunk_length: int = 0
+        self._position: int = 0
+
+        # hash
+        self._hasher = hashlib.sha256()
+        self._hashed: int = 0
+
+    @property
+    def size(self) -> int | None:
+        """
+        Size of the file from the start position. None if the file is not seekable.
+        """
+
+        return self._size
+
+    @property
+    def sha256(self) -> str:
+        """
+        Hash of the data read so far. It's the hash of the whole file after a chunk at the end was requested.
+        """
+
+        return self._hasher.hexdigest()
+
+    def _read(self) -> int:
+        # fill the whole buffer, raw files may return less than requested
+        length = 0
+        while length < len(self._view):
+            read = self._file.readinto(self._view[length:])
+            if not read:
+                break
+            length += read
+
+        # hash only data which wasn't hashed before
+        if self._position + length > self._hashed:
+            self._hasher.update(self._view[self._hashed - self._position:length])
+            self._hashed = self._position + length
+
+        self._chunk_offset = self._position
+        self._chunk_length = length
+        self._position += length
+        return length
+
+    def chunk(self, offset: int) -> memoryview:
+        """
+        Get the data from offset to the end of its chunk. The view is only valid until the next call.
+
+        :param offset: Offset from the start position.
+        :return: View into the buffer, empty at the end of the file.
+        """
+
+        # go back
+        if offset < self._chunk_offset:
+            if not self._seekable:
+                raise ValueError(f"Can't go back to offset {offset}, the file is not seekable!")
+            self._file.seek(self._start + offset)
+            self._position = offset
+            self._read()
+
+        # go forward, skipped data is read for the hash
+        while offset >= self._chunk_offset + self._chunk_length:
+            if self._read() == 0:
+                return self._view[:0]
+
+        return self._view[offset - self._chunk_offset:self._chunk_length]
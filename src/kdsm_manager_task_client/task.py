@@ -1,21 +1,52 @@
+import atexit
+import contextlib
 import json
+import os
+import signal
 import time
-from typing import Literal, Any
+import weakref
+from typing import Literal, Any, Iterator
 import threading
 
 from pydantic import BaseModel
-from requests import request
+from requests import Session, Response
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, JSONDecodeError
 from wiederverwendbar.default import Default
 from wiederverwendbar.logger import Logger
 
+from kdsm_manager_task_client.abort_poller import AbortPoller
 from kdsm_manager_task_client.bearer_auth import BearerAuth
+from kdsm_manager_task_client.checkpoint import Checkpoint
+from kdsm_manager_task_client.control import ControlServer
 from kdsm_manager_task_client.group import Group
+from kdsm_manager_task_client.lease import LeaseKeeper, LeaseWorker
+from kdsm_manager_task_client.log_shipper import LogShipper
+from kdsm_manager_task_client.progress import ProgressModel, EtaEstimator
+from kdsm_manager_task_client.request_scheduler import RequestPriority, RequestScheduler
+from kdsm_manager_task_client.result_cache import ResultCache
+from kdsm_manager_task_client.task_data import TaskData, DataCache
 from kdsm_manager_task_client.task_status import TaskStatus
 from kdsm_manager_task_client.settings import Settings
+from kdsm_manager_task_client.shutdown_report import ShutdownReportModel
+from kdsm_manager_task_client.single_flight import SingleFlight
 from kdsm_manager_task_client.subtask import Subtask
 
 
+# all tasks of the process, shut down together on exit
+tasks: "weakref.WeakSet[Task]" = weakref.WeakSet()
+
+
+@atexit.register
+def shutdown_tasks() -> None:
+    threads = [threading.Thread(target=task.shutdown, daemon=True) for task in list(tasks)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + max((task.settings.shutdown_timeout for task in list(tasks)), default=0.0)
+    for thread in threads:
+        thread.join(timeout=max(deadline - time.monotonic(), 0.0))
+
+
 class Task:
     def __init__(self,
                  settings: Settings | Default = Default(),
@@ -23,7 +54,11 @@ class Task:
                  api_token: str | Default = Default(),
                  api_url: str | Default = Default(),
                  ssl: bool | Default = Default(),
-                 ssl_verify: bool | Default = Default()):
+                 ssl_verify: bool | Default = Default(),
+                 session: Session | Default = Default(),
+                 log_shipper: LogShipper | Default = Default(),
+                 abort_poller: AbortPoller | Default = Default(),
+                 scheduler: RequestScheduler | Default = Default()):
         # settings
         if type(settings) is Default:
             settings = Settings()
@@ -65,15 +100,76 @@ class Task:
         # bearer_auth
         self._bearer_auth: BearerAuth = BearerAuth(task=self)
 
+        # session
+        if type(session) is Default:
+            session = self.create_session(settings=self.settings)
+        self._session: Session = session
+
+        # log_shipper
+        if type(log_shipper) is Default:
+            log_shipper = LogShipper()
+        self._log_shipper: LogShipper = log_shipper
+
+        # abort_poller
+        if type(abort_poller) is Default:
+            abort_poller = AbortPoller()
+        self._abort_poller: AbortPoller = abort_poller
+
+        # scheduler
+        if type(scheduler) is Default:
+            scheduler = self.create_scheduler(settings=self.settings)
+        self._scheduler: RequestScheduler = scheduler
+
+        # single_flight
+        self._single_flight: SingleFlight | None = None
+        if self.settings.request_coalesce:
+            self._single_flight = SingleFlight(ttl=self.settings.request_coalesce_ttl)
+
         # logger
         self._logger: Logger = Logger(name=f"task.{self.name}", settings=self.settings)
 
         # groups
         self._groups: list[Group] = []
 
+        # register for shutdown on exit
+        tasks.add(self)
+
         # local_abort
         self._local_abort: bool = False
 
+        # eta_estimator
+        self._eta_estimator: EtaEstimator = EtaEstimator()
+
+        # run_started
+        self._run_started: bool = False
+        self._distributed: bool = False
+
+        # pushed_percent
+        self._pushed_percent: float | None = None
+        self._percent_pushed_at: float = 0.0
+
+        # checkpoint
+        self._checkpoint: Checkpoint | None = None
+        if self.settings.checkpoint is not None:
+            self._checkpoint = Checkpoint(task=self, store=self.settings.checkpoint, path=self.settings.checkpoint_path)
+
+        # result_cache
+        self._result_cache: ResultCache | None = None
+        if self.settings.result_cache:
+            self._result_cache = ResultCache(path=self.settings.result_cache_path,
+                                             max_size=self.settings.result_cache_max_size,
+                                             max_age=self.settings.result_cache_max_age)
+
+        # data_cache
+        self._data_cache: DataCache = DataCache(task=self,
+                                                path=self.settings.data_cache_path if self.settings.data_cache else None,
+                                                max_age=self.settings.data_max_age)
+
+        # control_server
+        self._control_server: ControlServer | None = None
+        if self.settings.control_socket_path is not None:
+            self._control_server = ControlServer(task=self, path=self.settings.control_socket_path)
+
     def __str__(self):
         return (f"{self.__class__.__name__}("
                 f"id={self.id}, "
@@ -119,6 +215,46 @@ class Task:
     def logger(self) -> Logger:
         return self._logger
 
+    @property
+    def session(self) -> Session:
+        return self._session
+
+    @property
+    def log_shipper(self) -> LogShipper:
+        return self._log_shipper
+
+    @property
+    def abort_poller(self) -> AbortPoller:
+        return self._abort_poller
+
+    @property
+    def scheduler(self) -> RequestScheduler:
+        return self._scheduler
+
+    @property
+    def single_flight(self) -> SingleFlight | None:
+        return self._single_flight
+
+    @property
+    def eta_estimator(self) -> EtaEstimator:
+        return self._eta_estimator
+
+    @property
+    def checkpoint(self) -> Checkpoint | None:
+        return self._checkpoint
+
+    @property
+    def result_cache(self) -> ResultCache | None:
+        return self._result_cache
+
+    @property
+    def data_cache(self) -> DataCache:
+        return self._data_cache
+
+    @property
+    def control_server(self) -> ControlServer | None:
+        return self._control_server
+
     @property
     def groups(self) -> tuple[Group, ...]:
         return tuple(self._groups)
@@ -143,9 +279,20 @@ class Task:
 
     @property
     def data(self) -> dict[str, Any]:
-        return self.request(method="GET",
-                            url=self.api_url + "/task/data",
-                            response_model=dict)
+        """
+        Task data as a new dict, which may be modified. The data is cached by its ETag, so it's downloaded only if it
+        changed. Use data_view to parse only the parts which are needed.
+        """
+
+        return self.data_cache.get().to_dict()
+
+    @property
+    def data_view(self) -> TaskData:
+        """
+        Read-only view of the task data, which parses only the requested keys and can iterate over large arrays.
+        """
+
+        return self.data_cache.get()
 
     @property
     def percent(self) -> float:
@@ -153,6 +300,41 @@ class Task:
                             url=self.api_url + "/task/percent",
                             response_model=float)
 
+    def progress(self) -> ProgressModel:
+        """
+        Progress of this task from local state. The groups run at the same time, so the eta is the maximum.
+
+        :return: Progress
+        """
+
+        return ProgressModel.parallel((group.progress(), sum(subtask.weight for subtask in group.subtasks)) for group in self.groups)
+
+    def push_percent(self, force: bool = False) -> None:
+        """
+        Push the locally rolled up percent to kdsm-manager, at most every progress_push_interval seconds and only if it
+        changed by at least progress_push_min_delta.
+
+        :param force: Push even if the interval is not over yet or the change is smaller than the minimum delta.
+        :return: None
+        """
+
+        if self.settings.progress_push_interval is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._percent_pushed_at < self.settings.progress_push_interval:
+            return
+        percent = round(self.progress().percent, 2)
+        if percent == self._pushed_percent:
+            return
+        if not force and self._pushed_percent is not None and abs(percent - self._pushed_percent) < self.settings.progress_push_min_delta:
+            return
+        self.request(method="PUT",
+                     url=self.api_url + "/task/percent",
+                     priority=RequestPriority.PROGRESS,
+                     params={"new_percent": percent})
+        self._percent_pushed_at = now
+        self._pushed_percent = percent
+
     @property
     def status(self) -> TaskStatus:
         return self.request(method="GET",
@@ -169,52 +351,141 @@ class Task:
         with self._lock:
             self._local_abort = value
 
-    def request(self,
-                method: Literal["GET", "POST", "PUT"],
-                url: str,
-                response_model: type | None = None,
-                **kwargs) -> Any:
-        # prepare kwargs for request
+    @classmethod
+    def create_session(cls, settings: Settings) -> Session:
+        """
+        Create a session with a connection pool, which can be shared between multiple tasks.
+
+        :param settings: Settings for the connection pool.
+        :return: Session
+        """
+
+        session = Session()
+        adapter = HTTPAdapter(pool_connections=settings.http_pool_size, pool_maxsize=settings.http_pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @classmethod
+    def create_scheduler(cls, settings: Settings) -> RequestScheduler:
+        """
+        Create a request scheduler, which can be shared between multiple tasks.
+
+        :param settings: Settings for the limits.
+        :return: RequestScheduler
+        """
+
+        return RequestScheduler(max_in_flight=settings.request_max_in_flight,
+                                max_in_flight_per_priority=settings.request_max_in_flight_per_priority)
+
+    def _prepare_kwargs(self, kwargs: dict[str, Any]) -> dict[str, Any]:
         if self.ssl:
             if "verify" not in kwargs:
                 kwargs["verify"] = self.ssl_verify
         if "auth" not in kwargs:
             kwargs["auth"] = self._bearer_auth
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.settings.request_timeout
+        return kwargs
 
-        # do request
-        response = request(method, url, **kwargs)
-
-        # parse response to json
-        try:
-            response_data = response.json()
-        except JSONDecodeError:
-            response_data = response.text
+    def request(self,
+                method: Literal["GET", "POST", "PUT", "DELETE"],
+                url: str,
+                response_model: type | None = None,
+                priority: RequestPriority = RequestPriority.STATUS,
+                flow: str = "",
+                coalesce: bool = True,
+                **kwargs) -> Any:
+        # prepare kwargs for request
+        kwargs = self._prepare_kwargs(kwargs)
 
-        # handle non-ok status coder
-        if not response.ok:
-            detail = response.reason
-            if type(response_data) is str:
-                detail += " - " + response_data
-            elif type(response_data) is dict:
-                if "detail" in response_data:
-                    response_data_pretty = json.dumps(response_data.get("detail"), indent=4)
-                else:
-                    response_data_pretty = json.dumps(response_data, indent=4)
-                detail += " - " + response_data_pretty
-            raise HTTPError(detail, response=response)
+        # do request, concurrent identical GETs share one request
+        if coalesce and self.single_flight is not None and method == "GET" and "json" not in kwargs and "data" not in kwargs:
+            key = (url, tuple(sorted((kwargs.get("params") or {}).items())))
+            response_data = self.single_flight.do(key=key, func=lambda: self._request(method=method, url=url, priority=priority, flow=flow, **kwargs))
+        else:
+            response_data = self._request(method=method, url=url, priority=priority, flow=flow, **kwargs)
 
         # parse to response_model
         if response_model is not None:
             if issubclass(response_model, BaseModel):
-                result = response_model(**response.json())
+                result = response_model(**response_data)
             else:
-                result = response_model(response.json())
+                result = response_model(response_data)
         else:
-            result = response.json()
+            result = response_data
 
         return result
 
-    def subtask(self, *subtasks_or_groups: Subtask | Group, delete_subtasks: bool = False) -> None:
+    @staticmethod
+    def _parse_response(response: Response) -> Any:
+        try:
+            return response.json()
+        except JSONDecodeError:
+            return response.text
+
+    @staticmethod
+    def _raise_for_status(response: Response, response_data: Any) -> None:
+        if response.ok:
+            return
+        detail = response.reason
+        if type(response_data) is str:
+            detail += " - " + response_data
+        elif type(response_data) is dict:
+            if "detail" in response_data:
+                response_data_pretty = json.dumps(response_data.get("detail"), indent=4)
+            else:
+                response_data_pretty = json.dumps(response_data, indent=4)
+            detail += " - " + response_data_pretty
+        raise HTTPError(detail, response=response)
+
+    def _request(self,
+                 method: Literal["GET", "POST", "PUT", "DELETE"],
+                 url: str,
+                 priority: RequestPriority,
+                 flow: str,
+                 **kwargs) -> Any:
+        with self.scheduler.slot(priority=priority, flow=flow):
+            response = self.session.request(method, url, **kwargs)
+
+        # parse response to json once
+        response_data = self._parse_response(response)
+
+        # handle non-ok status coder
+        self._raise_for_status(response, response_data)
+
+        return response_data
+
+    @contextlib.contextmanager
+    def stream(self,
+               method: Literal["GET", "POST", "PUT", "DELETE"],
+               url: str,
+               priority: RequestPriority = RequestPriority.STATUS,
+               flow: str = "",
+               **kwargs) -> Iterator[Response]:
+        """
+        Send a request and yield the response before its body is read, e.g. to write a large body to a file. The
+        request slot is held until the body is consumed.
+
+        :param method: Http method.
+        :param url: Url.
+        :param priority: Priority of the request.
+        :param flow: Flow of the request, e.g. the name of a subtask.
+        :param kwargs: Arguments for the request.
+        :return: Response
+        """
+
+        kwargs = self._prepare_kwargs(kwargs)
+        with self.scheduler.slot(priority=priority, flow=flow):
+            response = self.session.request(method, url, stream=True, **kwargs)
+            try:
+                if not response.ok:
+                    self._raise_for_status(response, self._parse_response(response))
+                yield response
+            finally:
+                response.close()
+
+    def subtask(self, *subtasks_or_groups: Subtask | Group, delete_subtasks: bool = False, attach: bool = False) -> None:
         current_subtasks = []
 
         def create_dynamic_group():
@@ -231,40 +502,189 @@ class Task:
                 self._groups.append(subtask_or_group)
         create_dynamic_group()
 
-        # submit subtasks
-        self.request(method="POST",
-                     url=self.api_url + "/task/subtasks",
-                     params={"delete_subtasks": delete_subtasks},
-                     json=[{
-                         "name": subtask.name,
-                         "title": subtask.title
-                     } for subtask in self.subtasks])
+        # submit subtasks, attached workers use the subtasks submitted by another process
+        if not attach:
+            self.request(method="POST",
+                         url=self.api_url + "/task/subtasks",
+                         params={"delete_subtasks": delete_subtasks},
+                         json=[{
+                             "name": subtask.name,
+                             "title": subtask.title
+                         } for subtask in self.subtasks])
 
         # set task to groups
         for group in self.groups:
             group.task = self
 
-    def run(self) -> None:
+    def run(self, resume: bool = False, distributed: bool = False, workers: int | None = None) -> None:
+        """
+        Run all groups and wait for them.
+
+        :param resume: Resume from the checkpoints of a previous run.
+        :param distributed: Claim the subtasks by leases, so several processes can run the subtasks of one task.
+        :param workers: Number of lease workers in distributed mode. Default is the number of cpus.
+        :return: None
+        """
+
         self.logger.debug("Task started.")
+        self._run_started = True
+        self._distributed = distributed
 
-        # start groups
-        for group in self.groups:
-            if group.started_at is not None:
+        # prepare checkpoint
+        if self.checkpoint is not None:
+            if resume:
+                self.checkpoint.load()
+            else:
+                self.checkpoint.reset()
+        elif resume:
+            raise RuntimeError(f"Can't resume {self}, because checkpoints are disabled!")
+
+        # start control socket
+        if self.control_server is not None:
+            self.control_server.start()
+
+        # threads which run the subtasks
+        lease_keeper = None
+        if distributed:
+            if workers is None:
+                workers = os.cpu_count() or 1
+            lease_keeper = LeaseKeeper(task=self, duration=self.settings.lease_duration)
+            threads = [LeaseWorker(lease_keeper=lease_keeper, poll_interval=self.settings.lease_poll_interval) for _ in range(workers)]
+            for thread in threads:
+                thread.task = self
+            lease_keeper.start()
+            self.logger.debug(f"Running distributed as worker '{lease_keeper.worker_id}' with {workers} threads.")
+        else:
+            threads = list(self.groups)
+
+        # handle SIGTERM like KeyboardInterrupt
+        previous_sigterm_handler = None
+        if threading.current_thread() is threading.main_thread():
+            def on_sigterm(_signum, _frame):
+                raise KeyboardInterrupt()
+
+            previous_sigterm_handler = signal.signal(signal.SIGTERM, on_sigterm)
+
+        # start threads
+        for thread in threads:
+            if thread.started_at is not None:
                 continue
-            group.start()
+            thread.start()
 
-        # wait for groups
+        # wait for threads, the percent of a distributed task can't be rolled up in one process
+        deadline = None
         try:
             while True:
-                all_groups_finished = True
-                for group in self.groups:
-                    if group.ended_at is None:
-                        all_groups_finished = False
-                        break
-                if all_groups_finished:
+                # a group whose on_end raised never sets ended_at, so check the thread as well
+                running_threads = [thread for thread in threads if thread.ended_at is None and thread.is_alive()]
+                if len(running_threads) == 0:
                     break
-                time.sleep(0.001)
+                running_threads[0].join(timeout=0.1)
+                if not distributed:
+                    self.push_percent()
+            if not distributed:
+                self.push_percent(force=True)
+            if lease_keeper is not None:
+                lease_keeper.check_lost()
         except KeyboardInterrupt:
+            self.logger.warning("Task interrupted, aborting.")
             self.abort = True
+            deadline = time.monotonic() + self.settings.shutdown_timeout
+
+            # stop threads now instead of on the next poll, give them a part of the deadline to end
+            self.abort_poller.poll()
+            for thread in threads:
+                thread.join(timeout=max(deadline - time.monotonic(), 0.0) / 2)
+        finally:
+            if lease_keeper is not None:
+                lease_keeper.stop()
+            if self.control_server is not None:
+                self.control_server.stop()
+            if previous_sigterm_handler is not None:
+                signal.signal(signal.SIGTERM, previous_sigterm_handler)
+            self.shutdown(timeout=self.settings.shutdown_timeout if deadline is None else max(deadline - time.monotonic(), 0.0))
 
         self.logger.debug("Task ended.")
+
+    def shutdown(self, timeout: float | None = None) -> ShutdownReportModel:
+        """
+        Ship all pending logs and state in parallel under one deadline. Logs which can't be shipped in time are spooled
+        to log_spool_path or dropped.
+
+        :param timeout: Overall deadline in seconds. Default is shutdown_timeout of the settings.
+        :return: Report with the numbers of sent, spooled and dropped log records.
+        """
+
+        if timeout is None:
+            timeout = self.settings.shutdown_timeout
+        started_at = time.monotonic()
+        deadline = started_at + timeout
+        report = ShutdownReportModel()
+
+        # take pending records out of the log handlers of this task
+        batches = []
+        for log_handler in self.log_shipper.handlers:
+            if log_handler.subtask.task is not self:
+                continue
+            formated_records = log_handler.drain()
+            if len(formated_records) > 0:
+                batches.append((log_handler.subtask, formated_records))
+
+        # ship in parallel, plain threads because executors refuse work once the interpreter is shutting down
+        sent: set[int] = set()
+
+        def ship(index: int, subtask: Subtask, formated_records: list) -> None:
+            try:
+                subtask.log(formated_records=formated_records,
+                            priority=RequestPriority.CONTROL,
+                            timeout=max(deadline - time.monotonic(), 0.001))
+            except Exception:
+                return
+            sent.add(index)
+
+        threads = [threading.Thread(name=f"task-{self.id}-shutdown-{index}", target=ship, args=(index, *batch), daemon=True)
+                   for index, batch in enumerate(batches)]
+        # a task which never ran has no progress to report, a distributed one only a part of it
+        if self.settings.progress_push_interval is not None and self._run_started and not self._distributed:
+            def push_percent() -> None:
+                try:
+                    self.push_percent(force=True)
+                except Exception:
+                    pass
+
+            threads.append(threading.Thread(name=f"task-{self.id}-shutdown-percent", target=push_percent, daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=max(deadline - time.monotonic(), 0.0))
+
+        # spool or drop what could not be sent
+        unsent = []
+        for index, (subtask, formated_records) in enumerate(batches):
+            if index in sent:
+                report.sent += len(formated_records)
+            else:
+                report.timed_out = report.timed_out or threads[index].is_alive()
+                unsent.append((subtask, formated_records))
+        for subtask, formated_records in unsent:
+            if self.settings.log_spool_path is None:
+                report.dropped += len(formated_records)
+                continue
+            try:
+                self.settings.log_spool_path.mkdir(parents=True, exist_ok=True)
+                with (self.settings.log_spool_path / f"task_{self.id}.jsonl").open("a", encoding="utf-8") as file:
+                    for formated_record in formated_records:
+                        file.write(json.dumps({"subtask": subtask.name, "record": formated_record.model_dump()}) + "\n")
+                report.spooled += len(formated_records)
+            except OSError:
+                report.dropped += len(formated_records)
+
+        # close checkpoint
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+
+        report.duration = time.monotonic() - started_at
+        if report.sent + report.spooled + report.dropped > 0:
+            self.logger.info(f"Shutdown shipped {report.sent}, spooled {report.spooled} and dropped {report.dropped} log records "
+                             f"in {report.duration:.2f}s.")
+        return report
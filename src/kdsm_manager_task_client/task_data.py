@@ -0,0 +1,307 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterator, TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from kdsm_manager_task_client.request_scheduler import RequestPriority
+
+if TYPE_CHECKING:
+    from kdsm_manager_task_client.task import Task
+
+# strings as a whole, so brackets inside of strings are skipped, and the structural characters
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\],:]')
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_QUOTE, _COLON, _COMMA = ord('"'), ord(":"), ord(",")
+_OPENING, _CLOSING = b"{[", b"}]"
+
+
+def _members(raw: bytes | mmap.mmap, start: int) -> Iterator[tuple[str | None, int, int]]:
+    """
+    Scan the members of the object or array starting at start without parsing them.
+
+    :param raw: Raw json.
+    :param start: Offset of the opening bracket.
+    :return: Iterator over key (None for arrays), start and end of every member value.
+    """
+
+    is_object = raw[start] == _OPENING[0]
+    depth = 0
+    key = None
+    member_start = start + 1
+    for match in _TOKEN.finditer(raw, start + 1):
+        character = raw[match.start()]
+        if character == _QUOTE:
+            if depth == 0 and is_object and key is None:
+                key = json.loads(raw[match.start():match.end()])
+            continue
+        if character in _OPENING:
+            depth += 1
+        elif character in _CLOSING:
+            if depth == 0:
+                # last member, containers may be empty
+                if key is not None or (not is_object and raw[member_start:match.start()].strip() != b""):
+                    yield key, member_start, match.start()
+                return
+            depth -= 1
+        elif depth == 0:
+            if character == _COLON:
+                member_start = match.end()
+            elif character == _COMMA:
+                yield key, member_start, match.start()
+                key = None
+                member_start = match.end()
+    raise ValueError(f"Unterminated json container at offset {start}!")
+
+
+class TaskData(Mapping):
+    """
+    Read-only view of the task data, which parses only what is requested. The top-level keys are indexed by one scan
+    over the raw json, their values are parsed on first access and kept. Large arrays and objects can be iterated member
+    by member with iterate() without being parsed as a whole.
+    """
+
+    def __init__(self, raw: bytes | mmap.mmap):
+        # raw json
+        self._raw: bytes | mmap.mmap = raw
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # index of the top-level keys, built on first access
+        self._index: dict[str, tuple[int, int]] | None = None
+
+        # parsed values
+        self._values: dict[str, Any] = {}
+
+        # hash of the raw json, built on first access
+        self._sha256: str | None = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(keys={list(self.keys())})"
+
+    @property
+    def size(self) -> int:
+        return len(self._raw)
+
+    @property
+    def sha256(self) -> str:
+        """
+        Hash of the raw json, e.g. to fingerprint results which depend on the task data.
+        """
+
+        with self._lock:
+            if self._sha256 is None:
+                self._sha256 = hashlib.sha256(self._raw).hexdigest()
+            return self._sha256
+
+    def _value_start(self, start: int) -> int:
+        return _WHITESPACE.match(self._raw, start).end()
+
+    def _get_index(self) -> dict[str, tuple[int, int]]:
+        with self._lock:
+            if self._index is None:
+                start = self._value_start(0)
+                if start >= len(self._raw) or self._raw[start] != _OPENING[0]:
+                    raise ValueError("Task data is not a json object!")
+                self._index = {key: (value_start, value_end) for key, value_start, value_end in _members(self._raw, start)}
+            return self._index
+
+    def __getitem__(self, key: str) -> Any:
+        """
+        Parsed value of a top-level key. The value is shared between all callers, don't modify it.
+        """
+
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+        value_start, value_end = self._get_index()[key]
+        value = json.loads(self._raw[value_start:value_end])
+        with self._lock:
+            self._values[key] = value
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._get_index())
+
+    def __len__(self) -> int:
+        return len(self._get_index())
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._get_index()
+
+    def iterate(self, *path: str | int) -> Iterator[Any]:
+        """
+        Iterate over a nested array or object member by member. Only the current member is parsed.
+
+        :param path: Keys and indices to the array or object, e.g. iterate("items") or iterate("groups", 0, "items").
+        :return: Iterator over the elements of an array or over key and value tuples of an object.
+        """
+
+        if len(path) == 0:
+            raise ValueError("Path must not be empty!")
+
+        # locate the container, only the top-level key is indexed
+        value_start, value_end = self._get_index()[path[0]]
+        for part in path[1:]:
+            value_start = self._value_start(value_start)
+            for index, (key, member_start, member_end) in enumerate(_members(self._raw, value_start)):
+                if (key is None and index == part) or (key is not None and key == part):
+                    value_start, value_end = member_start, member_end
+                    break
+            else:
+                raise KeyError(part)
+
+        value_start = self._value_start(value_start)
+        if value_start >= value_end or self._raw[value_start] not in _OPENING:
+            raise TypeError(f"Value at {path} is not an array or object!")
+        for key, member_start, member_end in _members(self._raw, value_start):
+            value = json.loads(self._raw[member_start:member_end])
+            yield value if key is None else (key, value)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Parse the whole task data into a new dict.
+        """
+
+        return json.loads(self._raw[:])
+
+
+class DataCacheStatsModel(BaseModel):
+    downloads: int = 0
+    not_modified: int = 0
+    memoized: int = 0
+
+
+class DataCache:
+    """
+    Keeps the task data in memory and optionally on disk and downloads it again only if its ETag changed.
+    """
+
+    def __init__(self,
+                 task: "Task",
+                 path: Path | None = None,
+                 max_age: float = 0.0):
+        # task
+        self._task: "Task" = task
+
+        # path
+        self._path: Path | None = path
+
+        # max_age
+        self._max_age: float = max_age
+
+        # lock
+        self._lock: Lock = Lock()
+
+        # memoized data
+        self._data: TaskData | None = None
+        self._etag: str | None = None
+        self._validated_at: float = 0.0
+
+        # stats
+        self._stats: DataCacheStatsModel = DataCacheStatsModel()
+
+    @property
+    def task(self) -> "Task":
+        return self._task
+
+    @property
+    def path(self) -> Path | None:
+        return self._path
+
+    @property
+    def max_age(self) -> float:
+        return self._max_age
+
+    @property
+    def file_path(self) -> Path | None:
+        if self.path is None:
+            return None
+        return self.path / f"task_{self.task.id}.json"
+
+    @property
+    def etag_path(self) -> Path | None:
+        if self.path is None:
+            return None
+        return self.path / f"task_{self.task.id}.etag"
+
+    @property
+    def stats(self) -> DataCacheStatsModel:
+        with self._lock:
+            return self._stats.model_copy()
+
+    def _load_file(self) -> TaskData:
+        with self.file_path.open("rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return TaskData(raw=b"")
+            # the mapping stays valid after closing the file
+            return TaskData(raw=mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def get(self) -> TaskData:
+        """
+        Get the task data. After max_age seconds kdsm-manager is asked whether it changed.
+
+        :return: TaskData
+        """
+
+        with self._lock:
+            if self._data is not None and time.monotonic() - self._validated_at < self.max_age:
+                self._stats.memoized += 1
+                return self._data
+
+            # etag of the data in memory or on disk
+            etag = self._etag
+            if self._data is None and self.file_path is not None and self.file_path.is_file() and self.etag_path.is_file():
+                etag = self.etag_path.read_text(encoding="utf-8").strip() or None
+
+            headers = {} if etag is None else {"If-None-Match": etag}
+            with self.task.stream(method="GET",
+                                  url=self.task.api_url + "/task/data",
+                                  priority=RequestPriority.STATUS,
+                                  headers=headers) as response:
+                if response.status_code == 304:
+                    self._stats.not_modified += 1
+                    if self._data is None:
+                        self._data = self._load_file()
+                else:
+                    self._stats.downloads += 1
+                    etag = response.headers.get("ETag")
+                    if self.path is None:
+                        self._data = TaskData(raw=response.content)
+                    else:
+                        # write to temporary file first, so a crash never leaves a partial file with a valid etag
+                        self.path.mkdir(parents=True, exist_ok=True)
+                        self.etag_path.unlink(missing_ok=True)
+                        file_descriptor, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+                        try:
+                            with os.fdopen(file_descriptor, "wb") as file:
+                                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                                    file.write(chunk)
+                            os.replace(temp_path, self.file_path)
+                        except BaseException:
+                            Path(temp_path).unlink(missing_ok=True)
+                            raise
+                        if etag is not None:
+                            self.etag_path.write_text(etag, encoding="utf-8")
+                        self._data = self._load_file()
+
+            self._etag = etag
+            self._validated_at = time.monotonic()
+            return self._data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data = None
+            self._etag = None
+            if self.path is not None:
+                self.file_path.unlink(missing_ok=True)
+                self.etag_path.unlink(missing_ok=True)
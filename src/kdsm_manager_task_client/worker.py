@@ -0,0 +1,264 @@
+import argparse
+import importlib
+import json
+import signal
+import sys
+import threading
+from itertools import count
+from typing import Any, Callable, TextIO
+
+from pydantic import BaseModel, Field
+from wiederverwendbar.default import Default
+from wiederverwendbar.logger import Logger
+from wiederverwendbar.threading import handle_exception
+
+from kdsm_manager_task_client.abort_poller import AbortPoller
+from kdsm_manager_task_client.log_shipper import LogShipper
+from kdsm_manager_task_client.request_scheduler import RequestScheduler
+from kdsm_manager_task_client.settings import Settings
+from kdsm_manager_task_client.task import Task
+
+counter = count(1).__next__
+
+
+class WorkerJobModel(BaseModel):
+    spec: str = Field(..., description="Importable 'module:Task' spec of a Task subclass or a factory returning a Task.")
+    id: int = Field(..., description="Id of task in kdsm-manager.")
+    api_token: str = Field(..., description="Token of task in kdsm-manager.")
+    resume: bool = Field(default=False, description="Resume the task from its checkpoints.")
+    settings: dict[str, Any] = Field(default_factory=dict, description="Additional settings of the task.")
+
+
+def load_spec(spec: str) -> Callable[..., Task]:
+    """
+    Load a Task subclass or a factory from an importable 'module:attribute' spec.
+
+    :param spec: Spec to load.
+    :return: Task subclass or factory.
+    """
+
+    module_name, _, attribute_name = spec.partition(":")
+    if module_name == "" or attribute_name == "":
+        raise ValueError(f"Invalid spec '{spec}', expected 'module:Task'!")
+    factory = importlib.import_module(module_name)
+    for name in attribute_name.split("."):
+        factory = getattr(factory, name)
+    if isinstance(factory, Task) or not callable(factory):
+        raise TypeError(f"Spec '{spec}' must be a Task subclass or a factory returning a Task!")
+    return factory
+
+
+class Worker:
+    """
+    Long-running worker that hosts many tasks concurrently. All tasks share one HTTP session, one log shipper, one
+    abort poller and one request scheduler.
+    """
+
+    def __init__(self,
+                 settings: Settings | Default = Default(),
+                 max_tasks: int | Default = Default()):
+        # settings
+        if type(settings) is Default:
+            settings = Settings()
+        self._settings: Settings = settings
+
+        # max_tasks
+        if type(max_tasks) is Default:
+            max_tasks = 10
+        if max_tasks < 1:
+            raise ValueError("Max tasks must be greater than 0!")
+        self._max_tasks: int = max_tasks
+
+        # logger
+        self._logger: Logger = Logger(name=f"worker-{counter()}", settings=self.settings)
+
+        # shared resources
+        self._session = Task.create_session(settings=self.settings)
+        self._log_shipper: LogShipper = LogShipper(logger=self.logger)
+        self._abort_poller: AbortPoller = AbortPoller(logger=self.logger)
+        self._scheduler: RequestScheduler = Task.create_scheduler(settings=self.settings)
+
+        # lock
+        self._lock: threading.Lock = threading.Lock()
+
+        # running tasks
+        self._slots: threading.Semaphore = threading.Semaphore(self._max_tasks)
+        self._tasks: dict[threading.Thread, Task | None] = {}
+        self._idle: threading.Condition = threading.Condition(self._lock)
+
+        # draining
+        self._draining: bool = False
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings
+
+    @property
+    def logger(self) -> Logger:
+        return self._logger
+
+    @property
+    def max_tasks(self) -> int:
+        return self._max_tasks
+
+    @property
+    def draining(self) -> bool:
+        with self._lock:
+            return self._draining
+
+    @property
+    def tasks(self) -> tuple[Task, ...]:
+        with self._lock:
+            return tuple(task for task in self._tasks.values() if task is not None)
+
+    def submit(self, job: WorkerJobModel) -> bool:
+        """
+        Run a job as soon as a slot is free. Blocks while max_tasks are running.
+
+        :param job: Job to run.
+        :return: False if the worker is draining and the job was rejected.
+        """
+
+        while not self._slots.acquire(timeout=0.1):
+            if self.draining:
+                return False
+        with self._lock:
+            if self._draining:
+                self._slots.release()
+                return False
+            thread = threading.Thread(name=f"{job.spec}-{job.id}", target=self._run, args=(job,), daemon=True)
+            self._tasks[thread] = None
+        thread.start()
+        return True
+
+    def _run(self, job: WorkerJobModel) -> None:
+        thread = threading.current_thread()
+        try:
+            factory = load_spec(job.spec)
+            settings = Settings(**{**self.settings.model_dump(exclude={"id", "api_token"}),
+                                   **job.settings,
+                                   "id": job.id,
+                                   "api_token": job.api_token})
+            task = factory(settings=settings,
+                           session=self._session,
+                           log_shipper=self._log_shipper,
+                           abort_poller=self._abort_poller,
+                           scheduler=self._scheduler)
+            if not isinstance(task, Task):
+                raise TypeError(f"Spec '{job.spec}' returned {type(task)} instead of a Task!")
+            with self._lock:
+                self._tasks[thread] = task
+                if self._draining:
+                    task.abort = True
+            self.logger.info(f"Task {job.id} from '{job.spec}' started.")
+            task.run(resume=job.resume)
+            self.logger.info(f"Task {job.id} from '{job.spec}' ended.")
+        except Exception as e:
+            handle_exception(msg=f"Task {job.id} from '{job.spec}' raised an exception", e=e, logger=self.logger)
+        finally:
+            with self._lock:
+                self._tasks.pop(thread, None)
+                self._idle.notify_all()
+            self._slots.release()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wait until no task is running.
+
+        :param timeout: Timeout in seconds. None waits forever.
+        :return: True if no task is running anymore.
+        """
+
+        with self._lock:
+            return self._idle.wait_for(lambda: len(self._tasks) == 0, timeout=timeout)
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """
+        Stop accepting jobs and wait for the running tasks. Tasks still running after the timeout are aborted.
+
+        :param timeout: Timeout in seconds. None waits forever.
+        :return: True if all tasks finished before the timeout.
+        """
+
+        with self._lock:
+            self._draining = True
+        self.logger.info(f"Draining {len(self.tasks)} running tasks.")
+        if self.wait(timeout=timeout):
+            return True
+        for task in self.tasks:
+            self.logger.warning(f"Aborting task {task.id}, it did not finish in time.")
+            task.abort = True
+        self.wait(timeout=self._abort_poller.interval * 10)
+        return False
+
+    def close(self) -> None:
+        self._abort_poller.stop()
+        self._log_shipper.stop()
+        self._session.close()
+
+    def serve(self, jobs: TextIO, drain_timeout: float | None = None) -> None:
+        """
+        Read jobs as json lines and run them until the input ends or SIGTERM is received.
+
+        :param jobs: Input with one job per line.
+        :param drain_timeout: Timeout for draining on SIGTERM. None waits forever.
+        :return: None
+        """
+
+        sigterm = threading.Event()
+
+        def read_jobs():
+            for line in jobs:
+                if sigterm.is_set():
+                    break
+                line = line.strip()
+                if line == "":
+                    continue
+                try:
+                    job = WorkerJobModel(**json.loads(line))
+                except ValueError as e:
+                    handle_exception(msg=f"Invalid job '{line}'", e=e, logger=self.logger, chain=False)
+                    continue
+                if not self.submit(job):
+                    self.logger.warning(f"Job for task {job.id} rejected, worker is draining.")
+
+        def on_sigterm(_signum, _frame):
+            sigterm.set()
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, on_sigterm)
+
+        reader = threading.Thread(name="worker-reader", target=read_jobs, daemon=True)
+        reader.start()
+        try:
+            # run until the input ended and all tasks are done
+            while not sigterm.wait(0.1):
+                if not reader.is_alive() and self.wait(timeout=0):
+                    break
+        except KeyboardInterrupt:
+            sigterm.set()
+        if sigterm.is_set():
+            self.drain(timeout=drain_timeout)
+        self.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m kdsm_manager_task_client.worker",
+                                     description="Run many tasks in one process. Jobs are read as json lines with the "
+                                                 "keys 'spec' ('module:Task'), 'id', 'api_token' and optional 'resume' and 'settings'.")
+    parser.add_argument("jobs", nargs="?", default="-", help="File with one job per line. Default is stdin.")
+    parser.add_argument("--max-tasks", type=int, default=10, help="Maximum number of concurrently running tasks.")
+    parser.add_argument("--drain-timeout", type=float, default=None, help="Seconds to wait for running tasks on SIGTERM before aborting them.")
+    args = parser.parse_args(argv)
+
+    worker = Worker(max_tasks=args.max_tasks)
+    if args.jobs == "-":
+        worker.serve(jobs=sys.stdin, drain_timeout=args.drain_timeout)
+    else:
+        with open(args.jobs, "r", encoding="utf-8") as jobs:
+            worker.serve(jobs=jobs, drain_timeout=args.drain_timeout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
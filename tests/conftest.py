@@ -0,0 +1,25 @@
+import pytest
+
+from kdsm_manager_task_client import Settings, Task
+from kdsm_manager_task_client.stand_in import StandInManager
+
+# demo against a real kdsm-manager, it runs on import
+collect_ignore = ["test_task_client.py"]
+
+
+@pytest.fixture
+def stand_in(request):
+    # arguments of the stand-in manager by indirect parametrization
+    stand_in = StandInManager(port=0, **getattr(request, "param", {}))
+    stand_in.start()
+    yield stand_in
+    stand_in.stop()
+
+
+@pytest.fixture
+def make_task(stand_in):
+    def make_task(id: int = 1, task_kwargs: dict | None = None, **settings) -> Task:
+        settings.setdefault("log_console", False)
+        return Task(settings=Settings(id=id, api_token="token", api_url=stand_in.api_url, **settings), **(task_kwargs or {}))
+
+    return make_task
@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from kdsm_manager_task_client import AbortPoller, Group, Subtask, TaskStatus
+
+
+class PollingSubtask(Subtask):
+    def __init__(self, name: str, polled: threading.Event):
+        super().__init__(name=name)
+        self.polled = polled
+        self.poll_duration = None
+
+    def payload(self):
+        with self.step():
+            started_at = time.monotonic()
+            self.task.abort_poller.poll()
+            self.poll_duration = time.monotonic() - started_at
+            self.polled.set()
+
+
+class WaitingSubtask(Subtask):
+    def __init__(self, name: str, polled: threading.Event):
+        super().__init__(name=name)
+        self.polled = polled
+
+    def payload(self):
+        with self.step():
+            self.polled.wait(timeout=10.0)
+
+
+@pytest.mark.parametrize("stand_in", [{"latency": 0.5}], indirect=True)
+def test_slow_abort_poll_times_out(stand_in, make_task):
+    polled = threading.Event()
+    task = make_task(task_kwargs={"abort_poller": AbortPoller(interval=60.0)}, abort_poll_timeout=0.1)
+    polling = PollingSubtask(name="polling", polled=polled)
+    task.subtask(Group(polling), Group(WaitingSubtask(name="waiting", polled=polled)), delete_subtasks=True)
+    task.run()
+
+    # both abort polls timed out after 0.1 seconds instead of waiting 0.5 seconds each
+    assert polling.poll_duration < 0.5
+    assert stand_in.get_task(1).subtasks["polling"].status == TaskStatus.SUCCESS
+    assert stand_in.get_task(1).subtasks["waiting"].status == TaskStatus.SUCCESS
@@ -0,0 +1,62 @@
+from kdsm_manager_task_client import Group, Subtask, TaskStatus
+
+
+class CrashingSubtask(Subtask):
+    def __init__(self, crash: bool, calls: list):
+        super().__init__(name="crashing", steps=3)
+        self.crash = crash
+        self.calls = calls
+
+    def payload(self):
+        with self.step("Step 1") as done:
+            self.calls.append((1, done))
+        with self.step("Step 2") as done:
+            self.calls.append((2, done))
+            if self.crash:
+                raise RuntimeError("Crash in step 2.")
+        with self.step("Step 3") as done:
+            self.calls.append((3, done))
+
+
+def test_resume_after_crash(stand_in, make_task, tmp_path):
+    # first run crashes in step 2
+    calls = []
+    task = make_task(checkpoint="local", checkpoint_path=tmp_path)
+    task.subtask(Group(CrashingSubtask(crash=True, calls=calls)), delete_subtasks=True)
+    task.run()
+    assert calls == [(1, False), (2, False)]
+    assert stand_in.get_task(1).subtasks["crashing"].status == TaskStatus.FAILED
+
+    # resumed run replays step 1 and runs the rest
+    calls = []
+    task = make_task(checkpoint="local", checkpoint_path=tmp_path)
+    subtask = CrashingSubtask(crash=False, calls=calls)
+    task.subtask(Group(subtask), delete_subtasks=True)
+    task.run(resume=True)
+    assert calls == [(1, True), (2, False), (3, False)]
+    assert subtask.current_step == 3
+    assert stand_in.get_task(1).subtasks["crashing"].status == TaskStatus.SUCCESS
+
+
+class MixedStepsSubtask(Subtask):
+    def __init__(self, calls: list):
+        super().__init__(name="mixed", steps=3)
+        self.calls = calls
+
+    def payload(self):
+        self.next_step()
+        with self.step("Step 2") as done:
+            self.calls.append((2, done))
+        with self.step("Step 3") as done:
+            self.calls.append((3, done))
+
+
+def test_steps_after_next_step_are_not_replayed(stand_in, make_task):
+    calls = []
+    task = make_task()
+    subtask = MixedStepsSubtask(calls=calls)
+    task.subtask(Group(subtask), delete_subtasks=True)
+    task.run()
+    assert calls == [(2, False), (3, False)]
+    assert subtask.current_step == 3
+    assert stand_in.get_task(1).subtasks["mixed"].status == TaskStatus.SUCCESS
@@ -0,0 +1,168 @@
+import json
+import os
+import socket
+import stat
+import threading
+import time
+
+import pytest
+
+from kdsm_manager_task_client import AbortPoller, ControlServer, Group, Subtask, TaskStatus
+
+
+class SleepingSubtask(Subtask):
+    def payload(self):
+        for _ in range(self.steps):
+            with self.step():
+                self.logger.info("Step.")
+                time.sleep(0.05)
+
+
+class SlowPollGroup(Group):
+    @classmethod
+    def check_abort(cls, group: "SlowPollGroup") -> bool:
+        # e.g. kdsm-manager answers slowly
+        time.sleep(5.0)
+        return super().check_abort(group)
+
+
+class ControlClient:
+    def __init__(self, path):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(str(path))
+        self._file = self._socket.makefile("rwb")
+
+    def send_line(self, line: bytes) -> dict:
+        self._file.write(line + b"\n")
+        self._file.flush()
+        return json.loads(self._file.readline())
+
+    def send(self, **command) -> dict:
+        return self.send_line(json.dumps(command).encode("utf-8"))
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+
+def start_task(make_task, path, *groups, **settings):
+    task = make_task(control_socket_path=path, **settings)
+    task.subtask(*groups, delete_subtasks=True)
+    run = threading.Thread(target=task.run)
+    run.start()
+    while not path.exists():
+        time.sleep(0.01)
+    return task, run
+
+
+def test_snapshot(stand_in, make_task, tmp_path):
+    path = tmp_path / "task.sock"
+    task, run = start_task(make_task, path, Group(SleepingSubtask(name="a", steps=40)))
+    client = ControlClient(path)
+    while task.subtasks[0].current_step == 0:
+        time.sleep(0.01)
+    response = client.send(command="snapshot")
+    assert response["ok"]
+    snapshot = response["result"]
+    assert snapshot["id"] == 1
+    assert snapshot["groups"][0]["subtasks"][0]["name"] == "a"
+    assert snapshot["groups"][0]["subtasks"][0]["status"] == "running"
+    assert snapshot["groups"][0]["subtasks"][0]["current_step"] > 0
+    assert snapshot["threads"][0]["current_subtask"] == "a"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+    # invalid commands
+    assert client.send(command="unknown")["ok"] is False
+    assert client.send(command="abort", subtask="unknown")["ok"] is False
+    assert client.send_line(b"not json")["ok"] is False
+
+    assert client.send(command="abort")["ok"]
+    client.close()
+    run.join(timeout=10.0)
+    assert not run.is_alive()
+    assert not path.exists()
+
+
+def test_abort_subtask(stand_in, make_task, tmp_path):
+    path = tmp_path / "task.sock"
+    task, run = start_task(make_task, path,
+                           Group(SleepingSubtask(name="a", steps=100)),
+                           Group(SleepingSubtask(name="b", steps=10)))
+    while task.subtasks[0].current_step == 0:
+        time.sleep(0.01)
+    client = ControlClient(path)
+    assert client.send(command="abort", subtask="a") == {"ok": True, "result": None}
+    client.close()
+    run.join(timeout=10.0)
+    assert stand_in.get_task(1).subtasks["a"].status == TaskStatus.ABORTED
+    assert stand_in.get_task(1).subtasks["b"].status == TaskStatus.SUCCESS
+
+
+def test_abort_does_not_wait_for_poll(stand_in, make_task, tmp_path):
+    path = tmp_path / "task.sock"
+    task, run = start_task(make_task, path, SlowPollGroup(SleepingSubtask(name="a", steps=200)),
+                           task_kwargs={"abort_poller": AbortPoller(interval=0.01)})
+    while task.subtasks[0].current_step == 0:
+        time.sleep(0.01)
+    client = ControlClient(path)
+    started_at = time.monotonic()
+    assert client.send(command="abort")["ok"]
+    client.close()
+    run.join(timeout=10.0)
+    assert time.monotonic() - started_at < 2.0
+    assert stand_in.get_task(1).subtasks["a"].status == TaskStatus.ABORTED
+
+
+def test_socket_in_use(stand_in, make_task, tmp_path):
+    path = tmp_path / "task.sock"
+    task, run = start_task(make_task, path, Group(SleepingSubtask(name="a", steps=100)))
+    other = ControlServer(task=make_task(id=2), path=path)
+    with pytest.raises(RuntimeError):
+        other.start()
+
+    # the socket of the running task still works
+    client = ControlClient(path)
+    assert client.send(command="abort")["ok"]
+    client.close()
+    run.join(timeout=10.0)
+
+
+def test_stale_socket_is_replaced(stand_in, make_task, tmp_path):
+    path = tmp_path / "task.sock"
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()
+    server = ControlServer(task=make_task(), path=path)
+    server.start()
+    client = ControlClient(path)
+    assert client.send(command="snapshot")["ok"]
+    client.close()
+    server.stop()
+    assert not path.exists()
+
+
+def test_no_socket_path_is_kept(stand_in, make_task, tmp_path):
+    path = tmp_path / "task.sock"
+    path.write_text("data")
+    with pytest.raises(RuntimeError):
+        ControlServer(task=make_task(), path=path).start()
+    assert path.read_text() == "data"
+
+
+def test_start_keeps_process_umask(stand_in, make_task, tmp_path):
+    path = tmp_path / "task.sock"
+    umask = os.umask(0o022)
+    try:
+        server = ControlServer(task=make_task(), path=path)
+        server.start()
+        try:
+            # other threads keep creating files with the umask of the process
+            assert os.umask(0o022) == 0o022
+            assert stat.S_IMODE(path.stat().st_mode) == 0o600
+            client = ControlClient(path)
+            assert client.send(command="snapshot")["ok"]
+            client.close()
+        finally:
+            server.stop()
+    finally:
+        os.umask(umask)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from kdsm_manager_task_client import Group, LeaseKeeper, LeaseWorker, Subtask, TaskStatus
+
+
+class SleepingSubtask(Subtask):
+    def __init__(self, name: str, steps: int = 1, step_time: float = 0.0):
+        super().__init__(name=name, steps=steps)
+        self.step_time = step_time
+        self.steps_run = 0
+
+    def payload(self):
+        for _ in range(self.steps):
+            with self.step():
+                time.sleep(self.step_time)
+                self.steps_run += 1
+
+
+def make_worker_task(make_task, attach: bool, **settings):
+    task = make_task(**settings)
+    task.subtask(Group(SleepingSubtask(name="first"), SleepingSubtask(name="second")), delete_subtasks=True, attach=attach)
+    return task
+
+
+def make_keeper(task, duration: float = 30.0) -> tuple[LeaseKeeper, LeaseWorker]:
+    keeper = LeaseKeeper(task=task, duration=duration)
+    worker = LeaseWorker(lease_keeper=keeper)
+    worker.task = task
+    return keeper, worker
+
+
+def test_claim_renew_release(stand_in, make_task):
+    keeper, worker = make_keeper(make_worker_task(make_task, attach=False))
+    other_keeper, other_worker = make_keeper(make_worker_task(make_task, attach=True))
+
+    # claim the head of the group
+    subtask, pending = keeper.claim(worker=worker)
+    assert subtask.name == "first" and pending
+    assert stand_in.get_task(1).subtasks["first"].lease_worker == keeper.worker_id
+
+    # the head is leased and the next subtask waits for it
+    assert other_keeper.claim(worker=other_worker) == (None, True)
+
+    # renew
+    expires_at = stand_in.get_task(1).subtasks["first"].lease_expires_at
+    time.sleep(0.01)
+    keeper.heartbeat()
+    assert stand_in.get_task(1).subtasks["first"].lease_expires_at > expires_at
+    assert keeper.leases == ("first",)
+
+    # release
+    keeper.release(subtask=subtask)
+    assert stand_in.get_task(1).subtasks["first"].lease_worker is None
+    assert keeper.leases == ()
+    other_subtask, _ = other_keeper.claim(worker=other_worker)
+    assert other_subtask.name == "first"
+
+
+def test_reclaim_after_expiry(stand_in, make_task):
+    keeper, worker = make_keeper(make_worker_task(make_task, attach=False), duration=0.2)
+    other_keeper, other_worker = make_keeper(make_worker_task(make_task, attach=True))
+    assert keeper.claim(worker=worker)[0].name == "first"
+
+    # the worker died without heartbeat
+    time.sleep(0.3)
+    assert other_keeper.claim(worker=other_worker)[0].name == "first"
+    assert stand_in.get_task(1).subtasks["first"].lease_worker == other_keeper.worker_id
+    assert stand_in.get_task(1).subtasks["first"].lease_claims == 2
+
+    # renewing the expired lease is refused, the subtask is left to the other worker
+    keeper.heartbeat()
+    assert keeper.leases == ()
+    assert keeper.check_lost() == ["first"]
+
+
+def test_lease_lost_stops_subtask(stand_in, make_task):
+    task = make_task(lease_duration=0.6, lease_poll_interval=0.05)
+    subtask = SleepingSubtask(name="slow", steps=30, step_time=0.1)
+    task.subtask(Group(subtask), delete_subtasks=True)
+    run = threading.Thread(target=task.run, kwargs={"distributed": True, "workers": 1})
+    run.start()
+    while subtask.steps_run == 0:
+        time.sleep(0.01)
+    worker_id = stand_in.get_task(1).subtasks["slow"].lease_worker
+
+    # another worker takes the subtask over
+    other_task = make_task()
+    other_task.request(method="DELETE", url=other_task.api_url + "/task/subtask/slow/lease", params={"worker": worker_id})
+    other_task.request(method="POST", url=other_task.api_url + "/task/subtask/slow/lease", params={"worker": "other", "duration": 60.0})
+
+    run.join(timeout=10.0)
+    assert not run.is_alive()
+    assert 0 < subtask.steps_run < 30
+    stand_in_subtask = stand_in.get_task(1).subtasks["slow"]
+    assert stand_in_subtask.lease_worker == "other"
+    assert stand_in_subtask.status == TaskStatus.RUNNING
+
+
+def test_distributed_run(stand_in, make_task):
+    task = make_task(lease_poll_interval=0.05)
+    task.subtask(Group(SleepingSubtask(name="a1"), SleepingSubtask(name="a2")), Group(SleepingSubtask(name="b1")), delete_subtasks=True)
+    task.run(distributed=True, workers=2)
+    for name, stand_in_subtask in stand_in.get_task(1).subtasks.items():
+        assert stand_in_subtask.status == TaskStatus.SUCCESS
+        assert stand_in_subtask.lease_claims == 1
+        assert stand_in_subtask.lease_worker is None
+
+
+def test_distributed_run_does_not_push_percent_on_shutdown(stand_in, make_task):
+    task = make_task(lease_poll_interval=0.05, progress_push_interval=0.0)
+    task.subtask(Group(SleepingSubtask(name="a1")), delete_subtasks=True)
+    task.run(distributed=True, workers=1)
+    assert stand_in.get_task(1).percent_history == []
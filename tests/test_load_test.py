@@ -0,0 +1,33 @@
+import os
+from pathlib import Path
+
+import kdsm_manager_task_client
+from kdsm_manager_task_client.load_test import percentile, progress_lags, run_load_test
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+
+
+def test_progress_lags():
+    local = [(0.0, 0.0), (1.0, 50.0), (2.0, 100.0)]
+    assert progress_lags(local=local, manager=[(1.5, 50.0), (2.0, 100.0)]) == [0.5, 0.0]
+
+
+def test_load_test_report(monkeypatch):
+    # the stand-in runs in a child process, which has to find the package without it being installed
+    source_path = str(Path(kdsm_manager_task_client.__file__).parent.parent)
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [source_path, os.environ.get("PYTHONPATH")])))
+
+    # 10 lines per second with 0.05 seconds per step is half a line per step
+    result = run_load_test(groups=2, subtasks_per_group=2, steps=4, step_duration=0.05, log_rate=10.0)
+    assert (result.groups, result.subtasks_per_group, result.steps) == (2, 2, 4)
+    assert (result.subtasks_succeeded, result.subtasks_failed, result.subtasks_aborted) == (4, 0, 0)
+    assert result.log_records_emitted == 8
+    assert result.log_records == 8
+    assert 5.0 < result.log_rate_achieved <= 10.0
+    assert result.requests > 0 and result.errors == 0
+    assert result.duration > 0
+    assert "log_rate_achieved:" in result.report()
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from kdsm_manager_task_client import AbortPoller, Group, Subtask, TaskStatus
+
+
+class SleepingSubtask(Subtask):
+    def payload(self):
+        for _ in range(self.steps):
+            with self.step():
+                self.logger.info("Step.")
+                time.sleep(0.1)
+
+
+@pytest.mark.parametrize("stand_in", [{"error_rate": 1.0, "error_pattern": "ship-level"}], indirect=True)
+def test_failing_ship_level_poll_keeps_subtask_running(stand_in, make_task):
+    task = make_task(task_kwargs={"abort_poller": AbortPoller(interval=0.05)}, log_ship_level_poll_interval=0.0)
+    task.subtask(Group(SleepingSubtask(name="sleeping", steps=5)), delete_subtasks=True)
+    task.run()
+    assert stand_in.stats.injected_errors > 0
+    assert stand_in.get_task(1).subtasks["sleeping"].status == TaskStatus.SUCCESS
+
+
+def test_deduplicated_records_keep_last_message(stand_in, make_task):
+    task = make_task()
+
+    class LoggingSubtask(Subtask):
+        def payload(self):
+            with self.step():
+                for i in range(100):
+                    self.logger.info("msg %d", i)
+                self.shipped = self._log_handler.drain()
+
+    subtask = LoggingSubtask(name="logging")
+    task.subtask(Group(subtask), delete_subtasks=True)
+    task.run()
+    repeated = [record for record in subtask.shipped if record.message == "msg 0"]
+    assert len(repeated) == 1
+    assert repeated[0].extra["repeat_count"] == 100
+    assert repeated[0].extra["last_message"] == "msg 99"
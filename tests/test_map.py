@@ -0,0 +1,102 @@
+import time
+
+from kdsm_manager_task_client import Group, Subtask, TaskStatus
+
+PERCENT_ENDPOINT = "PUT /task/subtask/{name}/percent"
+
+
+class MapSubtask(Subtask):
+    def __init__(self, stand_in, func, items, **map_kwargs):
+        super().__init__(name="map")
+        self.stand_in = stand_in
+        self.func = func
+        self.items = items
+        self.map_kwargs = map_kwargs
+        self.results = []
+        self.percent_pushes = None
+
+    def payload(self):
+        with self.step():
+            pushes = self.stand_in.stats.requests_per_endpoint.get(PERCENT_ENDPOINT, 0)
+            for result in self.map(self.func, self.items, **self.map_kwargs):
+                self.results.append(result)
+            self.percent_pushes = self.stand_in.stats.requests_per_endpoint.get(PERCENT_ENDPOINT, 0) - pushes
+            self.percent_after_map = self.local_percent
+
+
+def run_map(stand_in, make_task, func, items, **map_kwargs):
+    task = make_task()
+    subtask = MapSubtask(stand_in, func, items, **map_kwargs)
+    task.subtask(Group(subtask), delete_subtasks=True)
+    task.run()
+    return subtask, stand_in.get_task(1).subtasks["map"].status
+
+
+def slow_first(item):
+    if item == 0:
+        time.sleep(0.3)
+    return item * 2
+
+
+def test_ordered_results(stand_in, make_task):
+    subtask, status = run_map(stand_in, make_task, slow_first, range(20), workers=4, chunksize=1)
+    assert status == TaskStatus.SUCCESS
+    assert subtask.results == [item * 2 for item in range(20)]
+
+
+def test_as_completed_results(stand_in, make_task):
+    subtask, status = run_map(stand_in, make_task, slow_first, range(20), workers=4, chunksize=1, ordered=False)
+    assert status == TaskStatus.SUCCESS
+    assert sorted(subtask.results) == [item * 2 for item in range(20)]
+    # the slow first item doesn't hold back the others
+    assert subtask.results[-1] == 0
+
+
+def test_first_exception_cancels_outstanding_chunks(stand_in, make_task):
+    processed = []
+
+    def func(item):
+        processed.append(item)
+        if item == 3:
+            raise ValueError("Item 3 failed.")
+        time.sleep(0.05)
+        return item
+
+    subtask, status = run_map(stand_in, make_task, func, range(100), workers=2, chunksize=1)
+    assert status == TaskStatus.FAILED
+    assert 3 in processed
+    assert len(processed) < 100
+
+
+def test_abort_stops_work(stand_in, make_task):
+    processed = []
+    subtasks = []
+
+    def func(item):
+        processed.append(item)
+        if item == 3:
+            subtasks[0].abort = True
+        time.sleep(0.05)
+        return item
+
+    task = make_task()
+    subtask = MapSubtask(stand_in, func, range(100), workers=2, chunksize=1)
+    subtasks.append(subtask)
+    task.subtask(Group(subtask), delete_subtasks=True)
+    task.run()
+    assert stand_in.get_task(1).subtasks["map"].status == TaskStatus.ABORTED
+    assert len(processed) < 100
+
+    # the workers stop after their current item
+    count = len(processed)
+    time.sleep(0.2)
+    assert len(processed) == count
+
+
+def test_percent_roll_up_is_bounded(stand_in, make_task):
+    subtask, status = run_map(stand_in, make_task, lambda item: item, range(500), workers=4, chunksize=1, percent_interval=60.0)
+    assert status == TaskStatus.SUCCESS
+    assert len(subtask.results) == 500
+    # one percent update for the completed map instead of one per item
+    assert subtask.percent_pushes == 1
+    assert subtask.percent_after_map == 100.0
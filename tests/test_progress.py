@@ -0,0 +1,99 @@
+import pytest
+
+from kdsm_manager_task_client import EtaEstimator, Group, ProgressModel, Subtask
+
+
+class FastSubtask(Subtask):
+    def payload(self):
+        ...
+
+
+class SlowSubtask(Subtask):
+    def payload(self):
+        ...
+
+
+def test_roll_up():
+    progresses = [(ProgressModel(percent=50.0, steps=2, steps_done=1.0, eta=1.0), 1.0),
+                  (ProgressModel(percent=0.0, steps=4, steps_done=0.0, eta=6.0), 3.0)]
+    sequential = ProgressModel.sequential(progresses)
+    assert (sequential.percent, sequential.steps, sequential.steps_done, sequential.eta) == (12.5, 6, 1.0, 7.0)
+    parallel = ProgressModel.parallel(progresses)
+    assert (parallel.percent, parallel.eta) == (12.5, 6.0)
+
+    # one unknown eta makes the rolled up eta unknown, a finished roll up has none left
+    assert ProgressModel.sequential([*progresses, (ProgressModel(percent=0.0, steps=1, steps_done=0.0), 1.0)]).eta is None
+    assert ProgressModel.parallel([(ProgressModel(percent=100.0, steps=1, steps_done=1.0), 1.0)]).eta == 0.0
+
+
+def test_eta_estimator():
+    estimator = EtaEstimator(alpha=0.5)
+    assert estimator.estimate(key="a") is None
+    estimator.observe(key="a", step_duration=1.0)
+    estimator.observe(key="a", step_duration=3.0)
+    assert estimator.estimate(key="a") == 2.0
+    estimator.observe(key="b", step_duration=4.0)
+    # unknown types fall back to the mean over all types
+    assert estimator.estimate(key="c") == 3.0
+    with pytest.raises(ValueError):
+        EtaEstimator(alpha=0.0)
+
+
+def test_group_and_task_progress(stand_in, make_task):
+    task = make_task()
+    fast_1 = FastSubtask(name="fast_1", steps=2)
+    slow = SlowSubtask(name="slow", steps=2)
+    fast_2 = FastSubtask(name="fast_2", steps=4)
+    sequential, single = Group(fast_1, slow), Group(fast_2)
+    task.subtask(sequential, single, delete_subtasks=True)
+    task.eta_estimator.observe(key=FastSubtask.__qualname__, step_duration=0.5)
+    task.eta_estimator.observe(key=SlowSubtask.__qualname__, step_duration=3.0)
+    fast_1.current_step = 1
+
+    # weights are the steps times the estimated step duration: 1.0 + 6.0 and 2.0
+    assert (fast_1.weight, slow.weight, fast_2.weight) == (1.0, 6.0, 2.0)
+    progress = sequential.progress()
+    assert progress.percent == pytest.approx(50.0 * 1.0 / 7.0)
+    assert progress.eta == pytest.approx(0.5 + 6.0)
+    assert (progress.steps, progress.steps_done) == (4, 1.0)
+    assert single.progress().eta == pytest.approx(2.0)
+
+    # the groups run at the same time
+    progress = task.progress()
+    assert progress.percent == pytest.approx(50.0 * 1.0 / 9.0)
+    assert progress.eta == pytest.approx(6.5)
+    assert progress.steps == 8
+
+
+def test_push_percent_interval_and_min_delta(stand_in, make_task):
+    task = make_task(progress_push_interval=60.0, progress_push_min_delta=10.0)
+    subtask = FastSubtask(name="fast", steps=100)
+    task.subtask(Group(subtask), delete_subtasks=True)
+
+    def pushed():
+        return [percent for _, percent in stand_in.get_task(1).percent_history]
+
+    subtask.current_step = 1
+    task.push_percent()
+    assert pushed() == [1.0]
+
+    # within the interval
+    subtask.current_step = 50
+    task.push_percent()
+    assert pushed() == [1.0]
+
+    # after the interval, but below the minimum delta
+    task.settings.progress_push_interval = 0.0
+    subtask.current_step = 5
+    task.push_percent()
+    assert pushed() == [1.0]
+
+    subtask.current_step = 11
+    task.push_percent()
+    assert pushed() == [1.0, 11.0]
+
+    # unchanged percent is never pushed, forced pushes ignore interval and delta
+    task.push_percent(force=True)
+    subtask.current_step = 12
+    task.push_percent(force=True)
+    assert pushed() == [1.0, 11.0, 12.0]
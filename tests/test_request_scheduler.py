@@ -0,0 +1,84 @@
+import threading
+import time
+
+from kdsm_manager_task_client import RequestPriority, RequestScheduler
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Condition not reached in time."
+        time.sleep(0.01)
+
+
+def queued(scheduler: RequestScheduler) -> int:
+    return sum(stats.queued for stats in scheduler.stats().values())
+
+
+def test_grant_order_by_priority_and_flow():
+    scheduler = RequestScheduler(max_in_flight=1)
+    granted = []
+
+    def request(label: str, priority: RequestPriority, flow: str):
+        with scheduler.slot(priority=priority, flow=flow):
+            granted.append(label)
+
+    threads = []
+    with scheduler.slot(priority=RequestPriority.STATUS):
+        # queue the requests one after another, so their order is known
+        for label, priority, flow in [("log-a-1", RequestPriority.LOG, "a"),
+                                      ("log-a-2", RequestPriority.LOG, "a"),
+                                      ("log-b-1", RequestPriority.LOG, "b"),
+                                      ("bulk-a-1", RequestPriority.BULK, "a"),
+                                      ("status-a-1", RequestPriority.STATUS, "a"),
+                                      ("control-b-1", RequestPriority.CONTROL, "b")]:
+            thread = threading.Thread(target=request, args=(label, priority, flow))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: queued(scheduler) == len(threads))
+    for thread in threads:
+        thread.join()
+
+    # higher priorities first, flows of the same priority round-robin
+    assert granted == ["control-b-1", "status-a-1", "log-a-1", "log-b-1", "log-a-2", "bulk-a-1"]
+    assert scheduler.in_flight == 0
+
+
+def test_in_flight_limits():
+    scheduler = RequestScheduler(max_in_flight=3, max_in_flight_per_priority={RequestPriority.BULK: 1})
+    release = threading.Event()
+
+    def request(priority: RequestPriority):
+        with scheduler.slot(priority=priority):
+            release.wait()
+
+    threads = [threading.Thread(target=request, args=(RequestPriority.BULK,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+
+    # one bulk request in flight, the second waits for its priority limit
+    wait_until(lambda: queued(scheduler) == 1 and scheduler.in_flight == 1)
+    stats = scheduler.stats()[RequestPriority.BULK]
+    assert (stats.in_flight, stats.queued) == (1, 1)
+
+    # other priorities use the remaining slots up to the global limit
+    for priority, in_flight, waiting in [(RequestPriority.STATUS, 2, 1),
+                                         (RequestPriority.STATUS, 3, 1),
+                                         (RequestPriority.CONTROL, 3, 2)]:
+        thread = threading.Thread(target=request, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: queued(scheduler) == waiting and scheduler.in_flight == in_flight)
+    stats = scheduler.stats()
+    assert stats[RequestPriority.CONTROL].queued == 1
+    assert stats[RequestPriority.BULK].queued == 1
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    stats = scheduler.stats()
+    assert scheduler.in_flight == 0
+    assert all(stats[priority].queued == 0 and stats[priority].in_flight == 0 for priority in RequestPriority)
+    assert stats[RequestPriority.BULK].requests == 2
+    assert stats[RequestPriority.STATUS].requests == 2
+    assert stats[RequestPriority.CONTROL].requests == 1
@@ -0,0 +1,70 @@
+import time
+
+from kdsm_manager_task_client import Group, ResultCache, Subtask, TaskStatus
+
+
+def test_hash_task_data_by_content(stand_in, make_task):
+    task = make_task()
+    stand_in.add_task(id=1, data={"x": 1})
+    first = ResultCache.hash(task.data_view, "v1")
+    first_nested = ResultCache.hash({"data": task.data_view})
+    assert ResultCache.hash(task.data_view, "v1") == first
+
+    stand_in.add_task(id=1, data={"x": 2})
+    assert ResultCache.hash(task.data_view, "v1") != first
+    assert ResultCache.hash({"data": task.data_view}) != first_nested
+
+
+class CachedSubtask(Subtask):
+    def __init__(self):
+        super().__init__(name="cached", steps=3)
+        self.runs = 0
+
+    def fingerprint(self):
+        return ResultCache.hash("v1")
+
+    def payload(self):
+        self.runs += 1
+        for _ in range(self.steps):
+            with self.step():
+                time.sleep(0.01)
+        return "result"
+
+
+def test_cache_hit_is_not_observed_by_eta_estimator(stand_in, make_task, tmp_path):
+    task = make_task(result_cache=True, result_cache_path=tmp_path)
+    subtask = CachedSubtask()
+    task.subtask(Group(subtask), delete_subtasks=True)
+    task.run()
+    assert subtask.runs == 1
+    assert task.eta_estimator.estimate(key=CachedSubtask.__qualname__) is not None
+
+    # the skipped steps took no time, they must not be observed
+    task = make_task(result_cache=True, result_cache_path=tmp_path)
+    subtask = CachedSubtask()
+    task.subtask(Group(subtask), delete_subtasks=True)
+    task.run()
+    assert subtask.runs == 0
+    assert subtask.result == "result"
+    assert subtask.current_step == 3
+    assert task.eta_estimator.estimate(key=CachedSubtask.__qualname__) is None
+
+
+class UnpicklableSubtask(Subtask):
+    def fingerprint(self):
+        return ResultCache.hash("v1")
+
+    def payload(self):
+        with self.step():
+            pass
+        return lambda: None
+
+
+def test_unpicklable_result_does_not_fail_subtask(stand_in, make_task, tmp_path):
+    task = make_task(result_cache=True, result_cache_path=tmp_path)
+    task.subtask(Group(UnpicklableSubtask(name="unpicklable"), CachedSubtask()), delete_subtasks=True)
+    task.run()
+    assert stand_in.get_task(1).subtasks["unpicklable"].status == TaskStatus.SUCCESS
+    # the next subtask of the group still runs
+    assert stand_in.get_task(1).subtasks["cached"].status == TaskStatus.SUCCESS
+    assert task.result_cache.stats.stores == 1
@@ -0,0 +1,92 @@
+import json
+import threading
+
+import pytest
+
+from kdsm_manager_task_client import Group, LogShipper, Subtask
+
+
+class EmptySubtask(Subtask):
+    def payload(self):
+        with self.step():
+            pass
+
+
+def test_shutdown_of_task_which_never_ran_keeps_percent(stand_in, make_task):
+    # e.g. the setup failed before subtasks were added
+    task = make_task(progress_push_interval=0.0)
+    task.shutdown()
+    assert stand_in.get_task(1).percent == 0.0
+    assert stand_in.get_task(1).percent_history == []
+
+
+def test_shutdown_after_run_pushes_percent(stand_in, make_task):
+    task = make_task(progress_push_interval=0.0)
+    task.subtask(Group(EmptySubtask(name="empty")), delete_subtasks=True)
+    task.run()
+    task.shutdown()
+    assert stand_in.get_task(1).percent == 100.0
+
+
+class PendingLogsSubtask(Subtask):
+    """
+    Logs records which stay in the buffer, waits until all subtasks did so and shuts the task down if it has a
+    shutdown timeout.
+    """
+
+    def __init__(self, name: str, barrier: threading.Barrier, done: threading.Event, shutdown_timeout: float | None = None):
+        super().__init__(name=name)
+        self.barrier = barrier
+        self.done = done
+        self.shutdown_timeout = shutdown_timeout
+        self.report = None
+
+    def payload(self):
+        with self.step():
+            for i in range(5):
+                self.logger.info(f"Record {i} of {self.name}.")
+            self.barrier.wait(timeout=10.0)
+            if self.shutdown_timeout is None:
+                self.done.wait(timeout=10.0)
+                return
+            try:
+                self.report = self.task.shutdown(timeout=self.shutdown_timeout)
+            finally:
+                self.done.set()
+
+
+def run_shutdown(make_task, shutdown_timeout: float, subtasks: int = 1, **settings):
+    barrier = threading.Barrier(subtasks)
+    done = threading.Event()
+    task = make_task(task_kwargs={"log_shipper": LogShipper(interval=60.0)}, **settings)
+    shutting_down = PendingLogsSubtask(name="subtask_0", barrier=barrier, done=done, shutdown_timeout=shutdown_timeout)
+    others = [PendingLogsSubtask(name=f"subtask_{index}", barrier=barrier, done=done) for index in range(1, subtasks)]
+    task.subtask(*[Group(subtask) for subtask in [shutting_down, *others]], delete_subtasks=True)
+    task.run()
+    return shutting_down.report
+
+
+@pytest.mark.parametrize("stand_in", [{"latency": 0.3}], indirect=True)
+def test_shutdown_ships_pending_records_in_parallel(stand_in, make_task):
+    report = run_shutdown(make_task, shutdown_timeout=5.0, subtasks=3)
+    assert (report.sent, report.spooled, report.dropped, report.timed_out) == (15, 0, 0, False)
+    # three batches in one round trip
+    assert report.duration < 0.8
+
+
+@pytest.mark.parametrize("stand_in", [{"latency": 0.5}], indirect=True)
+def test_shutdown_spools_records_of_slow_manager(stand_in, make_task, tmp_path):
+    report = run_shutdown(make_task, shutdown_timeout=0.1, log_spool_path=tmp_path)
+    assert (report.sent, report.spooled, report.dropped, report.timed_out) == (0, 5, 0, True)
+    assert report.duration < 0.5
+
+    lines = [json.loads(line) for line in (tmp_path / "task_1.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [line["subtask"] for line in lines] == ["subtask_0"] * 5
+    assert [line["record"]["message"] for line in lines] == [f"Record {i} of subtask_0." for i in range(5)]
+
+
+@pytest.mark.parametrize("stand_in", [{"latency": 0.5}], indirect=True)
+def test_shutdown_drops_records_without_spool(stand_in, make_task):
+    report = run_shutdown(make_task, shutdown_timeout=0.1, subtasks=2)
+    assert (report.sent, report.spooled, report.dropped, report.timed_out) == (0, 0, 10, True)
+    assert report.duration < 0.5
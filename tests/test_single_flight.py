@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from kdsm_manager_task_client import SingleFlight
+
+
+class Interrupt(BaseException):
+    pass
+
+
+def run_leader_and_follower(single_flight: SingleFlight, leader_func):
+    """
+    Start a leader blocked in leader_func and a follower joining its call. The follower executes "follower" if it
+    becomes leader itself.
+    """
+
+    leader_started = threading.Event()
+    release_leader = threading.Event()
+    results = {}
+
+    def leader():
+        def func():
+            leader_started.set()
+            release_leader.wait()
+            return leader_func()
+
+        try:
+            results["leader"] = single_flight.do(key="key", func=func)
+        except BaseException as e:
+            results["leader"] = e
+
+    def follower():
+        try:
+            results["follower"] = single_flight.do(key="key", func=lambda: "follower")
+        except BaseException as e:
+            results["follower"] = e
+
+    leader_thread = threading.Thread(target=leader)
+    leader_thread.start()
+    leader_started.wait()
+    follower_thread = threading.Thread(target=follower)
+    follower_thread.start()
+    while single_flight.stats.shared == 0:
+        time.sleep(0.001)
+    release_leader.set()
+    leader_thread.join()
+    follower_thread.join()
+    return results
+
+
+def test_share_result():
+    single_flight = SingleFlight()
+    results = run_leader_and_follower(single_flight, lambda: "leader")
+    assert results == {"leader": "leader", "follower": "leader"}
+    assert single_flight.stats.calls == 1
+
+
+def test_share_exception():
+    single_flight = SingleFlight()
+    error = ValueError("failed")
+
+    def func():
+        raise error
+
+    results = run_leader_and_follower(single_flight, func)
+    assert results == {"leader": error, "follower": error}
+
+
+def test_interrupted_leader_is_not_shared():
+    single_flight = SingleFlight()
+
+    results = run_leader_and_follower(single_flight, interrupt)
+    assert isinstance(results["leader"], Interrupt)
+    assert results["follower"] == "follower"
+    assert single_flight.stats.calls == 2
+
+
+def interrupt():
+    raise Interrupt()
+
+
+def test_ttl():
+    single_flight = SingleFlight(ttl=60.0)
+    assert single_flight.do(key="key", func=lambda: 1) == 1
+    assert single_flight.do(key="key", func=lambda: 2) == 1
+    with pytest.raises(Interrupt):
+        single_flight.do(key="other", func=interrupt)
+    assert single_flight.do(key="other", func=lambda: 3) == 3
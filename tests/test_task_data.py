@@ -0,0 +1,117 @@
+import json
+import mmap
+
+import pytest
+
+from kdsm_manager_task_client import TaskData
+
+DATA = {"name": "data",
+        "items": [{"id": i, "text": f"item [{i}], {{\"quoted\"}}"} for i in range(5)],
+        "groups": [{"items": [1, 2, 3]}, {"items": []}],
+        "mapping": {"a": 1, "b": [1, 2]},
+        "empty": {}}
+
+
+def test_index_and_values():
+    data = TaskData(raw=json.dumps(DATA, indent=2).encode("utf-8"))
+    assert list(data) == list(DATA)
+    assert len(data) == len(DATA)
+    assert "items" in data and "missing" not in data
+    assert data["name"] == "data"
+    assert data["items"] == DATA["items"]
+    assert data["empty"] == {}
+    assert data.get("missing") is None
+    with pytest.raises(KeyError):
+        _ = data["missing"]
+
+
+def test_values_are_parsed_on_access():
+    # only the accessed value has to be valid json
+    data = TaskData(raw=b'{"valid": [1, {"a": "]"}], "invalid": [tru]}')
+    assert data["valid"] == [1, {"a": "]"}]
+    with pytest.raises(json.JSONDecodeError):
+        _ = data["invalid"]
+
+
+def test_iterate():
+    data = TaskData(raw=json.dumps(DATA).encode("utf-8"))
+    assert list(data.iterate("items")) == DATA["items"]
+    assert list(data.iterate("groups", 0, "items")) == [1, 2, 3]
+    assert list(data.iterate("groups", 1, "items")) == []
+    assert list(data.iterate("mapping")) == [("a", 1), ("b", [1, 2])]
+    assert list(data.iterate("empty")) == []
+    with pytest.raises(TypeError):
+        list(data.iterate("name"))
+    with pytest.raises(KeyError):
+        list(data.iterate("groups", 2, "items"))
+    with pytest.raises(ValueError):
+        list(data.iterate())
+
+
+def test_not_an_object():
+    with pytest.raises(ValueError):
+        len(TaskData(raw=b"[1, 2]"))
+
+
+def test_to_dict_and_sha256():
+    raw = json.dumps(DATA).encode("utf-8")
+    data = TaskData(raw=raw)
+    copy = data.to_dict()
+    assert copy == DATA
+    copy["items"].clear()
+    assert data["items"] == DATA["items"]
+    assert data.sha256 == TaskData(raw=raw).sha256
+    assert data.sha256 != TaskData(raw=json.dumps({"name": "other"}).encode("utf-8")).sha256
+
+
+def test_task_data_is_a_dict(stand_in, make_task):
+    stand_in.add_task(id=1, data=DATA)
+    task = make_task()
+    data = task.data
+    assert isinstance(data, dict)
+    assert json.loads(json.dumps(data)) == DATA
+
+    # every access gets its own copy
+    data["items"].clear()
+    assert task.data == DATA
+    assert task.data_view["items"] == DATA["items"]
+    assert task.data_cache.stats.downloads == 1
+
+
+def test_data_cache_revalidates_by_etag(stand_in, make_task):
+    stand_in.add_task(id=1, data={"version": 1})
+    task = make_task()
+    first = task.data_view
+    assert task.data_view is first
+    stats = task.data_cache.stats
+    assert (stats.downloads, stats.not_modified) == (1, 1)
+
+    stand_in.add_task(id=1, data={"version": 2})
+    assert task.data_view["version"] == 2
+    assert task.data_cache.stats.downloads == 2
+
+
+def test_data_cache_max_age(stand_in, make_task):
+    stand_in.add_task(id=1, data={"version": 1})
+    task = make_task(data_max_age=60.0)
+    assert task.data_view["version"] == 1
+    stand_in.add_task(id=1, data={"version": 2})
+    assert task.data_view["version"] == 1
+    stats = task.data_cache.stats
+    assert (stats.downloads, stats.not_modified, stats.memoized) == (1, 0, 1)
+
+
+def test_data_cache_on_disk(stand_in, make_task, tmp_path):
+    stand_in.add_task(id=1, data=DATA)
+    task = make_task(data_cache=True, data_cache_path=tmp_path)
+    assert task.data_view["items"] == DATA["items"]
+    assert json.loads((tmp_path / "task_1.json").read_bytes()) == DATA
+    assert (tmp_path / "task_1.etag").read_text(encoding="utf-8") != ""
+
+    # a new process gets a 304 and maps the file
+    task = make_task(data_cache=True, data_cache_path=tmp_path)
+    data = task.data_view
+    assert isinstance(data._raw, mmap.mmap)
+    assert list(data.iterate("items")) == DATA["items"]
+    stats = task.data_cache.stats
+    assert (stats.downloads, stats.not_modified) == (0, 1)
@@ -0,0 +1,162 @@
+import hashlib
+import io
+import os
+import random
+
+import pytest
+import requests
+from requests.exceptions import HTTPError
+
+from kdsm_manager_task_client import Group, Subtask, TaskStatus
+
+DATA = os.urandom(3500)
+CHUNKSIZE = 1000
+
+
+class UploadSubtask(Subtask):
+    def __init__(self, upload):
+        super().__init__(name="upload")
+        self.upload = upload
+        self.artifact = None
+        self.error = None
+
+    def payload(self):
+        with self.step():
+            try:
+                self.artifact = self.upload(self)
+            except Exception as e:
+                self.error = e
+                raise
+
+
+def run_upload(make_task, upload, before_run=None, response_hook=None, **settings) -> UploadSubtask:
+    task = make_task(**settings)
+    subtask = UploadSubtask(upload=upload)
+    task.subtask(Group(subtask), delete_subtasks=True)
+    if before_run is not None:
+        before_run(task)
+    if response_hook is not None:
+        task.session.hooks["response"].append(response_hook)
+    task.run()
+    return subtask
+
+
+def is_chunk(response: requests.Response) -> bool:
+    return response.request.method == "PUT" and "/artifact/" in response.request.url
+
+
+def put_chunk(task_api_url: str, offset: int, chunk: bytes) -> requests.Response:
+    # upload by another client, e.g. a previous run
+    return requests.put(task_api_url + "/task/subtask/upload/artifact/data.bin",
+                        params={"offset": offset},
+                        data=chunk,
+                        headers={"Authorization": "Bearer 1:token", "Content-Type": "application/octet-stream"})
+
+
+def stand_in_artifact(stand_in, name: str = "data.bin"):
+    return stand_in.get_task(1).subtasks["upload"].artifacts.get(name)
+
+
+def test_upload_path(stand_in, make_task, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(DATA)
+    subtask = run_upload(make_task, lambda s: s.upload_artifact(path, chunksize=CHUNKSIZE))
+    assert subtask.artifact.name == "data.bin"
+    assert subtask.artifact.size == len(DATA)
+    assert subtask.artifact.sha256 == hashlib.sha256(DATA).hexdigest()
+    assert stand_in_artifact(stand_in).sha256 == subtask.artifact.sha256
+    assert stand_in.stats.requests_per_endpoint["PUT /task/subtask/{name}/artifact/{artifact}"] == 4
+
+
+def test_upload_file_object(stand_in, make_task):
+    subtask = run_upload(make_task, lambda s: s.upload_artifact(io.BytesIO(DATA), name="data.bin", chunksize=CHUNKSIZE))
+    assert subtask.artifact.sha256 == hashlib.sha256(DATA).hexdigest()
+    assert stand_in_artifact(stand_in).size == len(DATA)
+
+
+def test_upload_file_object_without_name(stand_in, make_task):
+    subtask = run_upload(make_task, lambda s: s.upload_artifact(io.BytesIO(DATA)))
+    assert isinstance(subtask.error, ValueError)
+
+
+def test_upload_empty_file(stand_in, make_task, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"")
+    subtask = run_upload(make_task, lambda s: s.upload_artifact(path, chunksize=CHUNKSIZE))
+    assert subtask.artifact.size == 0
+    assert stand_in_artifact(stand_in).sha256 == hashlib.sha256(b"").hexdigest()
+
+
+# only chunks fail, every second on average
+@pytest.mark.parametrize("stand_in", [{"error_rate": 0.5, "error_pattern": r"/artifact/data\.bin$"}], indirect=True)
+def test_upload_resumes_after_errors(stand_in, make_task):
+    random.seed(1)
+    subtask = run_upload(make_task, lambda s: s.upload_artifact(io.BytesIO(DATA), name="data.bin", chunksize=CHUNKSIZE, retries=20, retry_delay=0.001))
+    assert stand_in.stats.injected_errors > 0
+    assert subtask.error is None
+    assert stand_in_artifact(stand_in).sha256 == hashlib.sha256(DATA).hexdigest()
+
+
+def test_upload_resumes_previous_run(stand_in, make_task):
+    def before_run(task):
+        assert put_chunk(task.api_url, 0, DATA[:CHUNKSIZE]).ok
+
+    subtask = run_upload(make_task,
+                         lambda s: s.upload_artifact(io.BytesIO(DATA), name="data.bin", chunksize=CHUNKSIZE),
+                         before_run=before_run)
+    assert subtask.error is None
+    assert stand_in_artifact(stand_in).sha256 == hashlib.sha256(DATA).hexdigest()
+    assert stand_in.stats.requests_per_endpoint["PUT /task/subtask/{name}/artifact/{artifact}"] == 4
+
+
+def test_upload_offset_conflict(stand_in, make_task):
+    status_codes = []
+
+    def response_hook(response, *args, **kwargs):
+        if not is_chunk(response):
+            return
+        status_codes.append(response.status_code)
+        # another client appends the second chunk after the first one, so the offset of the next chunk is stale
+        if status_codes == [200]:
+            assert put_chunk(response.request.url.split("/task/")[0], CHUNKSIZE, DATA[CHUNKSIZE:2 * CHUNKSIZE]).ok
+
+    subtask = run_upload(make_task,
+                         lambda s: s.upload_artifact(io.BytesIO(DATA), name="data.bin", chunksize=CHUNKSIZE, retry_delay=0.001),
+                         response_hook=response_hook)
+    assert status_codes == [200, 409, 200, 200]
+    assert subtask.error is None
+    assert stand_in_artifact(stand_in).sha256 == hashlib.sha256(DATA).hexdigest()
+
+
+def test_upload_abort_between_chunks(stand_in, make_task):
+    puts = []
+
+    def upload(subtask):
+        def response_hook(response, *args, **kwargs):
+            if is_chunk(response):
+                puts.append(response.status_code)
+                subtask.abort = True
+
+        subtask.task.session.hooks["response"].append(response_hook)
+        return subtask.upload_artifact(io.BytesIO(DATA), name="data.bin", chunksize=CHUNKSIZE)
+
+    subtask = run_upload(make_task, upload)
+    assert puts == [200]
+    assert subtask.artifact is None
+    assert stand_in_artifact(stand_in).size == CHUNKSIZE
+    assert stand_in_artifact(stand_in).sha256 is None
+    assert stand_in.get_task(1).subtasks["upload"].status == TaskStatus.ABORTED
+
+
+def test_upload_checks_sha256_on_complete(stand_in, make_task):
+    # a previous run uploaded the start of another file
+    def before_run(task):
+        assert put_chunk(task.api_url, 0, os.urandom(CHUNKSIZE)).ok
+
+    subtask = run_upload(make_task,
+                         lambda s: s.upload_artifact(io.BytesIO(DATA), name="data.bin", chunksize=CHUNKSIZE),
+                         before_run=before_run)
+    assert isinstance(subtask.error, HTTPError)
+    assert subtask.error.response.status_code == 422
+    assert stand_in_artifact(stand_in).sha256 is None
+    assert stand_in.get_task(1).subtasks["upload"].status == TaskStatus.FAILED
@@ -0,0 +1,147 @@
+import io
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from kdsm_manager_task_client import Group, Settings, Subtask, Task, TaskStatus
+from kdsm_manager_task_client.worker import Worker, WorkerJobModel, load_spec
+
+NOT_CALLABLE = 1
+
+# tasks created by the factories below
+created: list[Task] = []
+running = {"now": 0, "max": 0}
+running_lock = threading.Lock()
+
+
+class CountingSubtask(Subtask):
+    def __init__(self, duration: float):
+        super().__init__(name="counting")
+        self.duration = duration
+
+    def payload(self):
+        with running_lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        try:
+            with self.step():
+                time.sleep(self.duration)
+        finally:
+            with running_lock:
+                running["now"] -= 1
+
+
+class RunningSubtask(Subtask):
+    def payload(self):
+        with self.step():
+            while True:
+                time.sleep(0.05)
+
+
+def short_task(**kwargs) -> Task:
+    task = Task(**kwargs)
+    task.subtask(Group(CountingSubtask(duration=0.2)), delete_subtasks=True)
+    created.append(task)
+    return task
+
+
+def long_task(**kwargs) -> Task:
+    task = Task(**kwargs)
+    task.subtask(Group(RunningSubtask(name="running")), delete_subtasks=True)
+    created.append(task)
+    return task
+
+
+@pytest.fixture
+def worker(stand_in):
+    created.clear()
+    running.update(now=0, max=0)
+    worker = Worker(settings=Settings(api_url=stand_in.api_url, log_console=False), max_tasks=2)
+    yield worker
+    worker.close()
+
+
+def job(id: int, spec: str = f"{__name__}:short_task") -> WorkerJobModel:
+    return WorkerJobModel(spec=spec, id=id, api_token="token")
+
+
+def test_load_spec():
+    assert load_spec("kdsm_manager_task_client:Task") is Task
+    assert load_spec(f"{__name__}:short_task") is short_task
+    for spec in ["no_attribute", "no_attribute:", ":Task"]:
+        with pytest.raises(ValueError):
+            load_spec(spec)
+    with pytest.raises(TypeError):
+        load_spec(f"{__name__}:NOT_CALLABLE")
+    with pytest.raises(ModuleNotFoundError):
+        load_spec("missing_module:Task")
+    with pytest.raises(AttributeError):
+        load_spec("kdsm_manager_task_client:Missing")
+
+
+def test_concurrent_task_limit(stand_in, worker):
+    # submit blocks while max_tasks are running
+    submitter = threading.Thread(target=lambda: [worker.submit(job(id=id)) for id in range(1, 6)])
+    submitter.start()
+    submitter.join(timeout=10.0)
+    assert worker.wait(timeout=10.0)
+    assert running["max"] == 2
+    assert [stand_in.get_task(id).subtasks["counting"].status for id in range(1, 6)] == [TaskStatus.SUCCESS] * 5
+
+
+def test_tasks_share_resources(stand_in, worker):
+    for id in range(1, 3):
+        worker.submit(job(id=id))
+    assert worker.wait(timeout=10.0)
+    first, second = created
+    assert first.session is second.session
+    assert first.log_shipper is second.log_shipper
+    assert first.abort_poller is second.abort_poller
+    assert first.scheduler is second.scheduler
+
+    # an ended task leaves the shared resources to the others
+    worker.submit(job(id=3))
+    assert worker.wait(timeout=10.0)
+    assert stand_in.get_task(3).subtasks["counting"].status == TaskStatus.SUCCESS
+
+
+def test_serve_skips_invalid_jobs(stand_in, worker):
+    jobs = io.StringIO("not json\n\n" + job(id=1).model_dump_json() + "\n")
+    serve = threading.Thread(target=worker.serve, args=(jobs,))
+    serve.start()
+    serve.join(timeout=10.0)
+    assert not serve.is_alive()
+    assert stand_in.get_task(1).subtasks["counting"].status == TaskStatus.SUCCESS
+
+
+def test_sigterm_drains_and_aborts(stand_in, worker):
+    read_fd, write_fd = os.pipe()
+    jobs = os.fdopen(read_fd, "r", encoding="utf-8")
+    writer = os.fdopen(write_fd, "w", encoding="utf-8")
+    writer.write(job(id=1, spec=f"{__name__}:long_task").model_dump_json() + "\n")
+    writer.flush()
+
+    def terminate():
+        while len(worker.tasks) == 0 or stand_in.get_task(1).subtasks.get("running") is None:
+            time.sleep(0.01)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    # the handler is installed by serve, which runs in the main thread
+    handler = signal.getsignal(signal.SIGTERM)
+    terminator = threading.Thread(target=terminate, daemon=True)
+    terminator.start()
+    try:
+        worker.serve(jobs=jobs, drain_timeout=0.2)
+    finally:
+        signal.signal(signal.SIGTERM, handler)
+        writer.close()
+        jobs.close()
+
+    assert worker.draining
+    assert worker.tasks == ()
+    assert stand_in.get_task(1).subtasks["running"].status == TaskStatus.ABORTED
+    # the worker rejects jobs while draining
+    assert not worker.submit(job(id=2))